@@ -0,0 +1,288 @@
+"""
+Загрузка данных API для Flet-клиента (main.py).
+
+- Все запросы идут через одну requests.Session: соединения (TCP и TLS)
+  переиспользуются из пула keep-alive, а не открываются на каждый вызов.
+- Ответы (вместе с X-Next-Cursor) хранятся в памяти процесса с TTL; ключ —
+  путь и параметры, набор тегов нормализуется (порядок выбора и повторы не
+  важны). Кэш общий для всех сессий Flet в процессе.
+- После истечения TTL и по кнопке «Обновить» (revalidate=True) запрос уходит
+  с If-None-Match: на 304 тело берётся из кэша, без повторной загрузки
+  и разбора JSON.
+- Если сервер недоступен, отдаются последние сохранённые данные.
+- LatestOnly запускает загрузку в фоне, не блокируя интерфейс, и отменяет
+  устаревшие: запрос, ещё не дошедший до сети, не выполняется, а
+  результат уже отправленного отбрасывается.
+- Изображения берутся из полей image и logo ответов: копия из srcset по
+  ширине элемента (прокси /api/v1/img), а не исходник в полном размере.
+- Чат не кэшируется. ChatFeed держит один long-poll запрос на процесс
+  и раздаёт новые сообщения всем сессиям Flet; между процессами и
+  воркерами API сообщения рассылает брокер на стороне сервера.
+"""
+import os
+import threading
+import time
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, Optional, Tuple
+from urllib.parse import urljoin
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+API_URL = os.getenv("BLACK_BEARS_API_URL", "https://black-bears-service.onrender.com/api/v1")
+
+CACHE_TTL = 30  # в секундах
+CACHE_MAX_ENTRIES = 128
+TIMEOUT = (5, 15)  # (соединение, чтение) в секундах
+
+
+class ApiClient:
+    def __init__(self, base_url: str = API_URL, ttl: float = CACHE_TTL, pool_size: int = 4):
+        self.base_url = base_url.rstrip("/")
+        self.ttl = ttl
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=pool_size,
+            # Повтор только для идемпотентных GET и ошибок прокси/перезапуска сервера
+            max_retries=Retry(total=2, backoff_factor=0.3, status_forcelist=(502, 503, 504), allowed_methods=("GET",)),
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        # hit — из кэша без запроса, not_modified — 304, fetched — загружено тело
+        self.stats = Counter()
+
+    def get_json(self, path: str, params: Iterable = (), revalidate: bool = False):
+        return self._get(path, params, revalidate)[2]
+
+    def _get(self, path: str, params: Iterable, revalidate: bool) -> list:
+        params = tuple(params)
+        key = (path, params)
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None:
+                self._cache.move_to_end(key)
+                if not revalidate and entry[0] > time.monotonic():
+                    self.stats["hit"] += 1
+                    return entry
+
+        headers = {"If-None-Match": entry[1]} if entry is not None and entry[1] else {}
+        try:
+            response = self.session.get(self.base_url + path, params=params, headers=headers, timeout=TIMEOUT)
+            if response.status_code == 304 and entry is not None:
+                self.stats["not_modified"] += 1
+                entry[0] = time.monotonic() + self.ttl
+                return entry
+            response.raise_for_status()
+            data = response.json()
+        except requests.exceptions.RequestException:
+            if entry is None:
+                raise
+            self.stats["stale"] += 1
+            return entry
+
+        self.stats["fetched"] += 1
+        # [истекает, ETag, данные, курсор следующей страницы]
+        entry = [
+            time.monotonic() + self.ttl, response.headers.get("ETag"), data, response.headers.get("X-Next-Cursor"),
+        ]
+        with self._lock:
+            self._cache[key] = entry
+            self._cache.move_to_end(key)
+            while len(self._cache) > CACHE_MAX_ENTRIES:
+                self._cache.popitem(last=False)
+        return entry
+
+    def news_page(
+        self, tags: Iterable[str] = (), limit: int = 20, cursor: Optional[str] = None, revalidate: bool = False,
+    ) -> Tuple[list, Optional[str]]:
+        """
+        Страница ленты и курсор следующей (None — дальше новостей нет)
+        """
+        params = [("limit", limit), *(("tags", tag) for tag in sorted(set(tags)))]
+        if cursor:
+            params.append(("cursor", cursor))
+        entry = self._get("/news/", params, revalidate)
+        return entry[2], entry[3]
+
+    def tags(self, revalidate: bool = False):
+        return self.get_json("/news/tags/", (), revalidate)
+
+    def image_url(self, image: Optional[dict], width: int) -> Optional[str]:
+        """
+        Ссылка на наименьшую копию не уже width пикселей из поля image/logo
+        ответа (srcset); None — изображения нет
+        """
+        if not image:
+            return None
+        candidates = []
+        for item in image["srcset"].split(", "):
+            url, _, descriptor = item.rpartition(" ")
+            candidates.append((int(descriptor.rstrip("w")), url))
+        candidates.sort()
+        url = next((url for candidate, url in candidates if candidate >= width), candidates[-1][1])
+        # Ссылки прокси могут быть относительными (/api/v1/img?...)
+        return urljoin(self.base_url, url)
+
+    def chat_history(self, limit: int = 50, cursor: Optional[str] = None) -> Tuple[list, Optional[str]]:
+        """
+        Последние сообщения чата от новых к старым и курсор более старых
+        """
+        params = [("limit", limit), *([("cursor", cursor)] if cursor else [])]
+        response = self.session.get(self.base_url + "/chat/messages", params=params, timeout=TIMEOUT)
+        response.raise_for_status()
+        return response.json(), response.headers.get("X-Next-Cursor")
+
+    def chat_updates(self, after: int, wait: float = 0) -> list:
+        """
+        Сообщения новее after; сервер держит запрос до wait секунд, пока их нет
+        """
+        response = self.session.get(
+            self.base_url + "/chat/messages/updates", params={"after": after, "wait": wait},
+            timeout=(TIMEOUT[0], wait + TIMEOUT[1]),
+        )
+        response.raise_for_status()
+        return response.json()
+
+    def send_chat(self, user_name: str, text: str, kind: str = "message") -> dict:
+        response = self.session.post(
+            self.base_url + "/chat/messages", json={"user_name": user_name, "text": text, "kind": kind},
+            timeout=TIMEOUT,
+        )
+        response.raise_for_status()
+        return response.json()
+
+    def close(self):
+        self.session.close()
+
+
+class LatestOnly:
+    """
+    Фоновая загрузка, в которой имеет значение только последний запрос.
+
+    submit() откладывает загрузку на delay секунд (можно переопределить для
+    отдельного вызова): быстрые клики по тегам схлопываются в один запрос.
+    Если за это время или пока шёл запрос пришёл новый submit(), прежняя
+    загрузка не выполняется или её результат отбрасывается. on_done/on_error
+    вызываются в фоновом потоке.
+    """
+
+    def __init__(self, run: Optional[Callable] = None, delay: float = 0.15):
+        self.run = run or _executor.submit
+        self.delay = delay
+        self._generation = 0
+        self._lock = threading.Lock()
+        self.stats = Counter()
+
+    def cancel(self):
+        with self._lock:
+            self._generation += 1
+
+    def is_current(self, generation: int) -> bool:
+        return generation == self._generation
+
+    def submit(
+        self, load: Callable, on_done: Callable, on_error: Optional[Callable] = None, delay: Optional[float] = None,
+    ):
+        delay = self.delay if delay is None else delay
+        with self._lock:
+            self._generation += 1
+            generation = self._generation
+
+        def task():
+            if delay:
+                time.sleep(delay)
+            if not self.is_current(generation):
+                self.stats["skipped"] += 1
+                return
+            try:
+                result = load()
+            except Exception as exc:
+                if self.is_current(generation) and on_error is not None:
+                    on_error(exc)
+                return
+            if not self.is_current(generation):
+                self.stats["discarded"] += 1
+                return
+            self.stats["delivered"] += 1
+            on_done(result)
+
+        self.run(task)
+
+
+class ChatFeed:
+    """
+    Новые сообщения чата для всех сессий Flet в процессе.
+
+    Один фоновый поток держит long-poll запрос к API (пока есть хотя бы
+    один подписчик) и передаёт каждую пришедшую пачку сообщений всем
+    подписчикам: на процесс один запрос вместо рассылки от каждой сессии
+    каждой. Подписчики вызываются в этом потоке и не должны блокировать его.
+    """
+
+    def __init__(self, client: ApiClient, wait: float = 25.0, retry_delay: float = 1.0):
+        self.client = client
+        self.wait = wait
+        self.retry_delay = retry_delay
+        self.last_id = None
+        self._subscribers = {}
+        self._lock = threading.Lock()
+        self._has_subscribers = threading.Condition(self._lock)
+        self._thread = None
+        self.stats = Counter()
+
+    def subscribe(self, callback: Callable[[list], None]) -> Callable[[], None]:
+        """
+        callback(messages) для каждой пачки новых сообщений; возвращает функцию отписки
+        """
+        token = object()
+        with self._lock:
+            self._subscribers[token] = callback
+            self._has_subscribers.notify()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="chat-feed", daemon=True)
+                self._thread.start()
+
+        def unsubscribe():
+            with self._lock:
+                self._subscribers.pop(token, None)
+
+        return unsubscribe
+
+    def _run(self):
+        delay = self.retry_delay
+        while True:
+            with self._lock:
+                while not self._subscribers:
+                    self._has_subscribers.wait()
+            try:
+                if self.last_id is None:
+                    latest, _ = self.client.chat_history(limit=1)
+                    self.last_id = latest[0]["id"] if latest else 0
+                messages = self.client.chat_updates(self.last_id, self.wait)
+            except requests.exceptions.RequestException:
+                self.stats["errors"] += 1
+                time.sleep(delay)
+                delay = min(delay * 2, 30)
+                continue
+            delay = self.retry_delay
+            self.stats["polls"] += 1
+            if not messages:
+                continue
+            self.last_id = messages[-1]["id"]
+            with self._lock:
+                subscribers = list(self._subscribers.values())
+            for callback in subscribers:
+                try:
+                    callback(messages)
+                except Exception as exc:
+                    print(f"Ошибка при доставке сообщений чата: {exc}")
+
+
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="api")
+
+api = ApiClient()
+chat_feed = ChatFeed(api)
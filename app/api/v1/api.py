@@ -1,5 +1,5 @@
 from fastapi import APIRouter
-from .endpoints import players, news, games, teams, leaderboard
+from .endpoints import players, news, games, teams, leaderboard, chat, stream, images, internal
 
 api_router = APIRouter()
 
@@ -7,4 +7,8 @@ api_router.include_router(players.router, prefix="/players", tags=["players"])
 api_router.include_router(news.router, prefix="/news", tags=["news"])
 api_router.include_router(games.router, prefix="/games", tags=["games"])
 api_router.include_router(teams.router, prefix="/teams", tags=["teams"])
-api_router.include_router(leaderboard.router, prefix="/leaderboard", tags=["leaderboard"])
\ No newline at end of file
+api_router.include_router(leaderboard.router, prefix="/leaderboard", tags=["leaderboard"])
+api_router.include_router(chat.router, prefix="/chat", tags=["chat"])
+api_router.include_router(stream.router, prefix="/stream", tags=["stream"])
+api_router.include_router(images.router, prefix="/img", tags=["images"])
+api_router.include_router(internal.router, prefix="/_internal", tags=["internal"])
\ No newline at end of file
@@ -0,0 +1,50 @@
+from fastapi import APIRouter, Depends, Query, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from ....core.config import settings
+from ....core.database import get_db
+from ....core.pagination import decode_cursor, set_next_cursor
+from ....core.responses import json_response
+from ....schemas.chat import ChatMessage, ChatMessageCreate
+from ....services.chat import chat_log
+
+router = APIRouter()
+
+# История чата не кэшируется: новые сообщения должны быть видны сразу
+NO_STORE = {"Cache-Control": "no-store"}
+
+@router.get("/messages", response_model=List[ChatMessage])
+async def get_messages(
+    response: Response,
+    limit: int = Query(default=50, ge=1, le=200),
+    cursor: Optional[str] = Query(default=None, description="Курсор из X-Next-Cursor (более старые сообщения)"),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    История чата от новых сообщений к старым
+    """
+    before = decode_cursor(cursor, int)[0] if cursor else None
+    messages = await chat_log.page(db, limit, before)
+    set_next_cursor(response, messages, limit, lambda item: (item.id,))
+    return json_response(List[ChatMessage], messages, headers={**response.headers, **NO_STORE})
+
+@router.get("/messages/updates", response_model=List[ChatMessage])
+async def get_message_updates(
+    after: int = Query(..., ge=0, description="id последнего полученного сообщения"),
+    limit: int = Query(default=100, ge=1, le=500),
+    wait: float = Query(default=0, ge=0, le=settings.CHAT_POLL_TIMEOUT, description="Сколько секунд ждать новых сообщений"),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Сообщения новее after по возрастанию id (long-poll: если их нет, ответ
+    ждёт первое новое сообщение не дольше wait секунд)
+    """
+    messages = await chat_log.updates(db, after, limit, wait)
+    return json_response(List[ChatMessage], messages, headers=NO_STORE)
+
+@router.post("/messages", response_model=ChatMessage)
+async def post_message(
+    message: ChatMessageCreate,
+    db: AsyncSession = Depends(get_db)
+):
+    return json_response(ChatMessage, await chat_log.post(db, message))
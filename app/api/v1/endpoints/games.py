@@ -1,138 +1,278 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from datetime import datetime
+from ....core.cache import cache
 from ....core.database import get_db
+from ....core.http_cache import conditional_json, page_fingerprint
+from ....core.export import ExportFormat, export_response
+from ....core.pagination import MAX_LIMIT, decode_cursor, set_next_cursor
+from ....core.responses import json_response
 from ....schemas.game import GameCreate, GameUpdate, GameInDB
+from ....schemas.box_score import BoxScoreLine, BoxScoreInDB
 from ....schemas.player import GenderType
 from ....models.game import Game
 from ....models.team import Team
 from ....models.player import Player
+from ....models.box_score import BoxScore
+from ....services.box_scores import remove_box_score, save_box_score
+from ....services.games import schedule_games_played
+from ....services.standings import is_finished, schedule_team_standings
+from ....services.stream import GAME_SCORE_CHANGED, publish_event
 router = APIRouter()
 
+# Поля игры, от которых зависит турнирная таблица
+STANDINGS_FIELDS = {"gender", "team_name", "score_black_bears", "score_opponent"}
+
+def _page_by_date_desc(query, skip: int, cursor: Optional[str]):
+    """
+    Сортировка от новых к старым; id разрешает совпадения по date_time,
+    чтобы keyset-курсор однозначно указывал на строку
+    """
+    query = query.order_by(Game.date_time.desc(), Game.id.desc())
+    if cursor:
+        last_date_time, last_id = decode_cursor(cursor, datetime, int)
+        return query.where(tuple_(Game.date_time, Game.id) < (last_date_time, last_id))
+    return query.offset(skip)
+
+def _game_filters(gender, start_date, end_date, team_name) -> list:
+    conditions = []
+    if gender:
+        conditions.append(Game.gender == gender)
+    if start_date:
+        conditions.append(Game.date_time >= start_date)
+    if end_date:
+        conditions.append(Game.date_time <= end_date)
+    if team_name:
+        conditions.append(Game.team_name == team_name)
+    return conditions
+
+def _cache_tags(*genders) -> list:
+    """
+    Теги кэша списков игр: по полу и для списков без фильтра по полу
+    """
+    return ["games:all", *(f"games:{gender.value}" for gender in genders if gender is not None)]
+
 @router.get("/", response_model=List[GameInDB])
-def get_games(
+async def get_games(
+    request: Request,
+    response: Response,
     skip: int = 0,
-    limit: int = 100,
+    limit: int = Query(default=100, ge=1, le=MAX_LIMIT),
+    cursor: Optional[str] = Query(default=None, description="Курсор из X-Next-Cursor; если задан, skip не используется"),
     gender: Optional[GenderType] = None,
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
     team_name: Optional[str] = None,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Получить список игр с возможностью фильтрации
     """
-    query = db.query(Game)
-    if gender:
-        query = query.filter(Game.gender == gender)
-    if start_date:
-        query = query.filter(Game.date_time >= start_date)
-    if end_date:
-        query = query.filter(Game.date_time <= end_date)
-    if team_name:
-        query = query.filter(Game.team_name == team_name)
-    
-    query = query.order_by(Game.date_time.desc())
-    games = query.offset(skip).limit(limit).all()
-    return games
+    def page(*columns):
+        query = select(*columns).where(*_game_filters(gender, start_date, end_date, team_name))
+        return _page_by_date_desc(query, skip, cursor).limit(limit)
+
+    async def load():
+        games = (await db.scalars(page(Game))).all()
+        set_next_cursor(response, games, limit, lambda item: (item.date_time, item.id))
+        return games
+
+    async def fingerprint():
+        return await page_fingerprint(db, page(Game.id, Game.updated_at))
+
+    return await conditional_json(request, response, List[GameInDB], load, fingerprint)
+
+@router.get("/export", response_class=StreamingResponse)
+async def export_games(
+    gender: Optional[GenderType] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    team_name: Optional[str] = None,
+    export_format: ExportFormat = Query(default="ndjson", alias="format")
+):
+    """
+    Выгрузить все игры (с теми же фильтрами, что и список) потоком
+    """
+    query = select(Game).where(*_game_filters(gender, start_date, end_date, team_name))
+    query = query.order_by(Game.date_time.desc(), Game.id.desc())
+    return export_response(query, GameInDB, export_format, "games")
 
 @router.get("/upcoming", response_model=List[GameInDB])
-def get_upcoming_games(
-    limit: int = 10,
+async def get_upcoming_games(
+    request: Request,
+    response: Response,
+    limit: int = Query(default=10, ge=1, le=MAX_LIMIT),
     gender: GenderType = None,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Получить список предстоящих игр
     """
-    query = db.query(Game).filter(Game.date_time >= datetime.now())
-    if gender:
-        query = query.filter(Game.gender == gender)
-    query = query.order_by(Game.date_time.asc())
-    games = query.limit(limit).all()
-    return games
+    # Граница фиксируется один раз, чтобы отпечаток и выдача видели одни и те же строки
+    now = datetime.now()
+
+    def page(*columns):
+        query = select(*columns).where(Game.date_time >= now)
+        if gender:
+            query = query.where(Game.gender == gender)
+        return query.order_by(Game.date_time.asc()).limit(limit)
+
+    async def load():
+        return (await db.scalars(page(Game))).all()
+
+    async def fingerprint():
+        return await page_fingerprint(db, page(Game.id, Game.updated_at))
+
+    tags = [f"games:{gender.value}"] if gender else ["games:all"]
+    return await conditional_json(request, response, List[GameInDB], load, fingerprint, cache_tags=tags)
 
 @router.get("/results", response_model=List[GameInDB])
-def get_game_results(
+async def get_game_results(
+    request: Request,
+    response: Response,
     skip: int = 0,
-    limit: int = 100,
+    limit: int = Query(default=100, ge=1, le=MAX_LIMIT),
+    cursor: Optional[str] = Query(default=None, description="Курсор из X-Next-Cursor; если задан, skip не используется"),
     gender: GenderType = None,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Получить результаты прошедших игр
     """
-    query = db.query(Game).filter(
-        Game.date_time < datetime.now(),
-        Game.score_black_bears.isnot(None),
-        Game.score_opponent.isnot(None)
-    )
-    if gender:
-        query = query.filter(Game.gender == gender)
-    query = query.order_by(Game.date_time.desc())
-    games = query.offset(skip).limit(limit).all()
-    return games
+    now = datetime.now()
+
+    def page(*columns):
+        query = select(*columns).where(
+            Game.date_time < now,
+            Game.score_black_bears.isnot(None),
+            Game.score_opponent.isnot(None)
+        )
+        if gender:
+            query = query.where(Game.gender == gender)
+        return _page_by_date_desc(query, skip, cursor).limit(limit)
+
+    async def load():
+        games = (await db.scalars(page(Game))).all()
+        set_next_cursor(response, games, limit, lambda item: (item.date_time, item.id))
+        return games
+
+    async def fingerprint():
+        return await page_fingerprint(db, page(Game.id, Game.updated_at))
+
+    tags = [f"games:{gender.value}"] if gender else ["games:all"]
+    return await conditional_json(request, response, List[GameInDB], load, fingerprint, cache_tags=tags)
+
+async def _check_teams(db: AsyncSession, games: List[GameCreate]):
+    """
+    Одним запросом проверяет, что команды всех игр существуют и их пол
+    совпадает с полом игры
+    """
+    names = {game.team_name for game in games}
+    teams = dict((await db.execute(select(Team.name, Team.gender).where(Team.name.in_(names)))).all())
+    missing = sorted(names - teams.keys())
+    if missing:
+        detail = "Команда не найдена" if len(names) == 1 else f"Команды не найдены: {', '.join(missing)}"
+        raise HTTPException(status_code=404, detail=detail)
+
+    mismatched = sorted({game.team_name for game in games if teams[game.team_name] != game.gender})
+    if mismatched:
+        detail = "Пол команды не соответствует полу, указанному для игры"
+        raise HTTPException(
+            status_code=400,
+            detail=detail if len(names) == 1 else f"{detail}: {', '.join(mismatched)}"
+        )
+
+def _standings_teams(*games) -> set:
+    """
+    Соперники (пол, название) сыгранных игр — их строки таблицы нужно обновить
+    """
+    return {(game.gender, game.team_name) for game in games if is_finished(game)}
+
+async def _commit(db: AsyncSession, genders, standings_teams=()):
+    """
+    Фиксирует изменения игр. Если менялся счёт сыгранных игр, в той же
+    транзакции ставится обновление строк турнирной таблицы их соперников
+    (и нашей команды): оно выполняется в фоне, после ответа
+    """
+    await schedule_team_standings(db, standings_teams)
+    await db.commit()
+    await cache.invalidate(*_cache_tags(*genders))
 
 @router.post("/", response_model=GameInDB)
-def create_game(
+async def create_game(
     game: GameCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Создать новую игру
     """
-    # Проверяем существование команды
-    team = db.query(Team).filter(Team.name == game.team_name).first()
-    if not team:
-        raise HTTPException(status_code=404, detail="Команда не найдена")
-    
-    if team.gender != game.gender:
-        raise HTTPException(
-            status_code=400,
-            detail="Пол команды не соответствует полу, указанному для игры"
-        )
-    
+    await _check_teams(db, [game])
+
     db_game = Game(**game.model_dump())
+    db.add(db_game)
+    await schedule_games_played(db, [db_game])
+    await _commit(db, [db_game.gender], _standings_teams(db_game))
+    await db.refresh(db_game)
+    return json_response(GameInDB, db_game)
 
-    players = db.query(Player).filter(Player.gender == game.gender)
-    for player in players:
-        player.games_played += 1
+@router.post("/bulk", response_model=List[GameInDB])
+async def create_games_bulk(
+    games: List[GameCreate] = Body(..., min_length=1),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Импортировать список игр (например, расписание сезона) одной транзакцией
+    """
+    await _check_teams(db, games)
 
-    db.add(db_game)
-    db.commit()
-    db.refresh(db_game)
-    return db_game
+    db_games = [Game(**game.model_dump()) for game in games]
+    db.add_all(db_games)
+    # flush вставляет все игры пакетным INSERT ... RETURNING и заполняет id
+    await db.flush()
+    await schedule_games_played(db, db_games)
+    await _commit(db, {game.gender for game in db_games}, _standings_teams(*db_games))
+    return json_response(List[GameInDB], db_games)
 
 @router.get("/{game_id}", response_model=GameInDB)
-def get_game(
+async def get_game(
+    request: Request,
+    response: Response,
     game_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Получить информацию о конкретной игре
     """
-    game = db.query(Game).filter(Game.id == game_id).first()
+    game = await db.get(Game, game_id)
     if game is None:
         raise HTTPException(status_code=404, detail="Игра не найдена")
-    return game
+
+    async def load():
+        return game
+
+    return await conditional_json(
+        request, response, GameInDB, load, (game.updated_at, game.id), last_modified_exact=True
+    )
 
 @router.put("/{game_id}", response_model=GameInDB)
-def update_game(
+async def update_game(
     game_id: int,
     game: GameUpdate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Обновить информацию об игре
     """
-    db_game = db.query(Game).filter(Game.id == game_id).first()
+    db_game = await db.get(Game, game_id)
     if db_game is None:
         raise HTTPException(status_code=404, detail="Игра не найдена")
     
     # Если меняется команда-оппонент, проверяем её существование и пол
     if game.team_name is not None:
-        team = db.query(Team).filter(Team.name == game.team_name).first()
+        team = await db.scalar(select(Team).where(Team.name == game.team_name))
         if not team:
             raise HTTPException(status_code=404, detail="Команда не найдена")
         
@@ -143,25 +283,84 @@ def update_game(
                 detail="Пол команды не соответствует полу, указанному для игры"
             )
     
-    for field, value in game.model_dump(exclude_unset=True).items():
+    previous_gender = db_game.gender
+    previous_teams = _standings_teams(db_game)
+    was_finished = is_finished(db_game)
+    previous_score = (db_game.score_black_bears, db_game.score_opponent)
+    update_data = game.model_dump(exclude_unset=True)
+    for field, value in update_data.items():
         setattr(db_game, field, value)
     
-    db.commit()
-    db.refresh(db_game)
-    return db_game
+    # Таблицу затрагивают только изменения счёта, соперника или пола сыгранной игры
+    affects_standings = (was_finished or is_finished(db_game)) and STANDINGS_FIELDS & update_data.keys()
+    genders = {previous_gender, db_game.gender}
+    await _commit(db, genders, previous_teams | _standings_teams(db_game) if affects_standings else ())
+    await db.refresh(db_game)
+    if (db_game.score_black_bears, db_game.score_opponent) != previous_score:
+        await publish_event(GAME_SCORE_CHANGED, {
+            "id": db_game.id,
+            "gender": db_game.gender.value,
+            "team_name": db_game.team_name,
+            "score_black_bears": db_game.score_black_bears,
+            "score_opponent": db_game.score_opponent,
+        })
+    return json_response(GameInDB, db_game)
 
 @router.delete("/{game_id}")
-def delete_game(
+async def delete_game(
     game_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Удалить игру
     """
-    db_game = db.query(Game).filter(Game.id == game_id).first()
+    db_game = await db.get(Game, game_id)
     if db_game is None:
         raise HTTPException(status_code=404, detail="Игра не найдена")
     
-    db.delete(db_game)
-    db.commit()
-    return {"message": "Игра успешно удалена"} 
\ No newline at end of file
+    await remove_box_score(db, game_id)
+    await db.delete(db_game)
+    await _commit(db, [db_game.gender], _standings_teams(db_game))
+    return {"message": "Игра успешно удалена"}
+
+@router.get("/{game_id}/boxscore", response_model=List[BoxScoreInDB])
+async def get_box_score(
+    game_id: int,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Получить протокол игры
+    """
+    query = select(BoxScore).where(BoxScore.game_id == game_id).order_by(BoxScore.player_id)
+    return json_response(List[BoxScoreInDB], (await db.scalars(query)).all())
+
+@router.post("/{game_id}/boxscore", response_model=List[BoxScoreInDB])
+async def save_game_box_score(
+    game_id: int,
+    lines: List[BoxScoreLine] = Body(..., min_length=1),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Загрузить протокол игры целиком: строки по всем игрокам состава.
+    Повторная загрузка заменяет строки этих игроков, сезонные итоги
+    сдвигаются на разницу
+    """
+    # Блокировка строки игры упорядочивает параллельные загрузки протокола
+    db_game = await db.get(Game, game_id, with_for_update=True)
+    if db_game is None:
+        raise HTTPException(status_code=404, detail="Игра не найдена")
+
+    player_ids = [line.player_id for line in lines]
+    if len(set(player_ids)) != len(player_ids):
+        raise HTTPException(status_code=400, detail="Игрок указан в протоколе несколько раз")
+    genders = dict((await db.execute(select(Player.id, Player.gender).where(Player.id.in_(player_ids)))).all())
+    missing = sorted(set(player_ids) - genders.keys())
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Игроки не найдены: {', '.join(map(str, missing))}")
+    if any(gender != db_game.gender for gender in genders.values()):
+        raise HTTPException(status_code=400, detail="Пол игрока не соответствует полу, указанному для игры")
+
+    await save_box_score(db, game_id, lines)
+    await db.commit()
+    query = select(BoxScore).where(BoxScore.game_id == game_id, BoxScore.player_id.in_(player_ids))
+    return json_response(List[BoxScoreInDB], (await db.scalars(query.order_by(BoxScore.player_id))).all())
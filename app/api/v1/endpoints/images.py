@@ -0,0 +1,48 @@
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from typing import Optional
+from ....core.config import settings
+from ....core.http_cache import etag_matches
+from ....core.images import signature_valid, width_bucket
+from ....services.images import IMAGE_REQUESTS, ImageError, image_proxy, media_type, negotiate
+
+router = APIRouter()
+
+# По тому же URL со временем может оказаться другое изображение: копия
+# хранится IMAGE_SOURCE_TTL, затем перепроверяется по ETag (хэш исходника)
+IMAGE_CACHE_CONTROL = f"public, max-age={settings.IMAGE_SOURCE_TTL}"
+
+
+@router.get(
+    "",
+    response_class=Response,
+    responses={200: {"content": {"image/avif": {}, "image/webp": {}, "image/jpeg": {}, "image/png": {}}}},
+)
+async def get_image(
+    request: Request,
+    src: str = Query(..., max_length=2048, description="Ссылка на исходное изображение (image_url, logo_url)"),
+    w: int = Query(
+        default=settings.IMAGE_DEFAULT_WIDTH, ge=1, le=4096,
+        description="Ширина в пикселях, округляется вверх до одной из IMAGE_WIDTHS",
+    ),
+    s: Optional[str] = Query(default=None, description="Подпись ссылки (если задан IMAGE_SIGNING_KEY)"),
+):
+    """
+    Уменьшенная копия изображения в AVIF, WebP или JPEG по заголовку Accept.
+
+    Ссылки на копии приходят в полях image (новости, игроки) и logo
+    (команды) как src и srcset. Исходник загружается один раз, копии
+    хранятся в дисковом кэше; клиенты и CDN кэшируют ответ на
+    IMAGE_SOURCE_TTL и затем перепроверяют его по ETag (Vary: Accept).
+    """
+    if not signature_valid(src, s):
+        raise HTTPException(status_code=403, detail="Неверная подпись ссылки")
+    try:
+        data, key = await image_proxy.get(src, width_bucket(w), negotiate(request.headers.get("accept")))
+    except ImageError as exc:
+        IMAGE_REQUESTS.inc("error")
+        raise HTTPException(status_code=exc.status_code, detail=exc.detail)
+    headers = {"ETag": f'"{key}"', "Cache-Control": IMAGE_CACHE_CONTROL, "Vary": "Accept"}
+    if etag_matches(request, headers["ETag"]):
+        IMAGE_REQUESTS.inc("not_modified")
+        return Response(status_code=304, headers=headers)
+    return Response(data, media_type=media_type(data), headers=headers)
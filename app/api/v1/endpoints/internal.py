@@ -0,0 +1,11 @@
+from fastapi import APIRouter
+from ....core.database import pool_status
+
+router = APIRouter()
+
+@router.get("/pool")
+async def get_pool_status():
+    """
+    Телеметрия пула соединений: занятые соединения, overflow и время ожидания
+    """
+    return pool_status()
\ No newline at end of file
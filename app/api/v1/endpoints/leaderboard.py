@@ -1,50 +1,130 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
+from ....core.cache import cache
 from ....core.database import get_db
-from ....schemas.leaderboard import LeaderboardCreate, LeaderboardUpdate, LeaderboardInDB, LeaderboardBase
+from ....core.export import ExportFormat, export_response
+from ....core.http_cache import conditional_json, page_fingerprint
+from ....schemas.leaderboard import LeaderboardCreate, LeaderboardUpdate, LeaderboardInDB, LeaderboardBase, Standing
 from ....models.leaderboard import Leaderboard
+from ....models.standing import Standing as StandingModel
+from ....services.standings import refresh_standings, standings_changed
 from ....schemas.player import GenderType
 router = APIRouter()
 
-@router.get("/", response_model=List[LeaderboardInDB])
-def get_leaderboard(
+@router.get("/", response_model=List[Standing])
+async def get_leaderboard(
+    request: Request,
+    response: Response,
     gender: GenderType = Query(default=GenderType.MALE),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    return db.query(Leaderboard).filter(Leaderboard.gender == gender).order_by(Leaderboard.position.asc()).all()
+    """
+    Турнирная таблица, рассчитанная по сыгранным играм
+    """
+    def page(*columns):
+        return select(*columns).where(StandingModel.gender == gender).order_by(StandingModel.position.asc())
 
-@router.post("/", response_model=LeaderboardInDB)
-def create_leaderboard(
+    async def load():
+        return (await db.scalars(page(StandingModel))).all()
+
+    async def fingerprint():
+        return await page_fingerprint(db, page(StandingModel.position.label("id"), StandingModel.updated_at))
+
+    return await conditional_json(
+        request, response, List[Standing], load, fingerprint, cache_tags=[f"standings:{gender.value}"]
+    )
+
+@router.get("/legacy", response_model=List[LeaderboardInDB], deprecated=True)
+async def get_legacy_leaderboard(
+    request: Request,
+    response: Response,
+    gender: GenderType = Query(default=GenderType.MALE),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Строки leaderboard, заполняемые вручную (POST/PUT/DELETE /leaderboard)
+    """
+    def page(*columns):
+        return select(*columns).where(Leaderboard.gender == gender).order_by(Leaderboard.position.asc())
+
+    async def load():
+        return (await db.scalars(page(Leaderboard))).all()
+
+    async def fingerprint():
+        return await page_fingerprint(db, page(Leaderboard.id, Leaderboard.updated_at))
+
+    return await conditional_json(
+        request, response, List[LeaderboardInDB], load, fingerprint, cache_tags=[f"leaderboard:{gender.value}"]
+    )
+
+@router.get("/export", response_class=StreamingResponse)
+async def export_leaderboard(
+    gender: Optional[GenderType] = None,
+    export_format: ExportFormat = Query(default="ndjson", alias="format")
+):
+    """
+    Выгрузить турнирную таблицу (всех полов или одного) потоком
+    """
+    query = select(StandingModel)
+    if gender:
+        query = query.where(StandingModel.gender == gender)
+    query = query.order_by(StandingModel.gender, StandingModel.position)
+    return export_response(query, Standing, export_format, "leaderboard")
+
+@router.post("/refresh")
+async def refresh_leaderboard(
+    gender: Optional[GenderType] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Полностью пересчитать турнирную таблицу из игр (например, после миграции)
+    """
+    genders = [gender] if gender else list(GenderType)
+    await refresh_standings(db, genders)
+    await db.commit()
+    await standings_changed(genders)
+    return {"message": "Турнирная таблица пересчитана"}
+
+# Ручное редактирование строк leaderboard оставлено для совместимости
+# (читаются через GET /legacy); турнирная таблица считается из games
+@router.post("/", response_model=LeaderboardInDB, deprecated=True)
+async def create_leaderboard(
     leaderboard: LeaderboardCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     
     new_command = Leaderboard(**leaderboard.model_dump())
     db.add(new_command)
-    db.commit()
-    db.refresh(new_command)
+    await db.commit()
+    await db.refresh(new_command)
+    await cache.invalidate(f"leaderboard:{new_command.gender.value}")
     return new_command
 
-@router.delete("/{leaderboard_id}", response_model=LeaderboardInDB)
-def delete_leaderboard(
+@router.delete("/{leaderboard_id}", response_model=LeaderboardInDB, deprecated=True)
+async def delete_leaderboard(
     leaderboard_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    leaderboard = db.query(Leaderboard).filter(Leaderboard.id == leaderboard_id).first()
-    db.delete(leaderboard)
-    db.commit()
+    leaderboard = await db.get(Leaderboard, leaderboard_id)
+    await db.delete(leaderboard)
+    await db.commit()
+    await cache.invalidate(f"leaderboard:{leaderboard.gender.value}")
     return leaderboard
 
-@router.put("/{leaderboard_id}", response_model=LeaderboardInDB)
-def update_leaderboard(
+@router.put("/{leaderboard_id}", response_model=LeaderboardInDB, deprecated=True)
+async def update_leaderboard(
     leaderboard_id: int,
     leaderboard: LeaderboardUpdate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    leaderboard_to_update = db.query(Leaderboard).filter(Leaderboard.id == leaderboard_id).first()
+    leaderboard_to_update = await db.get(Leaderboard, leaderboard_id)
+    previous_gender = leaderboard_to_update.gender
     for k, v in leaderboard.model_dump().items():
         if v is not None:
             setattr(leaderboard_to_update, k, v)
-    db.commit()
+    await db.commit()
+    await cache.invalidate(*{f"leaderboard:{g.value}" for g in (previous_gender, leaderboard_to_update.gender)})
     return leaderboard_to_update
@@ -1,42 +1,124 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from typing import List
-from sqlalchemy import func
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from typing import List, Literal, Optional
+import datetime
+from sqlalchemy import cast, func, select, tuple_
+from sqlalchemy.dialects.postgresql import DOUBLE_PRECISION
+from ....core.cache import cache
 from ....core.database import get_db
-from ....schemas.news import NewsCreate, NewsUpdate, News, TagCreate, Tag
+from ....core.http_cache import conditional_json, page_fingerprint
+from ....core.export import ExportFormat, export_response
+from ....core.pagination import MAX_LIMIT, decode_cursor, set_next_cursor
+from ....core.responses import json_response
+from ....schemas.news import NewsCreate, NewsUpdate, News, NewsSearchHit, TagCreate, Tag
 from ....models.news import News as NewsModel, Tag as TagModel
+from ....services.stream import NEWS_CREATED, NEWS_UPDATED, news_event_data, publish_event
+from ....services.tags import TAGS_ALL, resolve_tags, tag_filter
 
 router = APIRouter()
 
+# Конфигурация полнотекстового поиска совпадает с выражением news.search_vector
+SEARCH_CONFIG = "russian"
+HEADLINE_OPTIONS = "StartSel=<b>, StopSel=</b>, MaxWords=35, MinWords=15, MaxFragments=2"
+
 @router.get("/", response_model=List[News])
-def get_news(
+async def get_news(
+    request: Request,
+    response: Response,
     skip: int = 0,
-    limit: int = 100,
+    limit: int = Query(default=100, ge=1, le=MAX_LIMIT),
+    cursor: Optional[str] = Query(default=None, description="Курсор из X-Next-Cursor; если задан, skip не используется"),
     tags: List[str] = Query(default=[]),
-    db: Session = Depends(get_db)
+    tags_mode: Literal["all", "any"] = Query(default=TAGS_ALL, description="all — все теги сразу, any — хотя бы один"),
+    db: AsyncSession = Depends(get_db)
 ):
-    query = db.query(NewsModel)
-    if tags:
-        query = query.join(NewsModel.tags).filter(TagModel.name.in_(tags))
-        query = query.group_by(NewsModel.id).having(func.count(NewsModel.id) == len(tags))
-    
-    query = query.order_by(NewsModel.id.desc())
-    news = query.offset(skip).limit(limit).all()
-    return news
+    conditions = await tag_filter(db, tags, tags_mode) if tags else []
+
+    def page(*columns):
+        query = select(*columns).where(*conditions)
+        query = query.order_by(NewsModel.id.desc())
+        if cursor:
+            last_id, = decode_cursor(cursor, int)
+            query = query.where(NewsModel.id < last_id)
+        else:
+            query = query.offset(skip)
+        return query.limit(limit)
+
+    async def load():
+        news = (await db.scalars(page(NewsModel).options(selectinload(NewsModel.tags)))).all()
+        set_next_cursor(response, news, limit, lambda item: (item.id,))
+        return news
+
+    async def fingerprint():
+        return await page_fingerprint(db, page(NewsModel.id, NewsModel.updated_at))
+
+    return await conditional_json(request, response, List[News], load, fingerprint, cache_tags=["news"])
+
+@router.get("/export", response_class=StreamingResponse)
+async def export_news(
+    tags: List[str] = Query(default=[]),
+    tags_mode: Literal["all", "any"] = Query(default=TAGS_ALL, description="all — все теги сразу, any — хотя бы один"),
+    export_format: ExportFormat = Query(default="ndjson", alias="format"),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Выгрузить все новости потоком (NDJSON или JSON-массив)
+    """
+    conditions = await tag_filter(db, tags, tags_mode) if tags else []
+    query = select(NewsModel).where(*conditions).options(selectinload(NewsModel.tags)).order_by(NewsModel.id.desc())
+    return export_response(query, News, export_format, "news")
+
+@router.get("/search", response_model=List[NewsSearchHit])
+async def search_news(
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=200, description="Поисковый запрос (синтаксис websearch: фразы в кавычках, -исключение, or)"),
+    limit: int = Query(default=20, ge=1, le=100),
+    cursor: Optional[str] = Query(default=None, description="Курсор из X-Next-Cursor"),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Полнотекстовый поиск по заголовку и тексту новостей.
+
+    Совпадения ищутся по GIN-индексу search_vector, результаты упорядочены
+    по релевантности (ts_rank), фрагменты с подсветкой строятся только для
+    строк текущей страницы.
+    """
+    query = func.websearch_to_tsquery(SEARCH_CONFIG, q)
+    # ts_rank возвращает real; в double precision значение из курсора совпадает
+    # с пересчитанным точно при любом драйвере
+    rank = cast(func.ts_rank(NewsModel.search_vector, query), DOUBLE_PRECISION)
+    page = select(NewsModel.id, rank.label("rank")).where(NewsModel.search_vector.bool_op("@@")(query))
+    if cursor:
+        last_rank, last_id = decode_cursor(cursor, float, int)
+        page = page.where(tuple_(rank, NewsModel.id) < (last_rank, last_id))
+    page = page.order_by(rank.desc(), NewsModel.id.desc()).limit(limit).subquery("page")
+
+    snippet = func.ts_headline(SEARCH_CONFIG, NewsModel.content, query, HEADLINE_OPTIONS)
+    rows = (await db.execute(
+        select(NewsModel, page.c.rank, snippet)
+        .join(page, page.c.id == NewsModel.id)
+        .options(selectinload(NewsModel.tags))
+        .order_by(page.c.rank.desc(), NewsModel.id.desc())
+    )).all()
+
+    hits = []
+    for news, news_rank, news_snippet in rows:
+        # Поля ответа, которых нет в модели, кладём прямо на объект для NewsSearchHit
+        news.rank = news_rank
+        news.snippet = news_snippet
+        hits.append(news)
+    set_next_cursor(response, hits, limit, lambda item: (item.rank, item.id))
+    return json_response(List[NewsSearchHit], hits, headers=response.headers)
 
 @router.post("/", response_model=News)
-def create_news(
+async def create_news(
     news: NewsCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     # Создаем или получаем существующие теги
-    tags = []
-    for tag_name in news.tags:
-        tag = db.query(TagModel).filter(TagModel.name == tag_name).first()
-        if not tag:
-            tag = TagModel(name=tag_name)
-            db.add(tag)
-        tags.append(tag)
+    tags, created_tags = await resolve_tags(db, news.tags)
     
     # Создаем новость
     db_news = NewsModel(
@@ -46,52 +128,101 @@ def create_news(
         tags=tags
     )
     db.add(db_news)
-    db.commit()
-    db.refresh(db_news)
-    return db_news
+    # expire_on_commit отключён, теги уже в памяти: повторная загрузка не нужна
+    await db.commit()
+    await cache.invalidate("news", *(["tags"] if created_tags else []))
+    await publish_event(NEWS_CREATED, news_event_data([db_news.id]))
+    return json_response(News, db_news)
+
+@router.post("/bulk", response_model=List[News])
+async def create_news_bulk(
+    news: List[NewsCreate] = Body(..., min_length=1),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Импорт списка новостей одной транзакцией: теги всех новостей
+    разрешаются и создаются одним пакетом
+    """
+    tags, created_tags = await resolve_tags(db, (name for item in news for name in item.tags))
+    tags_by_name = {tag.name: tag for tag in tags}
+
+    db_news = [
+        NewsModel(
+            title=item.title,
+            content=item.content,
+            image_url=item.image_url,
+            tags=[tags_by_name[name] for name in dict.fromkeys(item.tags)]
+        )
+        for item in news
+    ]
+    db.add_all(db_news)
+    await db.commit()
+    await cache.invalidate("news", *(["tags"] if created_tags else []))
+    # Одно событие на весь импорт
+    await publish_event(NEWS_CREATED, news_event_data([item.id for item in db_news]))
+    return json_response(List[News], db_news)
 
 @router.get("/{news_id}", response_model=News)
-def get_news_by_id(
+async def get_news_by_id(
+    request: Request,
+    response: Response,
     news_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    news = db.query(NewsModel).filter(NewsModel.id == news_id).first()
+    news = await db.get(NewsModel, news_id)
     if news is None:
         raise HTTPException(status_code=404, detail="Новость не найдена")
-    return news
+
+    async def load():
+        # Теги нужны только для тела ответа, при 304 они не загружаются
+        await db.refresh(news, ["tags"])
+        return news
+
+    return await conditional_json(
+        request, response, News, load, (news.updated_at, news.id), last_modified_exact=True
+    )
 
 @router.put("/{news_id}", response_model=News)
-def update_news(
+async def update_news(
     news_id: int,
     news: NewsUpdate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    db_news = db.query(NewsModel).filter(NewsModel.id == news_id).first()
+    # Теги загружаем сразу: замена коллекции требует её текущего состояния
+    db_news = await db.get(NewsModel, news_id, options=[selectinload(NewsModel.tags)])
     if db_news is None:
         raise HTTPException(status_code=404, detail="Новость не найдена")
     
     # Обновляем основные поля
     update_data = news.model_dump(exclude_unset=True)
+    created_tags = False
     if "tags" in update_data:
-        tags = []
-        for tag_name in update_data["tags"]:
-            tag = db.query(TagModel).filter(TagModel.name == tag_name).first()
-            if not tag:
-                tag = TagModel(name=tag_name)
-                db.add(tag)
-            tags.append(tag)
+        tags, created_tags = await resolve_tags(db, update_data["tags"])
         db_news.tags = tags
+        # Замена тегов пишет только в news_tags, а отпечаток ETag строится по updated_at
+        db_news.updated_at = datetime.datetime.utcnow()
         del update_data["tags"]
     
     for field, value in update_data.items():
         setattr(db_news, field, value)
     
-    db.commit()
-    db.refresh(db_news)
-    return db_news
+    # expire_on_commit отключён, теги уже в памяти: повторная загрузка не нужна
+    await db.commit()
+    await cache.invalidate("news", *(["tags"] if created_tags else []))
+    await publish_event(NEWS_UPDATED, news_event_data([db_news.id]))
+    return json_response(News, db_news)
 
 @router.get("/tags/", response_model=List[Tag])
-def get_tags(
-    db: Session = Depends(get_db)
+async def get_tags(
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_db)
 ):
-    return db.query(TagModel).all() 
\ No newline at end of file
+    async def load():
+        return (await db.scalars(select(TagModel))).all()
+
+    async def fingerprint():
+        # Теги не редактируются и не удаляются: достаточно числа строк и последнего id
+        return (None, *(await db.execute(select(func.count(), func.max(TagModel.id)))).one())
+
+    return await conditional_json(request, response, List[Tag], load, fingerprint, cache_tags=["tags"])
\ No newline at end of file
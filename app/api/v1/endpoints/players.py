@@ -1,16 +1,49 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from ....core.database import get_db
+from ....core.http_cache import conditional_json, page_fingerprint
+from ....core.export import ExportFormat, export_response
+from ....core.pagination import MAX_LIMIT, decode_cursor, set_next_cursor
+from ....core.responses import json_response
 from ....schemas.player import PlayerCreate, PlayerUpdate, PlayerInDB, GenderType
 from ....models.player import Player
+from ....services.box_scores import rebuild_player_totals
 
 router = APIRouter()
 
+# Статистические поля сортируются по убыванию, id разрешает совпадения
+STAT_SORT_FIELDS = {
+    "points": Player.total_points,
+    "rebounds": Player.total_rebounds,
+    "assists": Player.total_assists,
+    "steals": Player.total_steals,
+    "blocks": Player.total_blocks,
+}
+
+def _player_filters(gender, search, min_games) -> list:
+    conditions = []
+    if gender:
+        conditions.append(Player.gender == gender)
+    if search:
+        pattern = f"%{search}%"
+        conditions.append(
+            (Player.first_name.ilike(pattern)) | 
+            (Player.last_name.ilike(pattern))
+        )
+    if min_games:
+        conditions.append(Player.games_played >= min_games)
+    return conditions
+
 @router.get("/", response_model=List[PlayerInDB])
-def get_players(
+async def get_players(
+    request: Request,
+    response: Response,
     skip: int = 0,
-    limit: int = 100,
+    limit: int = Query(default=100, ge=1, le=MAX_LIMIT),
+    cursor: Optional[str] = Query(default=None, description="Курсор из X-Next-Cursor; если задан, skip не используется"),
     gender: Optional[GenderType] = None,
     search: Optional[str] = None,
     min_games: Optional[int] = None,
@@ -18,7 +51,7 @@ def get_players(
         "name",
         description="Сортировка: name, points, rebounds, assists, steals, blocks"
     ),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Получить список игроков с возможностью фильтрации и сортировки.
@@ -28,74 +61,116 @@ def get_players(
     - search: поиск по имени/фамилии
     - min_games: минимальное количество сыгранных игр
     - sort_by: поле для сортировки (name, points, rebounds, assists, steals, blocks)
+    - cursor: keyset-курсор следующей страницы (привязан к sort_by)
     """
-    query = db.query(Player)
-    
-    # Применяем фильтры
-    if gender:
-        query = query.filter(Player.gender == gender)
-    if search:
-        search = f"%{search}%"
-        query = query.filter(
-            (Player.first_name.ilike(search)) | 
-            (Player.last_name.ilike(search))
-        )
-    if min_games:
-        query = query.filter(Player.games_played >= min_games)
-
     # Определяем сортировку
-    sort_field = {
-        "name": (Player.last_name.asc(), Player.first_name.asc()),
-        "points": Player.total_points.desc(),
-        "rebounds": Player.total_rebounds.desc(),
-        "assists": Player.total_assists.desc(),
-        "steals": Player.total_steals.desc(),
-        "blocks": Player.total_blocks.desc()
-    }.get(sort_by, (Player.last_name.asc(), Player.first_name.asc()))
-
-    # Применяем сортировку
-    if isinstance(sort_field, tuple):
-        query = query.order_by(*sort_field)
+    if sort_by not in STAT_SORT_FIELDS:
+        sort_by = "name"
+        key_columns = (Player.last_name, Player.first_name, Player.id)
+        order_by = [column.asc() for column in key_columns]
     else:
-        query = query.order_by(sort_field)
+        key_columns = (STAT_SORT_FIELDS[sort_by], Player.id)
+        order_by = [column.desc() for column in key_columns]
 
-    players = query.offset(skip).limit(limit).all()
-    return players
+    # Курсор хранит sort_by и значения ключа последней строки
+    key_filter = None
+    if cursor:
+        if sort_by == "name":
+            cursor_sort, *last_key = decode_cursor(cursor, str, str, str, int)
+            key_filter = tuple_(*key_columns) > tuple(last_key)
+        else:
+            cursor_sort, *last_key = decode_cursor(cursor, str, int, int)
+            key_filter = tuple_(*key_columns) < tuple(last_key)
+        if cursor_sort != sort_by:
+            raise HTTPException(status_code=400, detail="Курсор получен для другой сортировки")
+
+    def page(*columns):
+        query = select(*columns).where(*_player_filters(gender, search, min_games))
+
+        # Применяем сортировку и пагинацию
+        query = query.order_by(*order_by)
+        query = query.where(key_filter) if key_filter is not None else query.offset(skip)
+        return query.limit(limit)
+
+    async def load():
+        players = (await db.scalars(page(Player))).all()
+        set_next_cursor(
+            response, players, limit,
+            lambda player: (sort_by, *(getattr(player, column.key) for column in key_columns))
+        )
+        return players
+
+    async def fingerprint():
+        return await page_fingerprint(db, page(Player.id, Player.updated_at))
+
+    return await conditional_json(request, response, List[PlayerInDB], load, fingerprint)
+
+@router.get("/export", response_class=StreamingResponse)
+async def export_players(
+    gender: Optional[GenderType] = None,
+    search: Optional[str] = None,
+    min_games: Optional[int] = None,
+    export_format: ExportFormat = Query(default="ndjson", alias="format")
+):
+    """
+    Выгрузить всех игроков (с теми же фильтрами, что и список) потоком
+    """
+    query = select(Player).where(*_player_filters(gender, search, min_games)).order_by(Player.id)
+    return export_response(query, PlayerInDB, export_format, "players")
 
 @router.post("/", response_model=PlayerInDB)
-def create_player(
+async def create_player(
     player: PlayerCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     db_player = Player(**player.model_dump())
     db.add(db_player)
-    db.commit()
-    db.refresh(db_player)
-    return db_player
+    await db.commit()
+    await db.refresh(db_player)
+    return json_response(PlayerInDB, db_player)
+
+@router.post("/totals/rebuild")
+async def rebuild_totals(
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Пересчитать сезонные итоги всех игроков из протоколов игр
+    """
+    updated = await rebuild_player_totals(db)
+    await db.commit()
+    return {"message": "Итоги игроков пересчитаны", "updated": updated}
 
 @router.get("/{player_id}", response_model=PlayerInDB)
-def get_player(
+async def get_player(
+    request: Request,
+    response: Response,
     player_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    player = db.query(Player).filter(Player.id == player_id).first()
+    player = await db.get(Player, player_id)
     if player is None:
         raise HTTPException(status_code=404, detail="Игрок не найден")
-    return player
+
+    async def load():
+        return player
+
+    return await conditional_json(
+        request, response, PlayerInDB, load, (player.updated_at, player.id), last_modified_exact=True
+    )
 
 @router.put("/{player_id}", response_model=PlayerInDB)
-def update_player(
+async def update_player(
     player_id: int,
     player: PlayerUpdate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    db_player = db.query(Player).filter(Player.id == player_id).first()
+    db_player = await db.get(Player, player_id)
     if db_player is None:
         raise HTTPException(status_code=404, detail="Игрок не найден")
     
     for field, value in player.model_dump(exclude_unset=True).items():
         setattr(db_player, field, value)
     
-    db.commit()
-    db.refresh(db_player)
-    return db_player 
\ No newline at end of file
+    await db.commit()
+    await db.refresh(db_player)
+    return json_response(PlayerInDB, db_player)
\ No newline at end of file
@@ -0,0 +1,112 @@
+import asyncio
+from fastapi import APIRouter, Header, HTTPException, Query, Response, WebSocket, WebSocketDisconnect
+from typing import List, Literal, Optional
+from ....core.config import settings
+from ....services.stream import EVENT_TYPES, SlowConsumer, Subscriber, event_hub
+
+router = APIRouter()
+
+EventType = Literal[EVENT_TYPES]
+
+# Через сколько миллисекунд EventSource переподключается после обрыва
+SSE_RETRY_MS = 3000
+
+
+async def _watch_disconnect(receive, subscriber: Subscriber):
+    while (await receive())["type"] not in ("http.disconnect", "websocket.disconnect"):
+        pass
+    event_hub.close(subscriber)
+
+
+class EventStreamResponse(Response):
+    """
+    Ответ text/event-stream поверх ASGI без StreamingResponse: на подписчика
+    одна корутина отправки и одна задача, ждущая отключения клиента
+    """
+
+    media_type = "text/event-stream"
+
+    def __init__(self, subscriber: Subscriber):
+        # Как у StreamingResponse: без тела и без Content-Length
+        self.status_code = 200
+        self.background = None
+        self.init_headers({"Cache-Control": "no-store", "X-Accel-Buffering": "no"})
+        self.subscriber = subscriber
+
+    async def __call__(self, scope, receive, send):
+        subscriber = self.subscriber
+        watcher = asyncio.ensure_future(_watch_disconnect(receive, subscriber))
+        try:
+            await send({"type": "http.response.start", "status": 200, "headers": self.raw_headers})
+            await send({"type": "http.response.body", "body": f"retry: {SSE_RETRY_MS}\n\n".encode(), "more_body": True})
+            while True:
+                try:
+                    events = await event_hub.next_events(subscriber, settings.STREAM_HEARTBEAT)
+                except SlowConsumer:
+                    await send({"type": "http.response.body", "body": b": slow consumer\n\n", "more_body": True})
+                    break
+                if events is None:
+                    break
+                # Пустая пачка — пинг-комментарий: прокси не закрывают соединение
+                chunk = b"".join(event.sse for event in events) if events else b": ping\n\n"
+                await send({"type": "http.response.body", "body": chunk, "more_body": True})
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+        finally:
+            event_hub.unsubscribe(subscriber)
+            watcher.cancel()
+
+
+def _subscribe(types: List[str], last_event_id: Optional[int]) -> Subscriber:
+    subscriber = event_hub.subscribe(types, last_event_id)
+    if subscriber is None:
+        raise HTTPException(status_code=503, detail="Слишком много подписчиков, повторите позже")
+    return subscriber
+
+
+@router.get("", response_class=EventStreamResponse)
+async def stream_events(
+    types: List[EventType] = Query(default=[], description="Только события этих типов (по умолчанию все)"),
+    last_event_id: Optional[int] = Header(default=None, description="id последнего полученного события"),
+):
+    """
+    Поток событий об изменениях (Server-Sent Events): news.created,
+    news.updated, game.score_changed, leaderboard.changed и stream.resync.
+
+    В data — JSON {"id", "type", "data"}. После обрыва EventSource сам
+    переподключается с Last-Event-ID и получает пропущенные события из
+    буфера последних событий; подписчик, не успевающий читать поток,
+    отключается.
+    """
+    return EventStreamResponse(_subscribe(types, last_event_id))
+
+
+@router.websocket("")
+async def stream_events_ws(
+    websocket: WebSocket,
+    types: List[EventType] = Query(default=[]),
+    last_event_id: Optional[int] = Query(default=None),
+):
+    """
+    Тот же поток через WebSocket: каждое событие — текстовое сообщение с
+    JSON. Подписчик, не успевающий читать, закрывается с кодом 1013
+    """
+    subscriber = event_hub.subscribe(types, last_event_id)
+    if subscriber is None:
+        await websocket.close(code=1013)
+        return
+    await websocket.accept()
+    watcher = asyncio.ensure_future(_watch_disconnect(websocket.receive, subscriber))
+    try:
+        while True:
+            events = await event_hub.next_events(subscriber, settings.STREAM_HEARTBEAT)
+            if events is None:
+                break
+            for event in events:
+                await websocket.send_text(event.json)
+    except SlowConsumer:
+        await websocket.close(code=1013)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        event_hub.unsubscribe(subscriber)
+        watcher.cancel()
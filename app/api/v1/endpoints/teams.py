@@ -1,105 +1,146 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 from ....core.database import get_db
+from ....core.export import ExportFormat, export_response
+from ....core.http_cache import conditional_json, page_fingerprint
+from ....core.pagination import MAX_LIMIT
+from ....core.responses import json_response
 from ....schemas.team import TeamCreate, TeamUpdate, TeamInDB
 from ....models.team import Team
+from ....services.standings import schedule_standings
 
 router = APIRouter()
 
 @router.get("/", response_model=List[TeamInDB])
-def get_teams(
+async def get_teams(
+    request: Request,
+    response: Response,
     skip: int = 0,
-    limit: int = 100,
+    limit: int = Query(default=100, ge=1, le=MAX_LIMIT),
     gender: str = None,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Получить список команд с возможностью фильтрации по полу
     """
-    query = db.query(Team)
+    def page(*columns):
+        query = select(*columns)
+        if gender:
+            query = query.where(Team.gender == gender)
+        # Без явного порядка состав страницы offset/limit не определён
+        return query.order_by(Team.id).offset(skip).limit(limit)
+
+    async def load():
+        return (await db.scalars(page(Team))).all()
+
+    async def fingerprint():
+        return await page_fingerprint(db, page(Team.id, Team.updated_at))
+
+    return await conditional_json(request, response, List[TeamInDB], load, fingerprint)
+
+@router.get("/export", response_class=StreamingResponse)
+async def export_teams(
+    gender: str = None,
+    export_format: ExportFormat = Query(default="ndjson", alias="format")
+):
+    """
+    Выгрузить все команды потоком
+    """
+    query = select(Team)
     if gender:
-        query = query.filter(Team.gender == gender)
-    teams = query.offset(skip).limit(limit).all()
-    return teams
+        query = query.where(Team.gender == gender)
+    return export_response(query.order_by(Team.id), TeamInDB, export_format, "teams")
 
 @router.post("/", response_model=TeamInDB)
-def create_team(
+async def create_team(
     team: TeamCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Создать новую команду
     """
     db_team = Team(**team.model_dump())
     db.add(db_team)
-    db.commit()
-    db.refresh(db_team)
-    return db_team
+    await db.commit()
+    await db.refresh(db_team)
+    return json_response(TeamInDB, db_team)
 
 @router.get("/{team_id}", response_model=TeamInDB)
-def get_team(
+async def get_team(
+    request: Request,
+    response: Response,
     team_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Получить информацию о конкретной команде по ID
     """
-    team = db.query(Team).filter(Team.id == team_id).first()
+    team = await db.get(Team, team_id)
     if team is None:
         raise HTTPException(status_code=404, detail="Команда не найдена")
-    return team
+
+    async def load():
+        return team
+
+    return await conditional_json(
+        request, response, TeamInDB, load, (team.updated_at, team.id), last_modified_exact=True
+    )
 
 @router.put("/{team_id}", response_model=TeamInDB)
-def update_team(
+async def update_team(
     team_id: int,
     team: TeamUpdate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Обновить информацию о команде
     """
-    db_team = db.query(Team).filter(Team.id == team_id).first()
+    db_team = await db.get(Team, team_id)
     if db_team is None:
         raise HTTPException(status_code=404, detail="Команда не найдена")
+    previous = (db_team.name, db_team.gender)
     
     for field, value in team.model_dump(exclude_unset=True).items():
         setattr(db_team, field, value)
     
-    db.commit()
-    db.refresh(db_team)
-    return db_team
+    if (db_team.name, db_team.gender) != previous:
+        # Строки таблицы и счётчики команды привязаны к названию и полу:
+        # пересчёт обоих полов ставится в той же транзакции
+        await schedule_standings(db, {previous[1], db_team.gender})
+    await db.commit()
+    await db.refresh(db_team)
+    return json_response(TeamInDB, db_team)
 
 @router.delete("/{team_id}")
-def delete_team(
+async def delete_team(
     team_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Удалить команду
     """
-    db_team = db.query(Team).filter(Team.id == team_id).first()
+    db_team = await db.get(Team, team_id)
     if db_team is None:
         raise HTTPException(status_code=404, detail="Команда не найдена")
     
-    db.delete(db_team)
-    db.commit()
+    await db.delete(db_team)
+    await db.commit()
     return {"message": "Команда успешно удалена"}
 
-@router.put("/{team_id}/position", response_model=TeamInDB)
-def update_team_position(
+@router.put("/{team_id}/position", response_model=TeamInDB, deprecated=True)
+async def update_team_position(
     team_id: int,
     position: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
-    Обновить позицию команды в турнирной таблице
+    Позиция команды рассчитывается по сыгранным играм (GET /leaderboard)
+    и вручную не меняется
     """
-    db_team = db.query(Team).filter(Team.id == team_id).first()
+    db_team = await db.get(Team, team_id)
     if db_team is None:
         raise HTTPException(status_code=404, detail="Команда не найдена")
-    
-    db_team.current_position = position
-    db.commit()
-    db.refresh(db_team)
-    return db_team
+    raise HTTPException(status_code=409, detail="Позиция команды рассчитывается по сыгранным играм")
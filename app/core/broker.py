@@ -0,0 +1,264 @@
+import asyncio
+import logging
+import select
+import socket
+import threading
+import time
+from typing import Dict, Optional, Set
+from starlette.concurrency import run_in_threadpool
+from .config import settings
+
+logger = logging.getLogger("uvicorn.error")
+
+# Вместо сообщения подписчик получает GAP, если брокер переподключался и
+# часть сообщений могла пройти мимо: состояние, собранное из сообщений,
+# нужно перечитать из БД
+GAP = None
+
+
+class Subscription:
+    """
+    Подписка на канал брокера: async for payload in subscription.
+
+    Сообщения складываются в очередь в event loop подписчика, даже если
+    брокер получает их в другом потоке.
+    """
+
+    def __init__(self, broker, channel: str):
+        self.broker = broker
+        self.channel = channel
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue()
+
+    def deliver(self, payload: Optional[bytes]):
+        try:
+            self.loop.call_soon_threadsafe(self.queue.put_nowait, payload)
+        except RuntimeError:
+            # Event loop подписчика уже закрыт
+            pass
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> Optional[bytes]:
+        return await self.queue.get()
+
+    async def close(self):
+        await self.broker.unsubscribe(self)
+
+
+class MemoryBroker:
+    """
+    Брокер внутри одного процесса: publish() сразу раздаёт сообщение
+    подписчикам этого процесса. Другие воркеры и экземпляры API сообщений
+    не видят — подходит для разработки, бенчмарков и запуска в один процесс.
+    """
+
+    def __init__(self):
+        self._subscribers: Dict[str, Set[Subscription]] = {}
+        self._lock = threading.Lock()
+
+    async def publish(self, channel: str, payload: bytes):
+        self._fanout(channel, payload)
+
+    async def subscribe(self, channel: str) -> Subscription:
+        subscription = Subscription(self, channel)
+        with self._lock:
+            subscribers = self._subscribers.setdefault(channel, set())
+            first = not subscribers
+            subscribers.add(subscription)
+        if first:
+            await self._listen(channel)
+        return subscription
+
+    async def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+
+    async def close(self):
+        pass
+
+    async def _listen(self, channel: str):
+        pass
+
+    def _fanout(self, channel: str, payload: Optional[bytes]):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for subscription in subscribers:
+            subscription.deliver(payload)
+
+    def _gap(self):
+        with self._lock:
+            channels = list(self._subscribers)
+        for channel in channels:
+            self._fanout(channel, GAP)
+
+
+class PostgresBroker(MemoryBroker):
+    """
+    Брокер поверх LISTEN/NOTIFY в той же БД: сообщения видят все воркеры
+    и экземпляры API без отдельного сервиса.
+
+    Слушает отдельный поток с собственным соединением psycopg2 вне пула:
+    соединение с LISTEN должно жить всё время работы воркера. Поток
+    запускается при первой подписке, то есть уже в воркере после fork.
+    NOTIFY отправляется через второе такое же соединение; размер сообщения
+    в Postgres ограничен 8000 байтами.
+    """
+
+    RECONNECT_DELAY = 1.0  # в секундах
+
+    def __init__(self, dsn: str):
+        super().__init__()
+        self.dsn = dsn
+        self._publisher = None
+        self._publish_lock = threading.Lock()
+        self._thread = None
+        self._stopping = False
+        # Пробуждает поток слушателя, когда появился новый канал или пора
+        # завершаться; создаётся вместе с потоком, чтобы не делить его между
+        # процессами после fork
+        self._wakeup_reader = self._wakeup_writer = None
+
+    def _connect(self):
+        import psycopg2
+        connection = psycopg2.connect(self.dsn)
+        connection.autocommit = True
+        return connection
+
+    async def publish(self, channel: str, payload: bytes):
+        await run_in_threadpool(self._notify, channel, payload.decode())
+
+    def _notify(self, channel: str, payload: str):
+        import psycopg2
+        with self._publish_lock:
+            for attempt in range(2):
+                try:
+                    if self._publisher is None or self._publisher.closed:
+                        self._publisher = self._connect()
+                    with self._publisher.cursor() as cursor:
+                        cursor.execute("SELECT pg_notify(%s, %s)", (channel, payload))
+                    return
+                except psycopg2.OperationalError:
+                    # Соединение могло оборваться (перезапуск БД): одна повторная попытка
+                    self._publisher = None
+                    if attempt:
+                        raise
+
+    async def _listen(self, channel: str):
+        if self._thread is None:
+            self._stopping = False
+            self._wakeup_reader, self._wakeup_writer = socket.socketpair()
+            self._thread = threading.Thread(target=self._run, name="broker-listener", daemon=True)
+            self._thread.start()
+        self._wakeup_writer.send(b"\0")
+
+    def _run(self):
+        listening = set()
+        connection = None
+        lost = False
+        while not self._stopping:
+            try:
+                if connection is None:
+                    connection = self._connect()
+                    listening = set()
+                with self._lock:
+                    channels = set(self._subscribers) - listening
+                for channel in channels:
+                    with connection.cursor() as cursor:
+                        cursor.execute(f'LISTEN "{channel}"')
+                    listening.add(channel)
+                if lost:
+                    # Пока соединения не было, NOTIFY проходили мимо
+                    lost = False
+                    self._gap()
+                readable, _, _ = select.select([connection, self._wakeup_reader], [], [], 5.0)
+                if self._wakeup_reader in readable:
+                    self._wakeup_reader.recv(1024)
+                connection.poll()
+                while connection.notifies:
+                    notify = connection.notifies.pop(0)
+                    self._fanout(notify.channel, notify.payload.encode())
+            except Exception as exc:
+                if self._stopping:
+                    break
+                logger.warning("Брокер: соединение LISTEN потеряно (%s), переподключение", exc)
+                if connection is not None:
+                    connection.close()
+                connection = None
+                lost = lost or bool(listening)
+                time.sleep(self.RECONNECT_DELAY)
+        if connection is not None:
+            connection.close()
+
+    async def close(self):
+        self._stopping = True
+        if self._thread is not None:
+            self._wakeup_writer.send(b"\0")
+            await run_in_threadpool(self._thread.join, 5)
+            self._thread = None
+            self._wakeup_reader.close()
+            self._wakeup_writer.close()
+        with self._publish_lock:
+            if self._publisher is not None:
+                self._publisher.close()
+                self._publisher = None
+
+
+class RedisBroker(MemoryBroker):
+    """
+    Брокер поверх pub/sub Redis (redis.asyncio.Redis) для нескольких
+    экземпляров API; одно соединение подписки на воркер
+    """
+
+    def __init__(self, client):
+        super().__init__()
+        self.client = client
+        self._pubsub = None
+        self._reader = None
+
+    async def publish(self, channel: str, payload: bytes):
+        await self.client.publish(channel, payload)
+
+    async def _listen(self, channel: str):
+        if self._pubsub is None:
+            self._pubsub = self.client.pubsub()
+        await self._pubsub.subscribe(channel)
+        if self._reader is None:
+            self._reader = asyncio.create_task(self._read())
+
+    async def _read(self):
+        import redis.exceptions
+        while True:
+            try:
+                async for message in self._pubsub.listen():
+                    if message["type"] == "message":
+                        channel = message["channel"]
+                        self._fanout(channel.decode() if isinstance(channel, bytes) else channel, message["data"])
+            except redis.exceptions.ConnectionError as exc:
+                logger.warning("Брокер: соединение с Redis потеряно (%s), переподключение", exc)
+                await asyncio.sleep(PostgresBroker.RECONNECT_DELAY)
+                self._gap()
+
+    async def close(self):
+        if self._reader is not None:
+            self._reader.cancel()
+            self._reader = None
+        if self._pubsub is not None:
+            await self._pubsub.close()
+            self._pubsub = None
+
+
+def build_broker():
+    if settings.BROKER_BACKEND == "redis":
+        import redis.asyncio as redis
+        return RedisBroker(redis.from_url(settings.REDIS_URL))
+    if settings.BROKER_BACKEND == "postgres":
+        # psycopg2 понимает DSN без имени драйвера SQLAlchemy
+        return PostgresBroker(settings.DATABASE_URL.replace("postgresql+psycopg2://", "postgresql://"))
+    return MemoryBroker()
+
+
+broker = build_broker()
@@ -0,0 +1,239 @@
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Iterable, Optional
+from urllib.parse import urlencode
+from fastapi import Request
+from .broker import GAP, broker
+from .config import settings
+
+logger = logging.getLogger("uvicorn.error")
+
+# Канал брокера, по которому воркеры рассылают друг другу invalidate()
+CACHE_CHANNEL = "cache"
+
+
+class MemoryCache:
+    """
+    LRU-кэш в памяти процесса с TTL и ограничением по числу записей и байтам.
+
+    Каждая запись помечена тегами (например, "news" или "games:male");
+    invalidate(tag) удаляет все записи с этим тегом.
+
+    У каждого воркера свой экземпляр, поэтому invalidate() рассылается через
+    брокер: после start() воркер удаляет записи и по тегам, сброшенным в
+    других воркерах. Если брокер переподключался, кэш очищается целиком.
+
+    generation(tags) — поколение тегов: оно меняется при каждом их сбросе.
+    set() с generation не сохраняет запись, если теги успели сбросить
+    после того, как поколение было прочитано.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int, ttl: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires_at, value, tags)
+        self._tags = {}  # tag -> set(key)
+        self._generations = {}  # tag -> число сбросов
+        self._epoch = 0  # число полных очисток
+        self._bytes = 0
+        self._subscription = None
+        self._listener = None
+
+    async def start(self):
+        self._subscription = await broker.subscribe(CACHE_CHANNEL)
+        self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            self._listener = None
+        if self._subscription is not None:
+            await self._subscription.close()
+            self._subscription = None
+
+    async def _listen(self):
+        async for payload in self._subscription:
+            if payload is GAP:
+                # Часть invalidate() могла пройти мимо
+                self.clear()
+                continue
+            try:
+                self._invalidate(*json.loads(payload))
+            except (ValueError, TypeError) as exc:
+                logger.warning("Кэш: некорректное сообщение из брокера: %s", exc)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value, _ = entry
+        if expires_at < time.monotonic():
+            self._drop(key)
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def generation(self, tags: Iterable[str]):
+        return (self._epoch, *(self._generations.get(tag, 0) for tag in sorted(tags)))
+
+    async def set(
+        self, key: str, value: bytes, tags: Iterable[str], ttl: Optional[int] = None, generation=None
+    ):
+        tags = frozenset(tags)
+        if len(value) > self.max_bytes:
+            return
+        if generation is not None and generation != await self.generation(tags):
+            return
+        if key in self._entries:
+            self._drop(key)
+        self._entries[key] = (time.monotonic() + (ttl or self.ttl), value, tags)
+        self._bytes += len(value)
+        for tag in tags:
+            self._tags.setdefault(tag, set()).add(key)
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            self._drop(next(iter(self._entries)))
+
+    async def invalidate(self, *tags: str):
+        if not tags:
+            return
+        # Свой кэш — сразу, чтобы следующий запрос к этому воркеру увидел запись
+        self._invalidate(*tags)
+        if self._subscription is not None:
+            try:
+                await broker.publish(CACHE_CHANNEL, json.dumps(tags).encode())
+            except Exception as exc:
+                # Другие воркеры отдадут старые ответы не дольше CACHE_TTL
+                logger.warning("Кэш: не удалось разослать invalidate(%s): %s", ", ".join(tags), exc)
+
+    def _invalidate(self, *tags: str):
+        for tag in tags:
+            self._generations[tag] = self._generations.get(tag, 0) + 1
+            for key in list(self._tags.get(tag, ())):
+                self._drop(key)
+
+    def clear(self):
+        self._epoch += 1
+        self._entries.clear()
+        self._tags.clear()
+        self._bytes = 0
+
+    def _drop(self, key: str):
+        _, value, tags = self._entries.pop(key)
+        self._bytes -= len(value)
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+
+class RedisCache:
+    """
+    Общий для всех воркеров кэш поверх Redis-совместимого асинхронного клиента
+    (get/mget/incr/smembers/delete/pipeline), например redis.asyncio.Redis.
+
+    Ключи тега хранятся в множестве <prefix>tag:<tag>, поколение тега — в
+    счётчике <prefix>gen:<tag>. set() с generation пишет в транзакции под
+    WATCH этих счётчиков.
+    """
+
+    def __init__(self, client, ttl: int, prefix: str = "cache:"):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self.client.get(self.prefix + key)
+
+    def _generation_keys(self, tags: Iterable[str]) -> list:
+        return [f"{self.prefix}gen:{tag}" for tag in sorted(tags)]
+
+    async def generation(self, tags: Iterable[str]):
+        keys = self._generation_keys(tags)
+        return tuple(await self.client.mget(*keys)) if keys else ()
+
+    async def set(
+        self, key: str, value: bytes, tags: Iterable[str], ttl: Optional[int] = None, generation=None
+    ):
+        from redis.exceptions import WatchError
+
+        ttl = ttl or self.ttl
+        tags = set(tags)
+        keys = self._generation_keys(tags)
+        async with self.client.pipeline() as pipe:
+            if generation is not None and keys:
+                await pipe.watch(*keys)
+                if tuple(await pipe.mget(*keys)) != generation:
+                    return
+                pipe.multi()
+            pipe.set(self.prefix + key, value, ex=ttl)
+            for tag in tags:
+                tag_key = f"{self.prefix}tag:{tag}"
+                pipe.sadd(tag_key, key)
+                pipe.expire(tag_key, ttl)
+            try:
+                await pipe.execute()
+            except WatchError:
+                # Теги сбросили, пока тело загружалось из БД
+                pass
+
+    async def invalidate(self, *tags: str):
+        for tag in tags:
+            # Поколение — до удаления: запись, прочитанная до сброса, уже не сохранится
+            await self.client.incr(f"{self.prefix}gen:{tag}")
+            tag_key = f"{self.prefix}tag:{tag}"
+            keys = await self.client.smembers(tag_key)
+            names = [self.prefix + (key.decode() if isinstance(key, bytes) else key) for key in keys]
+            await self.client.delete(tag_key, *names)
+
+
+class NullCache:
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return None
+
+    async def generation(self, tags: Iterable[str]):
+        return None
+
+    async def set(
+        self, key: str, value: bytes, tags: Iterable[str], ttl: Optional[int] = None, generation=None
+    ):
+        pass
+
+    async def invalidate(self, *tags: str):
+        pass
+
+
+def build_cache():
+    if settings.CACHE_BACKEND == "redis":
+        import redis.asyncio as redis
+        return RedisCache(redis.from_url(settings.REDIS_URL), settings.CACHE_TTL)
+    if settings.CACHE_BACKEND == "memory":
+        return MemoryCache(settings.CACHE_MAX_ENTRIES, settings.CACHE_MAX_BYTES, settings.CACHE_TTL)
+    return NullCache()
+
+
+cache = build_cache()
+
+
+def cache_key(request: Request) -> str:
+    # Значения экранируются: иначе "a=1&b=2" в одном параметре совпал бы с двумя
+    query = urlencode(sorted(request.query_params.multi_items()))
+    return f"{request.url.path}?{query}"
+
@@ -1,7 +1,8 @@
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import List, Optional
 from dotenv import load_dotenv
 import os
+import tempfile
 
 load_dotenv()
 
@@ -14,10 +15,110 @@ class Settings(BaseSettings):
     POSTGRES_PORT: str = os.getenv("POSTGRES_PORT", "5432")
     POSTGRES_DB: str = os.getenv("POSTGRES_DB", "black_bears")
 
+    # Название нашей команды в турнирной таблице (в games хранится только соперник)
+    HOME_TEAM_NAME: str = "Black Bears"
+
+    DEBUG: bool = False
+    # Лимит SQL-запросов на один HTTP-запрос в режиме DEBUG, 0 отключает проверку
+    QUERY_COUNT_LIMIT: int = 10
+
+    # Метрики запросов (/metrics) и заголовок Server-Timing
+    METRICS_ENABLED: bool = True
+
+    # Асинхронный режим работы с БД (asyncpg вместо psycopg2)
+    DB_ASYNC: bool = False
+
+    # Пул соединений
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0  # в секундах
+    DB_POOL_RECYCLE: int = 1800  # в секундах, -1 отключает
+    DB_POOL_PRE_PING: bool = True
+    DB_STATEMENT_TIMEOUT: int = 0  # в миллисекундах, 0 отключает
+    # Открывать DB_POOL_SIZE соединений при старте каждого воркера
+    DB_POOL_PREWARM: bool = True
+
+    # Кэш ответов: memory (LRU в процессе, сброс рассылается другим воркерам
+    # через брокер), redis (общий для воркеров) или none
+    CACHE_BACKEND: str = "memory"
+    CACHE_TTL: int = 60  # в секундах
+    CACHE_MAX_ENTRIES: int = 1024
+    CACHE_MAX_BYTES: int = 32 * 1024 * 1024
+    REDIS_URL: str = "redis://localhost:6379/0"
+
+    # Брокер сообщений между воркерами и экземплярами API: postgres
+    # (LISTEN/NOTIFY в той же БД), redis (pub/sub по REDIS_URL) или memory
+    # (только внутри одного процесса — для разработки и бенчмарков)
+    BROKER_BACKEND: str = "postgres"
+
+    # Чат: последние сообщения держатся в кольцевом буфере каждого воркера,
+    # история старше буфера читается из БД
+    CHAT_BUFFER_SIZE: int = 500
+    CHAT_POLL_TIMEOUT: float = 25.0  # в секундах, предел ожидания long-poll
+
+    # Поток событий /api/v1/stream (SSE и WebSocket)
+    STREAM_QUEUE_SIZE: int = 64  # событий в очереди подписчика; переполнение отключает его
+    STREAM_REPLAY_SIZE: int = 256  # последних событий для переподключения с Last-Event-ID
+    STREAM_HEARTBEAT: float = 15.0  # в секундах между комментариями-пингами SSE
+    STREAM_MAX_SUBSCRIBERS: int = 10000  # на воркер, сверх — 503
+
+    # Прокси изображений /api/v1/img: уменьшенные копии image_url и logo_url
+    IMAGE_WIDTHS: List[int] = [320, 640, 960, 1280]  # ширины копий в пикселях, другие округляются вверх
+    IMAGE_DEFAULT_WIDTH: int = 640  # ширина src в полях image и logo ответов
+    IMAGE_QUALITY: int = 80  # качество WebP, AVIF и JPEG
+    IMAGE_CACHE_DIR: str = os.path.join(tempfile.gettempdir(), "black_bears_images")
+    IMAGE_CACHE_MAX_BYTES: int = 512 * 1024 * 1024  # сверх — удаляются давно не запрошенные файлы
+    IMAGE_MAX_SOURCE_BYTES: int = 20 * 1024 * 1024
+    IMAGE_MAX_PIXELS: int = 50_000_000  # защита от «бомб» распаковки
+    IMAGE_FETCH_TIMEOUT: float = 10.0  # в секундах
+    # В секундах: через столько исходник по ссылке загружается заново (вдруг
+    # по тому же URL уже другое изображение); столько же клиенты и CDN
+    # держат копию без перепроверки (Cache-Control max-age)
+    IMAGE_SOURCE_TTL: int = 24 * 3600
+    # Ключ HMAC-подписи ссылок на прокси; пусто — ссылки без подписи. Без
+    # подписи прокси уменьшит любое изображение из интернета
+    IMAGE_SIGNING_KEY: str = ""
+    # Источники в локальной сети и на localhost (по умолчанию запрещены, чтобы
+    # прокси нельзя было использовать для запросов во внутреннюю сеть)
+    IMAGE_ALLOW_PRIVATE_HOSTS: bool = False
+    IMAGE_LOCAL_DIR: str = ""  # image_url без схемы — путь в этом каталоге; пусто — не поддерживаются
+    IMAGE_PUBLIC_URL: str = ""  # префикс ссылок на прокси, например https://api.example.com; пусто — /api/v1/img
+
+    # Фоновые задачи (core/jobs.py): счётчики игроков и турнирная таблица
+    # после записи игр. postgres — таблица jobs, которую разбирают воркеры
+    # всех реплик; memory — очередь в процессе (задачи теряются при перезапуске)
+    JOBS_BACKEND: str = "postgres"
+    JOBS_CONCURRENCY: int = 4  # задач одновременно в воркере (и соединений пула), 0 — воркер задачи не выполняет
+    JOBS_POLL_INTERVAL: float = 1.0  # в секундах: опрос очереди, если не пришло уведомление через брокер
+    JOBS_MAX_ATTEMPTS: int = 5  # после стольких ошибок задача остаётся в таблице как failed
+    JOBS_RETRY_BASE: float = 1.0  # в секундах: задержка первого повтора, дальше удваивается
+    JOBS_RETRY_MAX: float = 300.0  # в секундах, потолок задержки повтора
+    JOBS_LEASE: float = 60.0  # в секундах: задачу упавшего воркера после этого срока берёт другой
+
+    # Сериализация ответов: trusted (ORM-объекты пишутся в JSON без повторной
+    # проверки по схеме) или validate (проверка pydantic, медленнее)
+    JSON_RENDERER: str = "trusted"
+
+    # Production-сервер (python -m app.server)
+    WEB_HOST: str = "0.0.0.0"
+    WEB_PORT: int = 8000
+    WEB_WORKERS: int = 0  # 0 — по числу доступных процессу ядер
+    WEB_MAX_WORKERS: int = 16  # потолок для автоматического выбора
+    WEB_GRACEFUL_TIMEOUT: int = 30  # в секундах на завершение текущих запросов
+    WEB_KEEPALIVE: int = 5  # в секундах
+    WEB_MAX_REQUESTS: int = 0  # перезапуск воркера после N запросов, 0 отключает
+    WEB_PRELOAD: bool = True  # импортировать приложение до fork (быстрее старт, меньше памяти)
+    WEB_MIGRATE: bool = True  # alembic upgrade head в главном процессе до запуска воркеров
+    WEB_FORWARDED_ALLOW_IPS: str = "127.0.0.1"  # кому доверять X-Forwarded-*
+
     @property
     def DATABASE_URL(self) -> str:
         return f"postgresql+psycopg2://{self.POSTGRES_USER}:{self.POSTGRES_PASSWORD}@{self.POSTGRES_SERVER}:{self.POSTGRES_PORT}/{self.POSTGRES_DB}"
 
+    @property
+    def ASYNC_DATABASE_URL(self) -> str:
+        return f"postgresql+asyncpg://{self.POSTGRES_USER}:{self.POSTGRES_PASSWORD}@{self.POSTGRES_SERVER}:{self.POSTGRES_PORT}/{self.POSTGRES_DB}"
+
     class Config:
         env_file = ".env"
 
@@ -1,15 +1,239 @@
+import asyncio
+import time
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from starlette.concurrency import run_in_threadpool
 from .config import settings
+from .metrics import DB_POOL_WAIT, gauge, register_collector
+from . import query_stats
 
-engine = create_engine(settings.DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+class TimedQueuePool(QueuePool):
+    """
+    QueuePool, который пишет в гистограмму время ожидания свободного соединения
+    """
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_WAIT.observe(time.perf_counter() - started)
+
+
+class TimedAsyncQueuePool(TimedQueuePool, AsyncAdaptedQueuePool):
+    pass
+
+
+def _pool_options() -> dict:
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+
+def _connect_args(is_async: bool) -> dict:
+    if not settings.DB_STATEMENT_TIMEOUT:
+        return {}
+    if is_async:
+        return {"server_settings": {"statement_timeout": str(settings.DB_STATEMENT_TIMEOUT)}}
+    return {"options": f"-c statement_timeout={settings.DB_STATEMENT_TIMEOUT}"}
+
+
+engine = create_engine(
+    settings.DATABASE_URL, poolclass=TimedQueuePool, connect_args=_connect_args(False), **_pool_options()
+)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
 Base = declarative_base()
+query_stats.install(engine)
+
+# Асинхронный движок создаётся только в режиме DB_ASYNC, чтобы asyncpg
+# не был обязательной зависимостью для синхронного режима
+async_engine = (
+    create_async_engine(
+        settings.ASYNC_DATABASE_URL, poolclass=TimedAsyncQueuePool, connect_args=_connect_args(True),
+        **_pool_options()
+    )
+    if settings.DB_ASYNC else None
+)
+if async_engine is not None:
+    query_stats.install(async_engine.sync_engine)
+AsyncSessionLocal = (
+    async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+    if async_engine is not None else None
+)
+
+
+class ThreadedSession:
+    """
+    Синхронная Session с интерфейсом AsyncSession.
+
+    Каждый обращающийся к БД вызов выполняется в threadpool, поэтому
+    одни и те же async-обработчики работают и с psycopg2, и с asyncpg.
+    """
+
+    def __init__(self, session):
+        self.sync_session = session
+
+    def add(self, instance):
+        self.sync_session.add(instance)
+
+    def add_all(self, instances):
+        self.sync_session.add_all(instances)
+
+    async def execute(self, statement, *args, **kwargs):
+        return await run_in_threadpool(self.sync_session.execute, statement, *args, **kwargs)
+
+    async def scalar(self, statement, *args, **kwargs):
+        return await run_in_threadpool(self.sync_session.scalar, statement, *args, **kwargs)
+
+    async def scalars(self, statement, *args, **kwargs):
+        return await run_in_threadpool(self.sync_session.scalars, statement, *args, **kwargs)
+
+    async def get(self, entity, ident, **kwargs):
+        return await run_in_threadpool(self.sync_session.get, entity, ident, **kwargs)
+
+    async def connection(self, **kwargs):
+        return await run_in_threadpool(self.sync_session.connection, **kwargs)
+
+    async def delete(self, instance):
+        await run_in_threadpool(self.sync_session.delete, instance)
+
+    async def flush(self, objects=None):
+        await run_in_threadpool(self.sync_session.flush, objects)
 
-def get_db():
-    db = SessionLocal()
+    async def refresh(self, instance, attribute_names=None):
+        await run_in_threadpool(self.sync_session.refresh, instance, attribute_names)
+
+    async def commit(self):
+        await run_in_threadpool(self.sync_session.commit)
+
+    async def rollback(self):
+        await run_in_threadpool(self.sync_session.rollback)
+
+    async def close(self):
+        await run_in_threadpool(self.sync_session.close)
+
+    async def run_sync(self, fn, *args, **kwargs):
+        return await run_in_threadpool(fn, self.sync_session, *args, **kwargs)
+
+
+def pool_status() -> dict:
+    """
+    Состояние пула активного движка и гистограмма ожидания соединения
+    """
+    pool = async_engine.sync_engine.pool if async_engine is not None else engine.pool
+    return {
+        "driver": "asyncpg" if async_engine is not None else "psycopg2",
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "timeout": settings.DB_POOL_TIMEOUT,
+        "wait_seconds": DB_POOL_WAIT.snapshot(),
+    }
+
+
+@register_collector
+def pool_metrics() -> list:
+    """
+    Состояние пула для /metrics (гистограмма ожидания выводится отдельно)
+    """
+    status = pool_status()
+    return [
+        *gauge("db_pool_size", "Размер пула соединений", status["size"]),
+        *gauge("db_pool_checked_out", "Соединения, выданные из пула", status["checked_out"]),
+        *gauge("db_pool_overflow", "Соединения сверх pool_size", status["overflow"]),
+    ]
+
+
+async def warm_up_pool(size: int = None) -> int:
+    """
+    Открывает size соединений (по умолчанию DB_POOL_SIZE) и возвращает их
+    в пул, чтобы первые запросы воркера не ждали установки соединения
+    """
+    size = settings.DB_POOL_SIZE if size is None else size
+    if async_engine is not None:
+        if size < 1:
+            return 0
+        # Первое соединение — отдельно: на нём диалект инициализируется под
+        # блокировкой, и параллельные connect() после пересоздания пула
+        # (reset_pools_after_fork) ждали бы её в том же потоке вечно
+        connections = [await async_engine.connect()]
+        connections.extend(await asyncio.gather(*(async_engine.connect() for _ in range(size - 1))))
+        for connection in connections:
+            await connection.close()
+        return len(connections)
+
+    def connect_all():
+        connections = [engine.connect() for _ in range(size)]
+        for connection in connections:
+            connection.close()
+        return len(connections)
+
+    return await run_in_threadpool(connect_all)
+
+
+def reset_pools_after_fork():
+    """
+    Вызывается в дочернем процессе после fork: соединения, унаследованные
+    от родителя, бросаются без закрытия (ими продолжает пользоваться
+    родитель), пул заполняется заново уже в воркере
+    """
+    engine.dispose(close=False)
+    if async_engine is not None:
+        async_engine.sync_engine.dispose(close=False)
+
+
+async def dispose_engines():
+    if async_engine is not None:
+        await async_engine.dispose()
+    await run_in_threadpool(engine.dispose)
+
+
+async def get_db():
+    if AsyncSessionLocal is not None:
+        db = AsyncSessionLocal()
+    else:
+        db = ThreadedSession(SessionLocal())
     try:
+        # Соединение берётся из пула только при первом запросе к БД, поэтому
+        # ответы из кэша пул не занимают; ожидание измеряет TimedQueuePool
         yield db
     finally:
-        db.close() 
\ No newline at end of file
+        await db.close()
+
+
+async def stream_scalars(statement, batch_size: int = 1000):
+    """
+    Асинхронный генератор пачек ORM-объектов через серверный курсор (yield_per).
+
+    Открывает собственную сессию: генератор дочитывается уже после выхода
+    из обработчика, когда сессия из get_db может быть закрыта. В памяти
+    одновременно держится не больше одной пачки.
+    """
+    statement = statement.execution_options(yield_per=batch_size)
+    if AsyncSessionLocal is not None:
+        async with AsyncSessionLocal() as session:
+            result = await session.stream_scalars(statement)
+            async for partition in result.partitions():
+                yield partition
+        return
+
+    session = SessionLocal()
+    try:
+        partitions = (await run_in_threadpool(session.scalars, statement)).partitions()
+        while True:
+            partition = await run_in_threadpool(next, partitions, None)
+            if partition is None:
+                break
+            yield partition
+    finally:
+        await run_in_threadpool(session.close)
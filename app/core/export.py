@@ -0,0 +1,43 @@
+from typing import Literal
+from fastapi.responses import StreamingResponse
+from .database import stream_scalars
+from .responses import serializer
+
+# ndjson — по объекту на строку, json — один массив, отдаваемый частями
+ExportFormat = Literal["ndjson", "json"]
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "json": "application/json",
+}
+
+
+def export_response(statement, schema, export_format: ExportFormat, filename: str) -> StreamingResponse:
+    """
+    Потоковая выгрузка результата statement, сериализованного по schema.
+
+    Строки читаются серверным курсором пачками (stream_scalars), каждая пачка
+    сразу превращается в байты и отправляется, поэтому память не зависит
+    от числа строк.
+    """
+    dump = serializer(schema)
+
+    async def body():
+        if export_format == "json":
+            yield b"["
+        first = True
+        async for partition in stream_scalars(statement):
+            items = [dump(obj) for obj in partition]
+            if export_format == "ndjson":
+                yield b"\n".join(items) + b"\n"
+            else:
+                yield (b"" if first else b",") + b",".join(items)
+            first = False
+        if export_format == "json":
+            yield b"]"
+
+    return StreamingResponse(
+        body(),
+        media_type=MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{export_format}"'},
+    )
@@ -0,0 +1,121 @@
+import hashlib
+import json
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Awaitable, Callable, Iterable, Optional, Union
+from fastapi import Request, Response
+from sqlalchemy import func, select
+from .cache import cache, cache_key
+from .responses import render_json
+
+# Заголовки, которые повторяются в ответе 304 (RFC 9110, 15.4.5)
+VALIDATOR_HEADERS = ("etag", "last-modified", "cache-control")
+
+
+def make_etag(key: str, values) -> str:
+    """
+    Сильный ETag из ключа запроса (путь и параметры) и значений отпечатка
+    """
+    raw = json.dumps([key, *values], default=str, separators=(",", ":")).encode()
+    return '"' + hashlib.sha1(raw).hexdigest() + '"'
+
+
+def http_date(value: datetime) -> str:
+    # Время в БД хранится без зоны в UTC (datetime.utcnow)
+    return format_datetime(value.replace(tzinfo=timezone.utc, microsecond=0), usegmt=True)
+
+
+def etag_matches(request: Request, etag: Optional[str]) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header or not etag:
+        return False
+    if header.strip() == "*":
+        return True
+    # If-None-Match сравнивается слабо: префикс W/ не учитывается
+    candidates = (item.strip() for item in header.split(","))
+    return etag in (item[2:] if item.startswith("W/") else item for item in candidates)
+
+
+def not_modified_since(request: Request, last_modified: Optional[datetime]) -> bool:
+    header = request.headers.get("if-modified-since")
+    if not header or last_modified is None or "if-none-match" in request.headers:
+        return False
+    try:
+        since = parsedate_to_datetime(header)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    return last_modified.replace(tzinfo=timezone.utc, microsecond=0) <= since
+
+
+def not_modified(headers: dict) -> Response:
+    return Response(
+        status_code=304, headers={name: value for name, value in headers.items() if name in VALIDATOR_HEADERS}
+    )
+
+
+async def page_fingerprint(db, page) -> tuple:
+    """
+    Отпечаток страницы одним агрегатным запросом.
+
+    page — тот же запрос, что и у выдачи (фильтры, сортировка, offset/курсор,
+    limit), но со столбцами id и updated_at. Возвращает
+    (max(updated_at), count, sum(id)): любое изменение строки страницы
+    сдвигает max(updated_at), вставка или удаление меняют набор id.
+    """
+    rows = page.subquery()
+    statement = select(func.max(rows.c.updated_at), func.count(), func.sum(rows.c.id))
+    return tuple((await db.execute(statement)).one())
+
+
+async def conditional_json(
+    request: Request,
+    response: Response,
+    schema,
+    load: Callable[[], Awaitable],
+    fingerprint: Union[tuple, Callable[[], Awaitable[tuple]]],
+    cache_tags: Optional[Iterable[str]] = None,
+    last_modified_exact: bool = False,
+) -> Response:
+    """
+    JSON-ответ с ETag и Last-Modified.
+
+    fingerprint — кортеж (или корутина, возвращающая кортеж), первым элементом
+    которого идёт время последнего изменения. Если клиент прислал совпадающий
+    If-None-Match, отвечаем 304, не вызывая load() и не сериализуя данные.
+    If-Modified-Since учитывается только при last_modified_exact (отдельная
+    запись): у списков удаление строки не сдвигает max(updated_at).
+
+    С cache_tags тело вместе с заголовками (ETag, X-Next-Cursor и т.п.)
+    кэшируется; на попадании в кэш валидатор сверяется без обращения к БД.
+    Поколение тегов читается до обращения к БД: если теги сбросили, пока
+    данные загружались, устаревшее тело в кэш не попадёт.
+    """
+    key = cache_key(request)
+    if cache_tags is not None:
+        entry = await cache.get(key)
+        if entry is not None:
+            headers, body = entry.split(b"\n", 1)
+            headers = json.loads(headers)
+            if etag_matches(request, headers.get("etag")):
+                return not_modified(headers)
+            return Response(body, media_type="application/json", headers=headers)
+        generation = await cache.generation(cache_tags)
+
+    values = await fingerprint() if callable(fingerprint) else fingerprint
+    last_modified = values[0]
+    response.headers["ETag"] = make_etag(key, values)
+    response.headers["Cache-Control"] = "no-cache"
+    if last_modified is not None:
+        response.headers["Last-Modified"] = http_date(last_modified)
+    if etag_matches(request, response.headers["etag"]) or (
+        last_modified_exact and not_modified_since(request, last_modified)
+    ):
+        return not_modified(response.headers)
+
+    body = render_json(schema, await load())
+    headers = {name: value for name, value in response.headers.items() if name != "content-length"}
+    if cache_tags is not None:
+        await cache.set(key, json.dumps(headers).encode() + b"\n" + body, cache_tags, generation=generation)
+    return Response(body, media_type="application/json", headers=headers)
@@ -0,0 +1,64 @@
+"""
+Ссылки на прокси изображений /api/v1/img для полей image и logo ответов.
+
+Прокси отдаёт копии только ширин из IMAGE_WIDTHS, поэтому в srcset
+перечисляются они, а src — копия ширины IMAGE_DEFAULT_WIDTH. С
+IMAGE_SIGNING_KEY к ссылке добавляется подпись источника (параметр s):
+прокси уменьшает только изображения, ссылки на которые выдал сам API.
+"""
+import base64
+import hashlib
+import hmac
+from functools import lru_cache
+from typing import NamedTuple, Optional
+from urllib.parse import quote
+from .config import settings
+
+IMAGE_PATH = "/api/v1/img"
+
+
+class ImageSet(NamedTuple):
+    src: str
+    srcset: str
+
+
+def width_bucket(width: int) -> int:
+    """
+    Наименьшая ширина из IMAGE_WIDTHS не меньше width (или наибольшая)
+    """
+    widths = sorted(settings.IMAGE_WIDTHS)
+    for bucket in widths:
+        if bucket >= width:
+            return bucket
+    return widths[-1]
+
+
+def sign(source: str) -> str:
+    digest = hmac.new(settings.IMAGE_SIGNING_KEY.encode(), source.encode(), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest[:12]).decode()
+
+
+def signature_valid(source: str, signature: Optional[str]) -> bool:
+    if not settings.IMAGE_SIGNING_KEY:
+        return True
+    return signature is not None and hmac.compare_digest(sign(source), signature)
+
+
+def proxy_url(source: str, width: int) -> str:
+    query = "src=" + quote(source, safe="")
+    if settings.IMAGE_SIGNING_KEY:
+        query += "&s=" + sign(source)
+    return f"{settings.IMAGE_PUBLIC_URL}{IMAGE_PATH}?{query}&w={width}"
+
+
+@lru_cache(maxsize=4096)
+def image_set(source: Optional[str]) -> Optional[ImageSet]:
+    """
+    src и srcset уменьшенных копий изображения source (None — изображения нет)
+    """
+    if not source:
+        return None
+    return ImageSet(
+        src=proxy_url(source, width_bucket(settings.IMAGE_DEFAULT_WIDTH)),
+        srcset=", ".join(f"{proxy_url(source, width)} {width}w" for width in sorted(settings.IMAGE_WIDTHS)),
+    )
@@ -0,0 +1,481 @@
+"""
+Фоновые задачи: побочные эффекты записи выполняются после ответа клиенту.
+
+    @job_handler("standings.refresh")
+    async def refresh(db, payload): ...
+
+    await enqueue(db, "standings.refresh", {"gender": "male"}, key="standings.refresh:male")
+    await db.commit()
+
+- enqueue ставит задачу в транзакции обработчика: задача появляется в
+  очереди только вместе с данными, ради которых поставлена;
+- key — ключ идемпотентности: пока задача с этим ключом ждёт запуска,
+  повторная постановка ничего не добавляет (десять изменений игр подряд
+  дают один пересчёт таблицы);
+- обработчик работает в переданной сессии и не вызывает commit: его
+  изменения фиксируются одной транзакцией с удалением задачи, поэтому
+  эффект задачи в БД применяется ровно один раз, даже если задачу
+  повторили после сбоя или истечения аренды;
+- при ошибке задача повторяется через JOBS_RETRY_BASE * 2^(попытка - 1)
+  секунд (со случайной долей до половины, не больше JOBS_RETRY_MAX), после
+  JOBS_MAX_ATTEMPTS попыток остаётся в таблице в состоянии failed;
+- after_commit(db, fn, ...) — действие после фиксации транзакции
+  (инвалидация кэша, события потока); при откате не выполняется.
+
+Задачи выполняет JobWorker в каждом воркере API, до JOBS_CONCURRENCY
+одновременно. Бэкенд postgres — таблица jobs: воркеры всех реплик берут
+задачи через SELECT ... FOR UPDATE SKIP LOCKED, не мешая друг другу, и
+арендуют их на JOBS_LEASE секунд; задачу упавшего воркера после этого
+срока берёт другой. О новых задачах воркеры узнают через брокер, без
+уведомления — опросом раз в JOBS_POLL_INTERVAL. Бэкенд memory — очередь
+внутри процесса без гарантий доставки (для разработки и одного процесса).
+"""
+import asyncio
+import contextvars
+import datetime
+import heapq
+import itertools
+import logging
+import random
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Optional
+from sqlalchemy import delete, event, func, select, text, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from .broker import broker
+from .config import settings
+from .database import get_db
+from .metrics import Counter, HistogramVec, gauge, register, register_collector
+from ..models.job import Job
+
+logger = logging.getLogger("uvicorn.error")
+
+# Канал брокера, которым воркеры будят друг друга при постановке задач
+JOBS_CHANNEL = "jobs"
+
+# Время БД в UTC: сроки задач не зависят от часов и часового пояса воркеров
+UTC_NOW = func.timezone("utc", func.now())
+# Условия частичных индексов пишутся литералами: с параметром ($1 в asyncpg)
+# Postgres не может доказать, что запрос подходит под индекс
+READY = text("jobs.state IN ('queued', 'running')")
+QUEUED = text("state = 'queued'")
+
+COUNTS_INTERVAL = 5.0  # в секундах между запросами числа задач для /metrics
+STOP_TIMEOUT = 10.0  # в секундах на завершение выполняемых задач при остановке
+MAX_ERROR_LENGTH = 2000
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, 1800.0)
+
+JOBS = register(Counter(
+    "jobs_total",
+    "Выполнения фоновых задач: done, retry, failed и lost (аренду перехватил другой воркер)",
+    ("kind", "result"),
+))
+
+JOB_DURATION = register(HistogramVec(
+    "job_duration_seconds",
+    "Время выполнения обработчика фоновой задачи вместе с commit",
+    ("kind",),
+))
+
+JOB_LATENCY = register(HistogramVec(
+    "job_latency_seconds",
+    "Время от постановки фоновой задачи до её успешного выполнения, включая повторы",
+    ("kind",),
+    buckets=LATENCY_BUCKETS,
+))
+
+JobHandler = Callable[[Any, dict], Awaitable[None]]
+JOB_HANDLERS: Dict[str, JobHandler] = {}
+
+db_session = asynccontextmanager(get_db)
+
+
+def job_handler(kind: str):
+    def register_handler(handler: JobHandler) -> JobHandler:
+        JOB_HANDLERS[kind] = handler
+        return handler
+    return register_handler
+
+
+class ClaimedJob(NamedTuple):
+    id: int
+    kind: str
+    payload: dict
+    key: Optional[str]
+    attempts: int  # с учётом текущей
+    age: float  # секунд от постановки до взятия в работу
+
+
+# Действия после commit хранятся в Session.info, обработчики событий
+# сессии выполняют их после фиксации и забывают при откате
+AFTER_COMMIT = "after_commit"
+_background = set()
+
+
+def after_commit(db, function: Callable[..., Awaitable[None]], *args):
+    """
+    Выполняет await function(*args) в event loop после фиксации текущей
+    транзакции db; одинаковые вызовы в одной транзакции — один раз.
+    Действие не переживает падение процесса между commit и вызовом
+    """
+    pending = db.sync_session.info.setdefault(AFTER_COMMIT, [])
+    if not any(entry[1] is function and entry[2] == args for entry in pending):
+        pending.append((asyncio.get_running_loop(), function, args))
+
+
+@event.listens_for(Session, "after_commit")
+def _run_after_commit(session):
+    for loop, function, args in session.info.pop(AFTER_COMMIT, ()):
+        # Пустой контекст: действие не должно попадать в статистику SQL
+        # запроса, который его запланировал (сессия может жить в threadpool)
+        loop.call_soon_threadsafe(_spawn, function, args, context=contextvars.Context())
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_after_commit(session):
+    session.info.pop(AFTER_COMMIT, None)
+
+
+def _spawn(function, args):
+    task = asyncio.get_running_loop().create_task(_guarded(function, args))
+    _background.add(task)
+    task.add_done_callback(_background.discard)
+
+
+async def _guarded(function, args):
+    try:
+        await function(*args)
+    except Exception:
+        logger.exception("Действие после commit %s не выполнено", getattr(function, "__name__", function))
+
+
+class PostgresBackend:
+    """
+    Очередь в таблице jobs, общая для всех воркеров и реплик
+    """
+
+    shared = True
+
+    def __init__(self, lease: float):
+        self.lease = datetime.timedelta(seconds=lease)
+
+    async def enqueue(self, db, kind: str, payload: dict, key: Optional[str], delay: float):
+        statement = insert(Job).values(
+            kind=kind, payload=payload, key=key, state="queued", attempts=0,
+            run_at=UTC_NOW + datetime.timedelta(seconds=delay), created_at=UTC_NOW,
+        )
+        if key is not None:
+            statement = statement.on_conflict_do_nothing(index_elements=[Job.key], index_where=QUEUED)
+        await db.execute(statement)
+
+    async def claim(self, limit: int) -> List[ClaimedJob]:
+        """
+        Берёт до limit готовых задач: ждущие и выполняемые с истёкшей
+        арендой. Строки, заблокированные другими воркерами, пропускаются
+        """
+        ready = (
+            select(Job.id)
+            .where(READY, Job.run_at <= UTC_NOW)
+            .order_by(Job.run_at)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+            .cte("ready")
+        )
+        statement = (
+            update(Job)
+            .where(Job.id == ready.c.id)
+            .values(state="running", attempts=Job.attempts + 1, run_at=UTC_NOW + self.lease)
+            .returning(
+                Job.id, Job.kind, Job.payload, Job.key, Job.attempts,
+                func.extract("epoch", UTC_NOW - Job.created_at),
+            )
+        )
+        async with db_session() as db:
+            rows = (await db.execute(statement)).all()
+            await db.commit()
+        return [ClaimedJob(*row[:5], float(row[5])) for row in rows]
+
+    @staticmethod
+    def _owned(job: ClaimedJob):
+        # Номер попытки — признак владения: после перехвата аренды он другой
+        return (Job.id == job.id, Job.attempts == job.attempts, Job.state == "running")
+
+    async def complete(self, db, job: ClaimedJob) -> bool:
+        """
+        Удаляет задачу в транзакции обработчика; False — аренду перехватил
+        другой воркер, изменения обработчика нужно откатить
+        """
+        result = await db.execute(delete(Job).where(*self._owned(job)))
+        return result.rowcount == 1
+
+    async def retry(self, job: ClaimedJob, error: str, delay: Optional[float]):
+        """
+        Откладывает задачу на delay секунд или, если delay is None,
+        оставляет её в таблице как failed
+        """
+        if delay is None:
+            values = {"state": "failed", "last_error": error}
+        else:
+            values = {"state": "queued", "run_at": UTC_NOW + datetime.timedelta(seconds=delay), "last_error": error}
+        async with db_session() as db:
+            try:
+                await db.execute(update(Job).where(*self._owned(job)).values(**values))
+                await db.commit()
+            except IntegrityError:
+                # Задача с тем же ключом уже ждёт запуска и сделает ту же работу
+                await db.rollback()
+                await db.execute(delete(Job).where(*self._owned(job)))
+                await db.commit()
+
+    async def counts(self) -> dict:
+        async with db_session() as db:
+            queued, failed = (await db.execute(select(
+                func.count().filter(Job.state == "queued"),
+                func.count().filter(Job.state == "failed"),
+            ))).one()
+        return {"queued": queued, "failed": failed}
+
+
+class MemoryBackend:
+    """
+    Очередь внутри процесса: задачи видит только этот воркер и теряются
+    при перезапуске. Без выполняющего воркера (JOBS_CONCURRENCY=0) задачи
+    копятся в памяти
+    """
+
+    shared = False
+
+    def __init__(self):
+        # (время запуска по time.monotonic, id, задача)
+        self._heap = []
+        self._ids = itertools.count(1)
+        self._queued_keys = set()
+        # Время постановки задач по id: по нему считается age
+        self._enqueued = {}
+        self._failed = 0
+
+    async def enqueue(self, db, kind: str, payload: dict, key: Optional[str], delay: float):
+        after_commit(db, self._push, kind, payload, key, delay)
+
+    async def _push(self, kind: str, payload: dict, key: Optional[str], delay: float):
+        if key is not None and key in self._queued_keys:
+            return
+        job = ClaimedJob(next(self._ids), kind, payload, key, 0, 0.0)
+        self._enqueued[job.id] = time.monotonic()
+        self._schedule(job, delay)
+
+    def _schedule(self, job: ClaimedJob, delay: float):
+        if job.key is not None:
+            self._queued_keys.add(job.key)
+        heapq.heappush(self._heap, (time.monotonic() + delay, job.id, job))
+
+    async def claim(self, limit: int) -> List[ClaimedJob]:
+        now = time.monotonic()
+        claimed = []
+        while self._heap and len(claimed) < limit and self._heap[0][0] <= now:
+            _, _, job = heapq.heappop(self._heap)
+            self._queued_keys.discard(job.key)
+            claimed.append(job._replace(attempts=job.attempts + 1, age=now - self._enqueued[job.id]))
+        return claimed
+
+    async def complete(self, db, job: ClaimedJob) -> bool:
+        self._enqueued.pop(job.id, None)
+        return True
+
+    async def retry(self, job: ClaimedJob, error: str, delay: Optional[float]):
+        if delay is None:
+            self._failed += 1
+        elif job.key is None or job.key not in self._queued_keys:
+            self._schedule(job, delay)
+            return
+        self._enqueued.pop(job.id, None)
+
+    async def counts(self) -> dict:
+        return {"queued": len(self._heap), "failed": self._failed}
+
+
+def build_backend():
+    if settings.JOBS_BACKEND == "memory":
+        return MemoryBackend()
+    return PostgresBackend(settings.JOBS_LEASE)
+
+
+def retry_delay(attempts: int, base: float, limit: float) -> float:
+    """
+    Экспоненциальная задержка повтора со случайной долей: повторы задач,
+    упавших вместе (например, при недоступной БД), расходятся во времени
+    """
+    delay = min(limit, base * 2 ** (attempts - 1))
+    return delay * random.uniform(0.5, 1.0)
+
+
+class JobWorker:
+    """
+    Пул выполнения задач в event loop воркера API.
+
+    Одна задача-диспетчер берёт из очереди столько задач, сколько свободно
+    мест (concurrency), и запускает каждую отдельной asyncio-задачей со
+    своей сессией БД. Диспетчер просыпается по уведомлению о новых задачах,
+    по завершению задачи и раз в poll_interval.
+    """
+
+    def __init__(
+        self,
+        backend,
+        concurrency: int,
+        poll_interval: float = settings.JOBS_POLL_INTERVAL,
+        max_attempts: int = settings.JOBS_MAX_ATTEMPTS,
+        retry_base: float = settings.JOBS_RETRY_BASE,
+        retry_max: float = settings.JOBS_RETRY_MAX,
+    ):
+        self.backend = backend
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.running = set()
+        self.counts = {"queued": 0, "failed": 0}
+        self._wakeup = asyncio.Event()
+        self._dispatcher = None
+        self._subscription = None
+        self._listener = None
+
+    async def start(self):
+        if self.concurrency <= 0 or self._dispatcher is not None:
+            return
+        if self.backend.shared:
+            self._subscription = await broker.subscribe(JOBS_CHANNEL)
+            self._listener = asyncio.create_task(self._listen())
+        self._dispatcher = asyncio.create_task(self._dispatch())
+
+    async def stop(self, timeout: float = STOP_TIMEOUT):
+        """
+        Перестаёт брать задачи и ждёт выполняемые не дольше timeout секунд;
+        прерванные задачи откатываются и после аренды выполнятся снова
+        """
+        for task in (self._dispatcher, self._listener):
+            if task is not None:
+                task.cancel()
+        self._dispatcher = self._listener = None
+        if self._subscription is not None:
+            await self._subscription.close()
+            self._subscription = None
+        if self.running:
+            _, pending = await asyncio.wait(set(self.running), timeout=timeout)
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.wait(pending)
+                logger.warning("Задачи: при остановке прервано %d задач", len(pending))
+
+    def wake(self):
+        self._wakeup.set()
+
+    async def _listen(self):
+        # GAP тоже будит диспетчер: уведомления могли пройти мимо
+        async for _ in self._subscription:
+            self.wake()
+
+    async def _dispatch(self):
+        loop = asyncio.get_running_loop()
+        next_counts = 0.0
+        while True:
+            self._wakeup.clear()
+            free = self.concurrency - len(self.running)
+            claimed = []
+            if free > 0:
+                try:
+                    claimed = await self.backend.claim(free)
+                except Exception as exc:
+                    logger.warning("Задачи: не удалось взять задачи из очереди: %s", exc)
+                for job in claimed:
+                    task = asyncio.create_task(self._run(job))
+                    self.running.add(task)
+                    task.add_done_callback(self._finished)
+            if loop.time() >= next_counts:
+                next_counts = loop.time() + COUNTS_INTERVAL
+                try:
+                    self.counts = await self.backend.counts()
+                except Exception as exc:
+                    logger.warning("Задачи: не удалось получить размер очереди: %s", exc)
+            if claimed and len(claimed) == free:
+                # Очередь могла не опустеть: следующая порция без ожидания
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def _finished(self, task: asyncio.Task):
+        self.running.discard(task)
+        self.wake()
+
+    async def _run(self, job: ClaimedJob):
+        started = time.perf_counter()
+        try:
+            handler = JOB_HANDLERS.get(job.kind)
+            if handler is None:
+                # Например, задачу поставила более новая версия приложения
+                raise LookupError(f"нет обработчика задачи {job.kind}")
+            async with db_session() as db:
+                await handler(db, job.payload)
+                if await self.backend.complete(db, job):
+                    await db.commit()
+                    result = "done"
+                else:
+                    await db.rollback()
+                    result = "lost"
+        except Exception as exc:
+            final = job.attempts >= self.max_attempts
+            result = "failed" if final else "retry"
+            delay = None if final else retry_delay(job.attempts, self.retry_base, self.retry_max)
+            log = logger.error if final else logger.warning
+            log("Задача %s #%s, попытка %d: %r", job.kind, job.id, job.attempts, exc)
+            try:
+                await self.backend.retry(job, repr(exc)[:MAX_ERROR_LENGTH], delay)
+            except Exception as retry_exc:
+                # Задача останется running и повторится после аренды
+                logger.warning("Задачи: не удалось отложить задачу #%s: %s", job.id, retry_exc)
+        elapsed = time.perf_counter() - started
+        JOBS.inc(job.kind, result)
+        JOB_DURATION.labels(job.kind).observe(elapsed)
+        if result == "done":
+            JOB_LATENCY.labels(job.kind).observe(job.age + elapsed)
+
+
+job_backend = build_backend()
+job_worker = JobWorker(job_backend, settings.JOBS_CONCURRENCY)
+
+
+async def _notify():
+    job_worker.wake()
+    if job_backend.shared:
+        try:
+            await broker.publish(JOBS_CHANNEL, b"")
+        except Exception as exc:
+            # Другие воркеры найдут задачу при следующем опросе
+            logger.warning("Задачи: не удалось разослать уведомление: %s", exc)
+
+
+async def enqueue(db, kind: str, payload: dict, key: Optional[str] = None, delay: float = 0):
+    """
+    Ставит задачу kind в текущей транзакции db (вызывается до commit).
+    payload должен сериализоваться в JSON
+    """
+    if kind not in JOB_HANDLERS:
+        raise ValueError(f"Неизвестный тип задачи: {kind}")
+    await job_backend.enqueue(db, kind, payload, key, delay)
+    after_commit(db, _notify)
+
+
+@register_collector
+def job_metrics() -> list:
+    return [
+        *gauge("jobs_queued", "Фоновые задачи в очереди, включая отложенные повторы", job_worker.counts["queued"]),
+        *gauge("jobs_failed", "Фоновые задачи, исчерпавшие попытки", job_worker.counts["failed"]),
+        *gauge("jobs_in_flight", "Фоновые задачи, выполняемые воркером", len(job_worker.running)),
+    ]
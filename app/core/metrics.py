@@ -0,0 +1,255 @@
+import bisect
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Tuple
+from . import query_stats
+
+# Границы корзин в секундах: от долей миллисекунды до таймаута пула
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Метка маршрута для запросов, не попавших ни в один маршрут: сырой путь
+# в метке раздул бы число рядов в Prometheus
+UNMATCHED_ROUTE = "unmatched"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labelnames: Tuple[str, ...], labelvalues: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, labelvalues)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """
+    Накопительная гистограмма в духе Prometheus.
+
+    Обновляется и из event loop, и из threadpool, поэтому защищена блокировкой.
+    """
+
+    def __init__(self, name: str, documentation: str, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            counts = list(self._counts)
+            total = self._sum
+        cumulative = 0
+        buckets = {}
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            buckets["+Inf" if bound == float("inf") else str(bound)] = cumulative
+        return {"count": cumulative, "sum": total, "buckets": buckets}
+
+    def samples(self, labelnames=(), labelvalues=()) -> List[str]:
+        snapshot = self.snapshot()
+        lines = []
+        for bound, count in snapshot["buckets"].items():
+            bucket_labels = _format_labels(labelnames, labelvalues, 'le="%s"' % bound)
+            lines.append(f"{self.name}_bucket{bucket_labels} {count}")
+        labels = _format_labels(labelnames, labelvalues)
+        lines.append(f"{self.name}_sum{labels} {_format_value(snapshot['sum'])}")
+        lines.append(f"{self.name}_count{labels} {snapshot['count']}")
+        return lines
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram", *self.samples()]
+
+
+class HistogramVec:
+    """
+    Семейство гистограмм с метками: отдельная Histogram на каждый набор значений
+    """
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str], buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = buckets
+        self._children: Dict[tuple, Histogram] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *labelvalues) -> Histogram:
+        child = self._children.get(labelvalues)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(
+                    labelvalues, Histogram(self.name, self.documentation, self.buckets)
+                )
+        return child
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for labelvalues, child in sorted(self._children.items()):
+            lines.extend(child.samples(self.labelnames, labelvalues))
+        return lines
+
+
+class Counter:
+    """
+    Монотонный счётчик с метками
+    """
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labelvalues, amount: float = 1):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} counter",
+            *(f"{self.name}{_format_labels(self.labelnames, labelvalues)} {_format_value(value)}"
+              for labelvalues, value in values),
+        ]
+
+
+# Метрики, попадающие в /metrics, и функции, добавляющие значения,
+# которые считаются в момент опроса (например, состояние пула)
+_registry: list = []
+_collectors: List[Callable[[], List[str]]] = []
+
+
+def register(metric):
+    _registry.append(metric)
+    return metric
+
+
+def register_collector(collector: Callable[[], List[str]]):
+    _collectors.append(collector)
+    return collector
+
+
+def gauge(name: str, documentation: str, value: float) -> List[str]:
+    return [f"# HELP {name} {documentation}", f"# TYPE {name} gauge", f"{name} {_format_value(value)}"]
+
+
+def render_prometheus() -> str:
+    """
+    Все зарегистрированные метрики в текстовом формате Prometheus 0.0.4
+    """
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    for collector in _collectors:
+        lines.extend(collector())
+    return "\n".join(lines) + "\n"
+
+
+DB_POOL_WAIT = register(Histogram(
+    "db_pool_wait_seconds",
+    "Время ожидания соединения из пула в get_db",
+))
+
+HTTP_REQUESTS = register(Counter(
+    "http_requests_total",
+    "Число HTTP-запросов по маршруту и коду ответа",
+    ("method", "route", "status"),
+))
+
+HTTP_REQUEST_DURATION = register(HistogramVec(
+    "http_request_duration_seconds",
+    "Время обработки HTTP-запроса до отправки последнего байта тела",
+    ("method", "route"),
+))
+
+HTTP_REQUEST_DB_DURATION = register(HistogramVec(
+    "http_request_db_seconds",
+    "Суммарное время SQL-запросов за один HTTP-запрос",
+    ("method", "route"),
+))
+
+DB_STATEMENTS = register(Counter(
+    "db_statements_total",
+    "Число SQL-запросов по маршруту",
+    ("method", "route"),
+))
+
+
+class MetricsMiddleware:
+    """
+    ASGI-middleware: время обработки и число запросов по маршрутам, число
+    и время SQL-запросов (через query_stats) и заголовок Server-Timing.
+
+    Метка route — шаблон пути (/api/v1/games/{game_id}), а не сам путь.
+    Server-Timing выставляется вместе с заголовками ответа, поэтому для
+    потоковых ответов (/export) в нём только работа до первого байта;
+    в гистограммы попадает полное время.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._routes: Dict[Callable, str] = {}
+
+    def _route(self, scope) -> str:
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return UNMATCHED_ROUTE
+        route = self._routes.get(endpoint)
+        if route is None:
+            # Роутер кладёт в scope только endpoint; шаблон пути находим по нему
+            # один раз и запоминаем
+            for candidate in scope["app"].routes:
+                if getattr(candidate, "endpoint", None) is endpoint:
+                    route = candidate.path
+                    break
+            self._routes[endpoint] = route = route or UNMATCHED_ROUTE
+        return route
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+
+        async def timed_send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                elapsed = (time.perf_counter() - started) * 1000
+                timing = (
+                    f'db;dur={stats.db_seconds * 1000:.2f};desc="SQL: {stats.statements}", '
+                    f"app;dur={elapsed:.2f}"
+                )
+                message["headers"] = [*message.get("headers", []), (b"server-timing", timing.encode())]
+            await send(message)
+
+        with query_stats.track_queries() as stats:
+            try:
+                await self.app(scope, receive, timed_send)
+            finally:
+                method = scope["method"]
+                route = self._route(scope)
+                HTTP_REQUESTS.inc(method, route, str(status))
+                HTTP_REQUEST_DURATION.labels(method, route).observe(time.perf_counter() - started)
+                HTTP_REQUEST_DB_DURATION.labels(method, route).observe(stats.db_seconds)
+                if stats.statements:
+                    DB_STATEMENTS.inc(method, route, amount=stats.statements)
@@ -0,0 +1,45 @@
+import base64
+import json
+from datetime import datetime
+from fastapi import HTTPException, Response
+
+# Курсор следующей страницы отдаётся в заголовке, чтобы тело ответа
+# осталось списком и старые клиенты с skip/limit продолжали работать
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+# Верхняя граница limit для страниц; полные выборки отдают потоком /export
+MAX_LIMIT = 1000
+
+
+def encode_cursor(*values) -> str:
+    """
+    Упаковывает значения ключа сортировки последней строки в непрозрачную строку
+    """
+    raw = json.dumps(values, default=str, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, *types) -> list:
+    """
+    Распаковывает курсор и приводит значения к types (int, str, float, datetime)
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, list) or len(values) != len(types):
+            raise ValueError(cursor)
+        return [
+            value_type.fromisoformat(value) if value_type is datetime else value_type(value)
+            for value_type, value in zip(types, values)
+        ]
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Некорректный курсор")
+
+
+def set_next_cursor(response: Response, rows, limit: int, key):
+    """
+    Ставит заголовок X-Next-Cursor, если страница заполнена целиком.
+    key(row) возвращает кортеж значений ключа сортировки
+    """
+    if rows and len(rows) == limit:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(*key(rows[-1]))
@@ -0,0 +1,129 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from sqlalchemy import event
+
+
+class QueryLimitExceeded(RuntimeError):
+    pass
+
+
+class QueryStats:
+    """
+    Число SQL-запросов и суммарное время их выполнения (в секундах)
+    в рамках одного запроса/блока. Запросы вложенного блока сразу
+    учитываются и во всех объемлющих (parent)
+    """
+
+    __slots__ = ("statements", "db_seconds", "parent")
+
+    def __init__(self, parent=None):
+        self.statements = 0
+        self.db_seconds = 0.0
+        self.parent = parent
+
+
+_current_stats: ContextVar = ContextVar("query_stats", default=None)
+
+
+def current_stats():
+    return _current_stats.get()
+
+
+@contextmanager
+def track_queries():
+    stats = QueryStats(_current_stats.get())
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+
+
+@contextmanager
+def assert_max_queries(limit: int):
+    """
+    Падает с QueryLimitExceeded, если блок выполнил больше limit SQL-запросов.
+
+    Пример:
+        with assert_max_queries(2):
+            await client.get("/api/v1/news/")
+    """
+    with track_queries() as stats:
+        yield stats
+    if stats.statements > limit:
+        raise QueryLimitExceeded(f"Выполнено {stats.statements} SQL-запросов при лимите {limit}")
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current_stats.get()
+    if stats is None:
+        return
+    if context is not None:
+        context._query_started = time.perf_counter()
+    while stats is not None:
+        stats.statements += 1
+        stats = stats.parent
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current_stats.get()
+    started = getattr(context, "_query_started", None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    while stats is not None:
+        stats.db_seconds += elapsed
+        stats = stats.parent
+
+
+def install(engine):
+    """
+    Подключает подсчёт запросов и их времени к синхронному движку
+    (для AsyncEngine — к sync_engine)
+    """
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class QueryCountGuardMiddleware:
+    """
+    ASGI-middleware для отладки: отвечает 500, если обработчик выполнил
+    больше limit SQL-запросов. Проверка делается перед отправкой заголовков,
+    поэтому ловит N+1 ещё до того, как клиент получит ответ.
+    """
+
+    def __init__(self, app, limit: int):
+        self.app = app
+        self.limit = limit
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        rejected = False
+
+        async def guarded_send(message):
+            nonlocal rejected
+            if rejected:
+                return
+            if message["type"] == "http.response.start" and stats.statements > self.limit:
+                rejected = True
+                body = (
+                    f'{{"detail":"Превышен лимит SQL-запросов: {stats.statements} > {self.limit}"}}'
+                ).encode()
+                await send({
+                    "type": "http.response.start",
+                    "status": 500,
+                    "headers": [
+                        (b"content-type", b"application/json"),
+                        (b"content-length", str(len(body)).encode()),
+                    ],
+                })
+                await send({"type": "http.response.body", "body": body})
+                return
+            await send(message)
+
+        with track_queries() as stats:
+            await self.app(scope, receive, guarded_send)
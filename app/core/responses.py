@@ -0,0 +1,92 @@
+import types
+from functools import lru_cache
+from typing import Callable, List, Optional, Union, get_args, get_origin
+from fastapi import Response
+from pydantic import BaseModel, TypeAdapter
+from pydantic_core import to_json
+from .config import settings
+
+# Режимы сериализации ответов (Settings.JSON_RENDERER):
+# trusted — ORM-объекты раскладываются по полям схемы без повторной проверки
+# и сразу пишутся в JSON; validate — объекты сначала проверяются по схеме
+JSON_TRUSTED = "trusted"
+JSON_VALIDATE = "validate"
+
+
+@lru_cache(maxsize=None)
+def type_adapter(schema) -> TypeAdapter:
+    return TypeAdapter(schema)
+
+
+def _projector(annotation) -> Optional[Callable]:
+    """
+    Функция, превращающая значение атрибута ORM в то, что to_json запишет
+    так же, как pydantic по аннотации; None — значение годится как есть
+    (str, int, float, bool, datetime, date, Enum)
+    """
+    origin = get_origin(annotation)
+    if origin in (Union, types.UnionType):
+        args = [arg for arg in get_args(annotation) if arg is not type(None)]
+        return _projector(args[0]) if len(args) == 1 else None
+    if origin in (list, List):
+        item = _projector(get_args(annotation)[0])
+        if item is None:
+            return None
+        return lambda value: None if value is None else [item(element) for element in value]
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        fields = [(name, _projector(field.annotation)) for name, field in annotation.model_fields.items()]
+
+        def project(obj):
+            if obj is None:
+                return None
+            # Загруженные значения лежат в __dict__ экземпляра: чтение оттуда
+            # в разы дешевле дескрипторов SQLAlchemy; остальное — через getattr
+            loaded = getattr(obj, "__dict__", {})
+            result = {}
+            for name, convert in fields:
+                value = loaded[name] if name in loaded else getattr(obj, name)
+                result[name] = value if convert is None else convert(value)
+            return result
+        return project
+    return None
+
+
+@lru_cache(maxsize=None)
+def serializer(schema, renderer: str = None) -> Callable[[object], bytes]:
+    """
+    Функция ORM-объект(ы) -> JSON-байты по схеме ответа (модель или List[модель]).
+
+    В режиме trusted pydantic не строит промежуточные модели: атрибуты
+    берутся по полям схемы в её порядке и сериализуются to_json из
+    pydantic-core. Так можно делать только с данными из нашей БД, типы
+    которых уже совпадают со схемой; у схем ответов нет алиасов,
+    валидаторов и вычисляемых полей, иначе нужен режим validate.
+    """
+    adapter = type_adapter(schema)
+    if (renderer or settings.JSON_RENDERER) == JSON_VALIDATE:
+        return lambda data: adapter.dump_json(adapter.validate_python(data, from_attributes=True))
+    project = _projector(schema)
+    if project is None:
+        return adapter.dump_json
+    return lambda data: to_json(project(data))
+
+
+def render_json(schema, data) -> bytes:
+    """
+    Сериализует ORM-объекты по схеме ответа сразу в JSON-байты
+    """
+    return serializer(schema)(data)
+
+
+def json_response(schema, data, status_code: int = 200, headers=None) -> Response:
+    """
+    Готовый JSON-ответ для обработчиков, возвращающих ORM-объекты: FastAPI
+    не проверяет Response повторно по response_model и не прогоняет его
+    через jsonable_encoder.
+
+    Заголовки, выставленные на параметре response обработчика (например,
+    X-Next-Cursor), в возвращаемый Response сами не попадают — их передают
+    в headers.
+    """
+    headers = {name: value for name, value in (headers or {}).items() if name.lower() != "content-length"}
+    return Response(render_json(schema, data), status_code=status_code, media_type="application/json", headers=headers)
@@ -1,12 +1,65 @@
+import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from .api.v1.api import api_router
+from .core.broker import broker
+from .core.cache import cache
 from .core.config import settings
+from .core.database import dispose_engines, warm_up_pool
+from .core.jobs import job_worker
+from .core.metrics import MetricsMiddleware, render_prometheus
+from .core.query_stats import QueryCountGuardMiddleware
+from .services.chat import chat_log
+from .services.stream import event_hub
+
+logger = logging.getLogger("uvicorn.error")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Выполняется в каждом воркере: у каждого свой пул соединений
+    if settings.DB_POOL_PREWARM:
+        try:
+            opened = await warm_up_pool()
+            logger.info("Пул БД прогрет: %d соединений", opened)
+        except Exception as exc:
+            # Без прогрева соединения откроются при первых запросах
+            logger.warning("Не удалось прогреть пул БД: %s", exc)
+    # Подписка на брокер: буфер чата, поток событий и кэш ответов видят
+    # записи других воркеров
+    await cache.start()
+    await chat_log.start()
+    await event_hub.start()
+    # Фоновые задачи выполняются в каждом воркере (JOBS_CONCURRENCY)
+    await job_worker.start()
+    yield
+    await job_worker.stop()
+    await event_hub.stop()
+    await chat_log.stop()
+    await cache.stop()
+    await broker.close()
+    await dispose_engines()
+
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
-    version=settings.PROJECT_VERSION
+    version=settings.PROJECT_VERSION,
+    lifespan=lifespan
 )
 
+if settings.DEBUG and settings.QUERY_COUNT_LIMIT:
+    app.add_middleware(QueryCountGuardMiddleware, limit=settings.QUERY_COUNT_LIMIT)
+
+if settings.METRICS_ENABLED:
+    # Добавляется последним, то есть оборачивает все остальные middleware
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+    async def metrics():
+        # Starlette сам допишет charset=utf-8
+        return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+
 app.include_router(api_router, prefix="/api/v1")
 
 @app.get("/")
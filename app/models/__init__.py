@@ -1,4 +1,10 @@
 from .player import Player
 from .news import News, Tag
 from .game import Game
+from .team import Team
+from .leaderboard import Leaderboard
+from .standing import Standing
+from .box_score import BoxScore
+from .chat import ChatMessage
+from .job import Job
 from ..core.database import Base 
\ No newline at end of file
@@ -0,0 +1,24 @@
+from sqlalchemy import Column, Integer, DateTime, ForeignKey, Index
+from ..core.database import Base
+import datetime
+
+
+class BoxScore(Base):
+    """
+    Строка протокола игры: статистика одного игрока в одной игре.
+    Сезонные total_* в players поддерживаются из этих строк (services/box_scores.py)
+    """
+    __tablename__ = "box_scores"
+    __table_args__ = (
+        Index("ix_box_scores_player_id", "player_id"),
+    )
+
+    game_id = Column(Integer, ForeignKey("games.id", ondelete="CASCADE"), primary_key=True)
+    player_id = Column(Integer, ForeignKey("players.id", ondelete="CASCADE"), primary_key=True)
+    points = Column(Integer, nullable=False, default=0)
+    rebounds = Column(Integer, nullable=False, default=0)
+    assists = Column(Integer, nullable=False, default=0)
+    steals = Column(Integer, nullable=False, default=0)
+    blocks = Column(Integer, nullable=False, default=0)
+    turnovers = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
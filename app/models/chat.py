@@ -0,0 +1,17 @@
+from sqlalchemy import Column, Integer, String, DateTime
+from ..core.database import Base
+import datetime
+
+
+class ChatMessage(Base):
+    """
+    Сообщение вкладки «Обсуждение». Порядок сообщений — по id
+    """
+    __tablename__ = "chat_messages"
+
+    id = Column(Integer, primary_key=True)
+    user_name = Column(String(50), nullable=False)
+    text = Column(String(2000), nullable=False)
+    # message — обычное сообщение, join — пользователь присоединился к чату
+    kind = Column(String(16), nullable=False, default="message")
+    created_at = Column(DateTime, nullable=False, default=datetime.datetime.utcnow)
@@ -1,11 +1,20 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean, Enum
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean, Enum, Index, text
 from sqlalchemy.orm import relationship
 from ..core.database import Base
 from .player import GenderType
+import datetime
 
 
 class Game(Base):
     __tablename__ = "games"
+    __table_args__ = (
+        Index("ix_games_gender_date_time", "gender", "date_time", "id"),
+        Index("ix_games_date_time", "date_time"),
+        Index(
+            "ix_games_finished", "gender", "date_time", "id",
+            postgresql_where=text("score_black_bears IS NOT NULL AND score_opponent IS NOT NULL"),
+        ),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     gender = Column(Enum(GenderType), nullable=False)
@@ -15,6 +24,7 @@ class Game(Base):
     is_home_game = Column(Boolean, nullable=False)
     score_black_bears = Column(Integer)
     score_opponent = Column(Integer)
+    updated_at = Column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
     
     # Связь с командой
     team = relationship("Team", back_populates="games")
@@ -0,0 +1,29 @@
+from sqlalchemy import Column, BigInteger, Integer, String, Text, DateTime, JSON, Index, text
+from ..core.database import Base
+import datetime
+
+
+class Job(Base):
+    """
+    Фоновая задача в очереди (core/jobs.py). Выполненные задачи удаляются,
+    в таблице остаются ожидающие, выполняемые и окончательно упавшие (failed)
+    """
+    __tablename__ = "jobs"
+    __table_args__ = (
+        # Выборка готовых к запуску задач: queued и running с истёкшей арендой
+        Index("ix_jobs_ready", "run_at", postgresql_where=text("state IN ('queued', 'running')")),
+        # Одна ожидающая задача на ключ: повторная постановка ничего не добавляет
+        Index("uq_jobs_queued_key", "key", unique=True, postgresql_where=text("state = 'queued'")),
+    )
+
+    id = Column(BigInteger, primary_key=True)
+    kind = Column(String(64), nullable=False)
+    payload = Column(JSON, nullable=False)
+    key = Column(String(200))
+    # queued — ждёт запуска, running — выполняется (до run_at), failed — попытки кончились
+    state = Column(String(16), nullable=False, default="queued")
+    attempts = Column(Integer, nullable=False, default=0)
+    # Для queued — время запуска (с учётом задержки повтора), для running — конец аренды
+    run_at = Column(DateTime, nullable=False, default=datetime.datetime.utcnow)
+    created_at = Column(DateTime, nullable=False, default=datetime.datetime.utcnow)
+    last_error = Column(Text)
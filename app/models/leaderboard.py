@@ -1,10 +1,14 @@
-from sqlalchemy import Column, Integer, String, Date, Float, ForeignKey, Enum
+from sqlalchemy import Column, Integer, String, Date, DateTime, Float, ForeignKey, Enum, Index
 from sqlalchemy.orm import relationship
 from ..core.database import Base
 from ..schemas.player import GenderType
+import datetime
 
 class Leaderboard(Base):
     __tablename__ = "leaderboard"
+    __table_args__ = (
+        Index("ix_leaderboard_gender_position", "gender", "position"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False)
@@ -15,3 +19,4 @@ class Leaderboard(Base):
     scored = Column(Integer, nullable=False)
     conceded = Column(Integer, nullable=False)
     position = Column(Integer, nullable=False)
+    updated_at = Column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
@@ -1,17 +1,30 @@
-from sqlalchemy import Column, Integer, String, DateTime, Table, ForeignKey
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Computed, Integer, String, DateTime, Table, ForeignKey, Index
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import deferred, relationship
 from ..core.database import Base
+from ..core.images import image_set
 import datetime
 
 news_tags = Table(
     'news_tags',
     Base.metadata,
     Column('news_id', Integer, ForeignKey('news.id')),
-    Column('tag_id', Integer, ForeignKey('tags.id'))
+    Column('tag_id', Integer, ForeignKey('tags.id')),
+    Index('ix_news_tags_tag_id_news_id', 'tag_id', 'news_id'),
+    Index('ix_news_tags_news_id', 'news_id'),
+)
+
+# Поисковый вектор: заголовок весит больше текста (веса A и B в ts_rank)
+SEARCH_VECTOR_SQL = (
+    "setweight(to_tsvector('russian', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('russian', coalesce(content, '')), 'B')"
 )
 
 class News(Base):
     __tablename__ = "news"
+    __table_args__ = (
+        Index("ix_news_search_vector", "search_vector", postgresql_using="gin"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, nullable=False)
@@ -19,8 +32,17 @@ class News(Base):
     image_url = Column(String)
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
+    # Вычисляется в БД; в обычных выборках не загружается
+    search_vector = deferred(Column(TSVECTOR, Computed(SEARCH_VECTOR_SQL, persisted=True)))
     
-    tags = relationship("Tag", secondary=news_tags, back_populates="news")
+    # Теги всегда загружаются явно через selectinload: неявная ленивая
+    # загрузка на каждую новость давала N+1 запросов при сериализации ленты
+    tags = relationship("Tag", secondary=news_tags, back_populates="news", lazy="raise_on_sql")
+
+    @property
+    def image(self):
+        # Поле image ответа: ссылки на уменьшенные копии image_url
+        return image_set(self.image_url)
 
 class Tag(Base):
     __tablename__ = "tags"
@@ -1,6 +1,8 @@
-from sqlalchemy import Column, Integer, String, Date, Float, ForeignKey, Enum
+from sqlalchemy import Column, Integer, String, Date, DateTime, Float, ForeignKey, Enum, Index
 from sqlalchemy.orm import relationship
 from ..core.database import Base
+from ..core.images import image_set
+import datetime
 import enum
 
 class GenderType(str, enum.Enum):
@@ -9,6 +11,20 @@ class GenderType(str, enum.Enum):
 
 class Player(Base):
     __tablename__ = "players"
+    __table_args__ = (
+        Index("ix_players_gender_games_played", "gender", "games_played"),
+        Index("ix_players_name_sort", "last_name", "first_name", "id"),
+        Index("ix_players_total_points", "total_points", "id"),
+        # Триграммные индексы (pg_trgm) под поиск ilike '%...%'
+        Index(
+            "ix_players_first_name_trgm", "first_name",
+            postgresql_using="gin", postgresql_ops={"first_name": "gin_trgm_ops"},
+        ),
+        Index(
+            "ix_players_last_name_trgm", "last_name",
+            postgresql_using="gin", postgresql_ops={"last_name": "gin_trgm_ops"},
+        ),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     first_name = Column(String, nullable=False)
@@ -23,10 +39,16 @@ class Player(Base):
     image_url = Column(String)
     
     # Статистика за сезон
-    games_played = Column(Integer, default=0)
-    total_points = Column(Integer, default=0)
-    total_rebounds = Column(Integer, default=0)
-    total_assists = Column(Integer, default=0)
-    total_steals = Column(Integer, default=0)
-    total_blocks = Column(Integer, default=0)
-    total_turnovers = Column(Integer, default=0)
\ No newline at end of file
+    games_played = Column(Integer, nullable=False, default=0, server_default="0")
+    total_points = Column(Integer, nullable=False, default=0, server_default="0")
+    total_rebounds = Column(Integer, nullable=False, default=0, server_default="0")
+    total_assists = Column(Integer, nullable=False, default=0, server_default="0")
+    total_steals = Column(Integer, nullable=False, default=0, server_default="0")
+    total_blocks = Column(Integer, nullable=False, default=0, server_default="0")
+    total_turnovers = Column(Integer, nullable=False, default=0, server_default="0")
+    updated_at = Column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
+
+    @property
+    def image(self):
+        # Поле image ответа: ссылки на уменьшенные копии image_url
+        return image_set(self.image_url)
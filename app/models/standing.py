@@ -0,0 +1,26 @@
+from sqlalchemy import Column, Integer, String, DateTime, Float, Enum, UniqueConstraint
+from ..core.database import Base
+from .player import GenderType
+
+
+class Standing(Base):
+    """
+    Строка турнирной таблицы. Не редактируется вручную: пересчитывается
+    из сыгранных игр в services/standings.py
+    """
+    __tablename__ = "standings"
+    __table_args__ = (
+        UniqueConstraint("gender", "name", name="uq_standings_gender_name"),
+    )
+
+    gender = Column(Enum(GenderType), primary_key=True)
+    position = Column(Integer, primary_key=True)
+    name = Column(String, nullable=False)
+    games = Column(Integer, nullable=False)
+    wins = Column(Integer, nullable=False)
+    losses = Column(Integer, nullable=False)
+    scored = Column(Integer, nullable=False)
+    conceded = Column(Integer, nullable=False)
+    points_difference = Column(Integer, nullable=False)
+    win_percentage = Column(Float, nullable=False)
+    updated_at = Column(DateTime, nullable=False)
@@ -1,7 +1,9 @@
-from sqlalchemy import Column, Integer, String, Enum, Float
+from sqlalchemy import Column, Integer, String, Enum, Float, DateTime
 from sqlalchemy.orm import relationship
 from ..core.database import Base
+from ..core.images import image_set
 from .player import GenderType
+import datetime
 
 class Team(Base):
     __tablename__ = "teams"
@@ -22,7 +24,12 @@ class Team(Base):
     # Вычисляемые поля
     win_percentage = Column(Float, default=0.0)
     points_difference = Column(Integer, default=0)
+    updated_at = Column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
     
     # Добавляем связь с играми
     games = relationship("Game", back_populates="team")
-    
\ No newline at end of file
+
+    @property
+    def logo(self):
+        # Поле logo ответа: ссылки на уменьшенные копии logo_url
+        return image_set(self.logo_url)
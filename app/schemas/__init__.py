@@ -1,3 +1,4 @@
+from .image import ResponsiveImage
 from .player import (
     PlayerBase, PlayerCreate, PlayerUpdate, PlayerInDB,
     GenderType
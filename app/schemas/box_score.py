@@ -0,0 +1,16 @@
+from pydantic import BaseModel, Field
+
+class BoxScoreLine(BaseModel):
+    player_id: int
+    points: int = Field(default=0, ge=0)
+    rebounds: int = Field(default=0, ge=0)
+    assists: int = Field(default=0, ge=0)
+    steals: int = Field(default=0, ge=0)
+    blocks: int = Field(default=0, ge=0)
+    turnovers: int = Field(default=0, ge=0)
+
+class BoxScoreInDB(BoxScoreLine):
+    game_id: int
+
+    class Config:
+        from_attributes = True
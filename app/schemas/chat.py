@@ -0,0 +1,20 @@
+from pydantic import BaseModel, Field
+from datetime import datetime
+from typing import Literal
+
+ChatMessageKind = Literal["message", "join"]
+
+class ChatMessageCreate(BaseModel):
+    user_name: str = Field(min_length=1, max_length=50)
+    text: str = Field(min_length=1, max_length=2000)
+    kind: ChatMessageKind = "message"
+
+class ChatMessage(BaseModel):
+    id: int
+    user_name: str
+    text: str
+    kind: ChatMessageKind
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
@@ -0,0 +1,9 @@
+from pydantic import BaseModel
+
+class ResponsiveImage(BaseModel):
+    # Копия ширины IMAGE_DEFAULT_WIDTH и все копии для <img srcset>
+    src: str
+    srcset: str
+
+    class Config:
+        from_attributes = True
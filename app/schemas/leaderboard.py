@@ -26,3 +26,18 @@ class LeaderboardUpdate(BaseModel):
 
 class LeaderboardInDB(LeaderboardBase):
     id: int
+
+class Standing(BaseModel):
+    position: int
+    name: str
+    gender: GenderType
+    games: int
+    wins: int
+    losses: int
+    scored: int
+    conceded: int
+    points_difference: int
+    win_percentage: float
+
+    class Config:
+        from_attributes = True
@@ -1,6 +1,7 @@
 from pydantic import BaseModel
 from datetime import datetime
 from typing import Optional, List
+from .image import ResponsiveImage
 
 class TagBase(BaseModel):
     name: str
@@ -32,6 +33,12 @@ class News(NewsBase):
     created_at: datetime
     updated_at: datetime
     tags: List[Tag] = []
+    # Уменьшенные копии image_url через /api/v1/img
+    image: Optional[ResponsiveImage] = None
 
     class Config:
-        from_attributes = True 
\ No newline at end of file
+        from_attributes = True
+
+class NewsSearchHit(News):
+    rank: float
+    snippet: str
@@ -2,6 +2,7 @@ from pydantic import BaseModel
 from datetime import date
 from typing import Optional
 from enum import Enum
+from .image import ResponsiveImage
 
 class GenderType(str, Enum):
     MALE = "male"
@@ -41,6 +42,8 @@ class PlayerInDB(PlayerBase):
     total_steals: int = 0
     total_blocks: int = 0
     total_turnovers: int = 0
+    # Уменьшенные копии image_url через /api/v1/img
+    image: Optional[ResponsiveImage] = None
 
     class Config:
         from_attributes = True 
\ No newline at end of file
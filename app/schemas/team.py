@@ -1,5 +1,6 @@
 from pydantic import BaseModel
 from typing import Optional, List
+from .image import ResponsiveImage
 from .player import GenderType
 
 class TeamBase(BaseModel):
@@ -11,15 +12,11 @@ class TeamCreate(TeamBase):
     pass
 
 class TeamUpdate(TeamBase):
+    # Счётчики игр и место только для чтения: их пересчитывает
+    # services/standings.py из сыгранных игр
     name: Optional[str] = None
     gender: Optional[GenderType] = None
     logo_url: Optional[str] = None
-    games_played: Optional[int] = None
-    wins: Optional[int] = None
-    losses: Optional[int] = None
-    points_scored: Optional[int] = None
-    points_conceded: Optional[int] = None
-    current_position: Optional[int] = None
 
 class TeamInDB(TeamBase):
     id: int
@@ -31,6 +28,8 @@ class TeamInDB(TeamBase):
     current_position: Optional[int] = None
     win_percentage: float = 0.0
     points_difference: int = 0
+    # Уменьшенные копии logo_url через /api/v1/img
+    logo: Optional[ResponsiveImage] = None
 
     class Config:
         from_attributes = True
\ No newline at end of file
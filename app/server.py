@@ -0,0 +1,200 @@
+"""
+Production-запуск API:
+    python -m app.server
+
+- alembic upgrade head выполняется один раз в главном процессе до запуска
+  воркеров (под pg_advisory_lock, чтобы несколько реплик не мигрировали
+  одновременно), WEB_MIGRATE=false отключает;
+- число воркеров — WEB_WORKERS или число доступных процессу ядер (с учётом
+  affinity и квоты CPU cgroup в контейнере), не больше WEB_MAX_WORKERS;
+- воркеры — uvicorn с uvloop и httptools (если установлены) под gunicorn:
+  он перезапускает упавшие воркеры, а по SIGTERM даёт им дообработать
+  текущие запросы за WEB_GRACEFUL_TIMEOUT секунд;
+- без gunicorn (Windows) — встроенный мультипроцессный режим uvicorn.
+
+Каждый воркер при старте прогревает свой пул соединений (DB_POOL_PREWARM)
+и выполняет фоновые задачи из общей очереди (JOBS_CONCURRENCY).
+У каждого воркера свои кэш memory и /metrics; записи в кэше memory
+сбрасываются во всех воркерах через брокер (BROKER_BACKEND=memory годится
+только для одного воркера), общий кэш — CACHE_BACKEND=redis.
+Все параметры берутся из Settings (переменные окружения и .env).
+"""
+import importlib.util
+import logging
+import math
+import os
+import sys
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import NullPool
+from .core.config import settings
+
+try:
+    from gunicorn.app.base import BaseApplication
+    from gunicorn.arbiter import Arbiter
+    from uvicorn import Server
+    from uvicorn.workers import UvicornWorker
+except ImportError:  # gunicorn не работает на Windows
+    BaseApplication = UvicornWorker = None
+
+logger = logging.getLogger("app.server")
+
+# Постоянный ключ pg_advisory_lock для миграций
+MIGRATION_LOCK_KEY = 0x626C61636B
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def available_cpus() -> int:
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    # docker --cpus ограничивает процессорное время, а не число видимых ядер
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as file:
+            quota, period = file.read().split()
+        if quota != "max":
+            cpus = min(cpus, max(1, math.ceil(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+    return cpus
+
+
+def worker_count() -> int:
+    if settings.WEB_WORKERS > 0:
+        return settings.WEB_WORKERS
+    return max(1, min(available_cpus(), settings.WEB_MAX_WORKERS))
+
+
+def migrate():
+    """
+    alembic upgrade head под advisory-блокировкой: вторая реплика дождётся
+    первой и увидит, что миграции уже применены
+    """
+    from alembic import command
+    from alembic.config import Config
+
+    # Без alembic.ini: env.py не перенастраивает логирование процесса
+    config = Config()
+    config.set_main_option("script_location", os.path.join(PROJECT_ROOT, "migrations"))
+    lock_engine = create_engine(settings.DATABASE_URL, poolclass=NullPool, isolation_level="AUTOCOMMIT")
+    try:
+        with lock_engine.connect() as connection:
+            connection.execute(text("SELECT pg_advisory_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+            try:
+                command.upgrade(config, "head")
+            finally:
+                connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MIGRATION_LOCK_KEY})
+    finally:
+        lock_engine.dispose()
+
+
+def post_fork(server, worker):
+    from .core.database import reset_pools_after_fork
+
+    reset_pools_after_fork()
+
+
+if UvicornWorker is not None:
+    class StreamingServer(Server):
+        def handle_exit(self, sig, frame):
+            super().handle_exit(sig, frame)
+            # Потоки /api/v1/stream не заканчиваются сами: без этого каждая
+            # остановка воркера с подписчиками длилась бы graceful_timeout
+            from .services.stream import event_hub
+
+            event_hub.shutdown()
+
+    class Worker(UvicornWorker):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            # Иначе uvicorn ждёт закрытия соединений без ограничения, и gunicorn
+            # убивает воркер по graceful_timeout посреди ответа
+            self.config.timeout_graceful_shutdown = max(1, self.cfg.graceful_timeout - 1)
+
+        async def _serve(self):
+            # Как UvicornWorker._serve, но со StreamingServer
+            self.config.app = self.wsgi
+            server = StreamingServer(config=self.config)
+            self._install_sigquit_handler()
+            await server.serve(sockets=self.sockets)
+            if not server.started:
+                sys.exit(Arbiter.WORKER_BOOT_ERROR)
+
+    class Application(BaseApplication):
+        def __init__(self, options: dict):
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for name, value in self.options.items():
+                self.cfg.set(name, value)
+
+        def load(self):
+            from .main import app
+
+            return app
+
+
+def gunicorn_options(workers: int) -> dict:
+    return {
+        "bind": f"{settings.WEB_HOST}:{settings.WEB_PORT}",
+        "workers": workers,
+        "worker_class": "app.server.Worker",
+        "graceful_timeout": settings.WEB_GRACEFUL_TIMEOUT,
+        "keepalive": settings.WEB_KEEPALIVE,
+        "max_requests": settings.WEB_MAX_REQUESTS,
+        # Разброс, чтобы воркеры не перезапускались одновременно
+        "max_requests_jitter": settings.WEB_MAX_REQUESTS // 10,
+        "preload_app": settings.WEB_PRELOAD,
+        "forwarded_allow_ips": settings.WEB_FORWARDED_ALLOW_IPS,
+        "post_fork": post_fork,
+        "errorlog": "-",
+    }
+
+
+def run_uvicorn(workers: int):
+    import uvicorn
+
+    uvicorn.run(
+        "app.main:app",
+        host=settings.WEB_HOST,
+        port=settings.WEB_PORT,
+        workers=workers,
+        loop="auto",
+        http="auto",
+        timeout_keep_alive=settings.WEB_KEEPALIVE,
+        timeout_graceful_shutdown=settings.WEB_GRACEFUL_TIMEOUT,
+        limit_max_requests=settings.WEB_MAX_REQUESTS or None,
+        forwarded_allow_ips=settings.WEB_FORWARDED_ALLOW_IPS,
+        access_log=False,
+    )
+
+
+def main():
+    logging.basicConfig(format="[%(asctime)s] [%(process)d] [%(levelname)s] %(message)s")
+    logger.setLevel(logging.INFO)
+    workers = worker_count()
+    logger.info(
+        "Воркеров: %d (ядер доступно: %d), цикл: %s, HTTP: %s, соединений с БД до %d",
+        workers, available_cpus(),
+        "uvloop" if importlib.util.find_spec("uvloop") else "asyncio",
+        "httptools" if importlib.util.find_spec("httptools") else "h11",
+        workers * (settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW),
+    )
+    if workers > 1 and settings.BROKER_BACKEND == "memory":
+        logger.warning(
+            "BROKER_BACKEND=memory при %d воркерах: чат, поток событий и сброс кэша "
+            "memory не видят записей других воркеров", workers,
+        )
+    if settings.WEB_MIGRATE:
+        migrate()
+        logger.info("Миграции применены")
+    if BaseApplication is None:
+        run_uvicorn(workers)
+    else:
+        Application(gunicorn_options(workers)).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+import datetime
+from typing import List
+from sqlalchemy import Integer, and_, column, func, or_, select, update, values
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..models.box_score import BoxScore
+from ..models.player import Player
+from ..schemas.box_score import BoxScoreLine
+
+# Поле строки протокола -> сезонный итог игрока
+TOTALS = {
+    "points": Player.total_points,
+    "rebounds": Player.total_rebounds,
+    "assists": Player.total_assists,
+    "steals": Player.total_steals,
+    "blocks": Player.total_blocks,
+    "turnovers": Player.total_turnovers,
+}
+
+
+def _apply(source, subtract: bool = False) -> dict:
+    """
+    SET total_* = total_* ± source.<поле> для UPDATE players ... FROM source
+    """
+    return {
+        total.key: func.coalesce(total, 0) - source.c[field] if subtract else func.coalesce(total, 0) + source.c[field]
+        for field, total in TOTALS.items()
+    }
+
+
+async def save_box_score(db: AsyncSession, game_id: int, lines: List[BoxScoreLine]):
+    """
+    Записывает строки протокола игры и сдвигает итоги игроков на разницу
+    со старыми строками: один UPDATE players и один INSERT ... ON CONFLICT.
+
+    Игроки, которых нет в lines, не затрагиваются. Вызывающий код должен
+    держать блокировку игры (SELECT ... FOR UPDATE), чтобы параллельная
+    загрузка того же протокола не посчитала разницу от устаревших строк.
+    """
+    lines_table = values(
+        column("player_id", Integer), *(column(field, Integer) for field in TOTALS), name="lines"
+    ).data([(line.player_id, *(getattr(line, field) for field in TOTALS)) for line in lines])
+
+    old = BoxScore.__table__.c
+    delta = (
+        select(
+            lines_table.c.player_id,
+            *((lines_table.c[field] - func.coalesce(old[field], 0)).label(field) for field in TOTALS),
+        )
+        .select_from(
+            lines_table.outerjoin(BoxScore, and_(BoxScore.game_id == game_id, BoxScore.player_id == lines_table.c.player_id))
+        )
+        .subquery("delta")
+    )
+    await db.execute(
+        update(Player)
+        .where(Player.id == delta.c.player_id)
+        .values(_apply(delta))
+        .execution_options(synchronize_session=False)
+    )
+
+    upsert = insert(BoxScore).values([{"game_id": game_id, **line.model_dump()} for line in lines])
+    await db.execute(upsert.on_conflict_do_update(
+        index_elements=[BoxScore.game_id, BoxScore.player_id],
+        set_={**{field: upsert.excluded[field] for field in TOTALS}, "updated_at": datetime.datetime.utcnow()},
+    ))
+
+
+async def remove_box_score(db: AsyncSession, game_id: int):
+    """
+    Вычитает протокол игры из итогов игроков (перед удалением игры;
+    сами строки удалит ON DELETE CASCADE)
+    """
+    await db.execute(
+        update(Player)
+        .where(Player.id == BoxScore.player_id, BoxScore.game_id == game_id)
+        .values(_apply(BoxScore.__table__, subtract=True))
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def rebuild_player_totals(db: AsyncSession) -> int:
+    """
+    Пересчитывает итоги всех игроков из протоколов одним UPDATE ... FROM
+    с агрегатом: box_scores читается за один проход, а строки игроков,
+    у которых итоги не изменились, не перезаписываются.
+    Возвращает число обновлённых игроков.
+    """
+    sums = (
+        select(BoxScore.player_id, *(func.sum(BoxScore.__table__.c[field]).label(field) for field in TOTALS))
+        .group_by(BoxScore.player_id)
+        .subquery("sums")
+    )
+    source = (
+        select(Player.id.label("player_id"), *(func.coalesce(sums.c[field], 0).label(field) for field in TOTALS))
+        .select_from(Player)
+        .outerjoin(sums, sums.c.player_id == Player.id)
+        .subquery("source")
+    )
+    result = await db.execute(
+        update(Player)
+        .where(
+            Player.id == source.c.player_id,
+            or_(*(total.is_distinct_from(source.c[field]) for field, total in TOTALS.items())),
+        )
+        .values({total.key: source.c[field] for field, total in TOTALS.items()})
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount
@@ -0,0 +1,208 @@
+import asyncio
+import datetime
+import json
+import logging
+from collections import deque
+from typing import List, Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..core.broker import GAP, broker
+from ..core.config import settings
+from ..core.metrics import Counter, gauge, register, register_collector
+from ..core.responses import render_json
+from ..models.chat import ChatMessage
+from ..schemas.chat import ChatMessage as ChatMessageSchema, ChatMessageCreate
+
+logger = logging.getLogger("uvicorn.error")
+
+# Канал брокера, через который воркеры узнают о новых сообщениях
+CHAT_CHANNEL = "chat"
+
+CHAT_READS = register(Counter(
+    "chat_reads_total",
+    "Чтения истории чата: из кольцевого буфера воркера или из БД",
+    ("source",),
+))
+
+
+def decode_message(payload: bytes) -> ChatMessage:
+    data = json.loads(payload)
+    data["created_at"] = datetime.datetime.fromisoformat(data["created_at"])
+    return ChatMessage(**data)
+
+
+class ChatLog:
+    """
+    Последние сообщения чата в памяти воркера.
+
+    Кольцевой буфер на size сообщений (по возрастанию id) заполняется из
+    БД при первом обращении и дальше — сообщениями из брокера, поэтому
+    видит и сообщения, записанные другими воркерами. Страницы истории и
+    новые сообщения для long-poll отдаются из буфера, если он покрывает
+    запрошенный диапазон, иначе читаются из БД.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self._messages = deque(maxlen=size)
+        # Все сообщения с id больше этого есть в буфере; None — буфер не загружен
+        self._complete_after: Optional[int] = None
+        # Сообщения, пришедшие из брокера, пока буфер не загружен
+        self._early = deque(maxlen=size)
+        self._load_lock = asyncio.Lock()
+        self._changed = asyncio.Event()
+        self._subscription = None
+        self._listener = None
+        self.waiting = 0
+
+    def __len__(self) -> int:
+        return len(self._messages)
+
+    async def start(self):
+        self._subscription = await broker.subscribe(CHAT_CHANNEL)
+        self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            self._listener = None
+        if self._subscription is not None:
+            await self._subscription.close()
+            self._subscription = None
+
+    async def _listen(self):
+        async for payload in self._subscription:
+            if payload is GAP:
+                # Часть сообщений могла пройти мимо: буфер перечитается из БД
+                self._complete_after = None
+                self._notify()
+                continue
+            try:
+                self.add(decode_message(payload))
+            except (ValueError, TypeError) as exc:
+                logger.warning("Чат: некорректное сообщение из брокера: %s", exc)
+
+    def _notify(self):
+        # Будит всех ждущих long-poll; следующие ждут уже новое событие
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def add(self, message: ChatMessage):
+        if not self.size:
+            self._notify()
+            return
+        if self._complete_after is None:
+            self._early.append(message)
+            self._notify()
+            return
+        if self._messages and message.id <= self._messages[-1].id:
+            # Своё сообщение вернулось из брокера или транзакции
+            # зафиксировались не в порядке id
+            if message.id <= self._complete_after or any(item.id == message.id for item in self._messages):
+                return
+            self._replace(sorted([*self._messages, message], key=lambda item: item.id))
+        else:
+            if len(self._messages) == self.size:
+                self._complete_after = self._messages[0].id
+            self._messages.append(message)
+        self._notify()
+
+    def _replace(self, messages: list):
+        if len(messages) > self.size:
+            self._complete_after = messages[-self.size - 1].id
+            messages = messages[-self.size:]
+        self._messages = deque(messages, maxlen=self.size)
+
+    async def _ensure_loaded(self, db: AsyncSession) -> bool:
+        """
+        Загружает буфер из БД, если он ещё не загружен; True — был запрос к БД
+        """
+        if self._complete_after is not None or not self.size:
+            return False
+        async with self._load_lock:
+            if self._complete_after is not None:
+                return False
+            rows = (await db.scalars(
+                select(ChatMessage).order_by(ChatMessage.id.desc()).limit(self.size)
+            )).all()
+            merged = {message.id: message for message in [*rows, *self._early]}
+            self._early.clear()
+            # Если в БД меньше size сообщений, в буфере вся история
+            self._complete_after = rows[-1].id - 1 if len(rows) == self.size else 0
+            self._messages = deque(maxlen=self.size)
+            self._replace(sorted(merged.values(), key=lambda item: item.id))
+            return True
+
+    async def page(self, db: AsyncSession, limit: int, before: Optional[int] = None) -> List[ChatMessage]:
+        """
+        До limit сообщений с id меньше before (или последних), от новых к старым
+        """
+        await self._ensure_loaded(db)
+        if self._complete_after is not None:
+            messages = [item for item in reversed(self._messages) if before is None or item.id < before][:limit]
+            # Неполная страница из буфера верна, только если в нём вся история
+            if len(messages) == limit or self._complete_after == 0:
+                CHAT_READS.inc("buffer")
+                return messages
+        CHAT_READS.inc("db")
+        query = select(ChatMessage).order_by(ChatMessage.id.desc()).limit(limit)
+        if before is not None:
+            query = query.where(ChatMessage.id < before)
+        return (await db.scalars(query)).all()
+
+    async def updates(self, db: AsyncSession, after: int, limit: int, timeout: float = 0) -> List[ChatMessage]:
+        """
+        До limit сообщений с id больше after по возрастанию. Если таких
+        нет, ждёт новое сообщение не дольше timeout секунд (long-poll);
+        соединение с БД на время ожидания не занимается
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            changed = self._changed
+            used_db = await self._ensure_loaded(db)
+            if self._complete_after is not None and after >= self._complete_after:
+                CHAT_READS.inc("buffer")
+                messages = [item for item in self._messages if item.id > after][:limit]
+            else:
+                CHAT_READS.inc("db")
+                messages = (await db.scalars(
+                    select(ChatMessage).where(ChatMessage.id > after).order_by(ChatMessage.id).limit(limit)
+                )).all()
+                used_db = True
+            remaining = deadline - loop.time()
+            if messages or remaining <= 0:
+                return messages
+            if used_db:
+                # Соединение возвращается в пул до ожидания
+                await db.close()
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(changed.wait(), remaining)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                self.waiting -= 1
+
+    async def post(self, db: AsyncSession, data: ChatMessageCreate) -> ChatMessage:
+        message = ChatMessage(**data.model_dump(), created_at=datetime.datetime.utcnow())
+        db.add(message)
+        await db.commit()
+        self.add(message)
+        try:
+            await broker.publish(CHAT_CHANNEL, render_json(ChatMessageSchema, message))
+        except Exception as exc:
+            # Сообщение уже сохранено: другие воркеры увидят его при чтении из БД
+            logger.warning("Чат: не удалось разослать сообщение %s: %s", message.id, exc)
+        return message
+
+
+chat_log = ChatLog(settings.CHAT_BUFFER_SIZE)
+
+
+@register_collector
+def chat_metrics() -> list:
+    return [
+        *gauge("chat_buffer_messages", "Сообщений в кольцевом буфере чата воркера", len(chat_log)),
+        *gauge("chat_waiting_polls", "Long-poll запросы чата, ждущие новых сообщений", chat_log.waiting),
+    ]
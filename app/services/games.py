@@ -0,0 +1,41 @@
+from collections import Counter
+from typing import Iterable
+from sqlalchemy import case, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..core.jobs import enqueue, job_handler
+from ..models.game import Game
+from ..models.player import Player
+from ..schemas.player import GenderType
+
+ADD_GAMES_PLAYED = "players.games_played"
+
+
+async def schedule_games_played(db: AsyncSession, games: Iterable[Game]):
+    """
+    Ставит в транзакции новых игр задачу увеличить games_played игрокам
+    """
+    counts = Counter(game.gender.value for game in games)
+    await enqueue(db, ADD_GAMES_PLAYED, {"counts": dict(counts)})
+
+
+@job_handler(ADD_GAMES_PLAYED)
+async def add_games_played(db: AsyncSession, payload: dict):
+    """
+    Увеличивает games_played игрокам одним UPDATE: каждому прибавляется
+    число новых игр его пола. Прибавление не идемпотентно, но задача
+    ставится вместе с играми и фиксируется вместе со своим удалением,
+    поэтому применяется ровно один раз.
+
+    Задачи обновляют одни и те же строки в разном порядке и без общей
+    блокировки взаимно блокировались бы (deadlock), поэтому выполняются
+    по очереди
+    """
+    await db.execute(select(func.pg_advisory_xact_lock(func.hashtext(ADD_GAMES_PLAYED))))
+    counts = {GenderType(gender): count for gender, count in payload["counts"].items()}
+    added = case(*((Player.gender == gender, count) for gender, count in counts.items()))
+    await db.execute(
+        update(Player)
+        .where(Player.gender.in_(counts))
+        .values(games_played=func.coalesce(Player.games_played, 0) + added)
+        .execution_options(synchronize_session=False)
+    )
@@ -0,0 +1,451 @@
+"""
+Уменьшенные копии изображений для /api/v1/img.
+
+Исходник загружается по http(s) (или читается из IMAGE_LOCAL_DIR) один раз
+и вместе с копиями хранится в дисковом кэше. Имена файлов — sha256
+содержимого исходника и параметров копии: одинаковые изображения по
+разным ссылкам делят копии, а файл копии никогда не меняется, поэтому его
+имя служит ETag. По одной ссылке со временем может лежать другое
+изображение, поэтому исходник загружается заново через IMAGE_SOURCE_TTL;
+если он стал недоступен, до следующей попытки отдаётся прежняя копия.
+
+Каталог кэша общий для воркеров. Его размер ограничен
+IMAGE_CACHE_MAX_BYTES; сверх предела удаляются файлы, которые дольше всех
+не читались (mtime обновляется при каждом чтении).
+"""
+import hashlib
+import http.client
+import io
+import ipaddress
+import logging
+import os
+import socket
+import tempfile
+import threading
+import time
+from typing import Optional, Tuple
+from urllib.parse import urljoin, urlsplit
+from PIL import Image, ImageOps
+from starlette.concurrency import run_in_threadpool
+from ..core.config import settings
+from ..core.metrics import Counter, Histogram, gauge, register, register_collector
+
+try:
+    import pillow_avif  # noqa: F401 — кодек AVIF для Pillow до 11.2
+except ImportError:
+    pass
+
+logger = logging.getLogger("uvicorn.error")
+
+JPEG = "jpeg"
+PNG = "png"
+WEBP = "webp"
+AVIF = "avif"
+
+MEDIA_TYPES = {AVIF: "image/avif", WEBP: "image/webp", JPEG: "image/jpeg", PNG: "image/png"}
+
+Image.init()
+AVIF_SUPPORTED = "AVIF" in Image.SAVE
+
+# Сколько секунд повторные запросы к недоступному или битому исходнику
+# получают ту же ошибку, не обращаясь к нему
+FAILURE_TTL = 60.0
+MAX_FAILURES = 1024
+
+IMAGE_REQUESTS = register(Counter(
+    "image_proxy_requests_total",
+    "Запросы /api/v1/img: копия из кэша (hit) или построена (miss); not_modified — из них ответы 304",
+    ("result",),
+))
+
+IMAGE_FETCHES = register(Counter(
+    "image_proxy_source_fetches_total",
+    "Загрузки исходных изображений",
+))
+
+IMAGE_EVICTIONS = register(Counter(
+    "image_proxy_cache_evictions_total",
+    "Файлы, удалённые из дискового кэша изображений по пределу размера",
+))
+
+IMAGE_BUILD_SECONDS = register(Histogram(
+    "image_proxy_build_seconds",
+    "Загрузка исходника (если его нет в кэше) и построение копии",
+))
+
+
+class ImageError(Exception):
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def negotiate(accept: Optional[str]) -> str:
+    """
+    Формат копии по заголовку Accept: AVIF (если Pillow умеет его кодировать),
+    затем WebP; иначе JPEG (PNG для изображений с прозрачностью)
+    """
+    accepted = {}
+    for item in (accept or "").split(","):
+        media_type, _, params = item.partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[media_type.strip().lower()] = quality
+    for image_format in (AVIF, WEBP) if AVIF_SUPPORTED else (WEBP,):
+        if accepted.get(MEDIA_TYPES[image_format], 0) > 0:
+            return image_format
+    return JPEG
+
+
+def media_type(data: bytes) -> str:
+    if data[:8] == b"\x89PNG\r\n\x1a\n":
+        return MEDIA_TYPES[PNG]
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return MEDIA_TYPES[WEBP]
+    if data[4:12] in (b"ftypavif", b"ftypavis"):
+        return MEDIA_TYPES[AVIF]
+    return MEDIA_TYPES[JPEG]
+
+
+# Перенаправлений при загрузке исходника, дальше — ошибка
+MAX_REDIRECTS = 5
+REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+
+
+def _check_address(address: str):
+    if not settings.IMAGE_ALLOW_PRIVATE_HOSTS and not ipaddress.ip_address(address.split("%")[0]).is_global:
+        raise ImageError(403, "Источник во внутренней сети")
+
+
+def _resolve(url: str):
+    """
+    Части ссылки и адрес, к которому можно подключиться (все адреса имени
+    должны быть глобальными, если не разрешён IMAGE_ALLOW_PRIVATE_HOSTS)
+    """
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        raise ImageError(400, "Поддерживаются только ссылки http и https")
+    try:
+        port = parts.port or (443 if parts.scheme == "https" else 80)
+    except ValueError:
+        raise ImageError(400, "Поддерживаются только ссылки http и https")
+    try:
+        addresses = socket.getaddrinfo(parts.hostname, port, type=socket.SOCK_STREAM, proto=socket.IPPROTO_TCP)
+    except OSError:
+        raise ImageError(502, "Не удалось загрузить изображение")
+    for *_, sockaddr in addresses:
+        _check_address(sockaddr[0])
+    return parts, port, addresses[0][4][0]
+
+
+class _PinnedConnection:
+    """
+    Соединение с адресом, проверенным в _resolve, а не с заново разрешённым
+    именем: иначе DNS между проверкой и подключением мог бы вернуть
+    внутренний адрес (DNS rebinding). Host и SNI остаются исходным именем
+    """
+
+    def __init__(self, *args, address: str, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.address = address
+        self._create_connection = self._connect_pinned
+
+    def _connect_pinned(self, host_port, timeout, source_address=None):
+        sock = socket.create_connection((self.address, host_port[1]), timeout, source_address)
+        try:
+            _check_address(sock.getpeername()[0])
+        except ImageError:
+            sock.close()
+            raise
+        return sock
+
+
+class _PinnedHTTPConnection(_PinnedConnection, http.client.HTTPConnection):
+    pass
+
+
+class _PinnedHTTPSConnection(_PinnedConnection, http.client.HTTPSConnection):
+    pass
+
+
+def _fetch(url: str) -> bytes:
+    source = url
+    for _ in range(MAX_REDIRECTS + 1):
+        parts, port, address = _resolve(url)
+        connection_class = _PinnedHTTPSConnection if parts.scheme == "https" else _PinnedHTTPConnection
+        connection = connection_class(parts.hostname, port, timeout=settings.IMAGE_FETCH_TIMEOUT, address=address)
+        target = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        try:
+            connection.request("GET", target, headers={"User-Agent": "black-bears-image-proxy", "Accept": "image/*"})
+            response = connection.getresponse()
+            location = response.getheader("Location")
+            if response.status in REDIRECT_STATUSES and location:
+                # Новый адрес проверяется так же, как исходный
+                url = urljoin(url, location)
+                continue
+            if response.status != 200:
+                raise http.client.HTTPException(f"HTTP {response.status}")
+            data = response.read(settings.IMAGE_MAX_SOURCE_BYTES + 1)
+        except (OSError, ValueError, http.client.HTTPException) as exc:
+            logger.warning("Прокси изображений: не удалось загрузить %s: %s", source, exc)
+            raise ImageError(502, "Не удалось загрузить изображение")
+        finally:
+            connection.close()
+        if len(data) > settings.IMAGE_MAX_SOURCE_BYTES:
+            raise ImageError(422, "Исходное изображение слишком большое")
+        return data
+    logger.warning("Прокси изображений: слишком много перенаправлений для %s", source)
+    raise ImageError(502, "Не удалось загрузить изображение")
+
+
+def _read_local(path: str) -> bytes:
+    if not settings.IMAGE_LOCAL_DIR:
+        raise ImageError(400, "Поддерживаются только ссылки http и https")
+    root = os.path.realpath(settings.IMAGE_LOCAL_DIR)
+    full_path = os.path.realpath(os.path.join(root, path.lstrip("/")))
+    if os.path.commonpath([root, full_path]) != root:
+        raise ImageError(403, "Путь вне каталога изображений")
+    try:
+        if os.path.getsize(full_path) > settings.IMAGE_MAX_SOURCE_BYTES:
+            raise ImageError(422, "Исходное изображение слишком большое")
+        with open(full_path, "rb") as file:
+            return file.read()
+    except OSError:
+        raise ImageError(404, "Изображение не найдено")
+
+
+def load_source(src: str) -> bytes:
+    return _fetch(src) if "://" in src else _read_local(src)
+
+
+def render(source: bytes, width: int, image_format: str) -> bytes:
+    """
+    Копия шириной не больше width с сохранением пропорций (меньшие не
+    увеличиваются) в формате image_format; метаданные не переносятся
+    """
+    try:
+        image = Image.open(io.BytesIO(source))
+        if image.width * image.height > settings.IMAGE_MAX_PIXELS:
+            raise ImageError(422, "Исходное изображение слишком большое")
+        # JPEG сразу декодируется в уменьшенном масштабе (1/2, 1/4, 1/8)
+        image.draft("RGB", (width, max(1, image.height * width // image.width)))
+        image = ImageOps.exif_transpose(image)
+        has_alpha = image.mode in ("RGBA", "LA", "PA") or "transparency" in image.info
+        image = image.convert("RGBA" if has_alpha else "RGB")
+        if image.width > width:
+            image.thumbnail((width, image.height), Image.LANCZOS, reducing_gap=3.0)
+        output = io.BytesIO()
+        if image_format == AVIF:
+            image.save(output, "AVIF", quality=settings.IMAGE_QUALITY)
+        elif image_format == WEBP:
+            image.save(output, "WEBP", quality=settings.IMAGE_QUALITY, method=4)
+        elif has_alpha:
+            image.save(output, "PNG", optimize=True)
+        else:
+            image.save(output, "JPEG", quality=settings.IMAGE_QUALITY, optimize=True, progressive=True)
+    except (OSError, ValueError, SyntaxError, Image.DecompressionBombError):
+        raise ImageError(422, "Источник не является изображением")
+    return output.getvalue()
+
+
+class DiskCache:
+    """
+    Файлы по ключам (hex) в каталоге directory, в подкаталогах по первым двум
+    символам ключа. Запись атомарна (временный файл и os.replace), поэтому
+    воркеры не видят недописанных файлов.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        # Размер кэша по сведениям этого воркера; другие воркеры тоже пишут
+        # в каталог, поэтому при вытеснении он пересчитывается по диску
+        self.size = None
+        self._lock = threading.Lock()
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key)
+
+    def read(self, key: str) -> Optional[bytes]:
+        path = self.path(key)
+        try:
+            with open(path, "rb") as file:
+                data = file.read()
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return data
+
+    def write(self, key: str, data: bytes):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        descriptor, temporary = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp")
+        try:
+            with os.fdopen(descriptor, "wb") as file:
+                file.write(data)
+            os.replace(temporary, path)
+        except BaseException:
+            os.unlink(temporary)
+            raise
+        with self._lock:
+            self.size = self._disk_size() if self.size is None else self.size + len(data)
+            full = self.size > self.max_bytes
+        if full:
+            self.evict()
+
+    def _files(self) -> list:
+        files = []
+        for directory in os.scandir(self.directory):
+            if not directory.is_dir():
+                continue
+            for entry in os.scandir(directory.path):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+        return files
+
+    def _disk_size(self) -> int:
+        return sum(size for _, size, _ in self._files())
+
+    def evict(self):
+        """
+        Удаляет давно не читанные файлы, пока кэш не уменьшится до 90% предела
+        """
+        with self._lock:
+            files = sorted(self._files())
+            total = sum(size for _, size, _ in files)
+            evicted = 0
+            for _, size, path in files:
+                if total <= self.max_bytes * 0.9:
+                    break
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                evicted += 1
+            self.size = total
+        if evicted:
+            IMAGE_EVICTIONS.inc(amount=evicted)
+
+
+def _key(*parts) -> str:
+    return hashlib.sha256(":".join(map(str, parts)).encode()).hexdigest()
+
+
+def _variant(digest: str, width: int, image_format: str) -> str:
+    return _key(digest, width, image_format, settings.IMAGE_QUALITY)
+
+
+class ImageProxy:
+    """
+    Копии изображений из DiskCache.
+
+    В кэше три вида файлов: ссылка (ключ — sha256 URL) с sha256 содержимого
+    исходника и временем загрузки, сам исходник под этим sha256 и копии (ключ — sha256
+    исходника, ширины, формата и качества). Копия из кэша читается сразу
+    в event loop (файлы небольшие и обычно в страничном кэше ОС), загрузка
+    и кодирование идут в threadpool. Промахи по одному исходнику в воркере
+    выполняются по очереди: второй запрос находит исходник или копию,
+    построенные первым.
+    """
+
+    def __init__(self, cache: DiskCache):
+        self.cache = cache
+        self._locks = [threading.Lock() for _ in range(64)]
+        self._failures = {}
+
+    def _source(self, src: str) -> Tuple[Optional[str], bool]:
+        """
+        sha256 исходника по ссылке и признак того, что он загружен не
+        раньше IMAGE_SOURCE_TTL назад
+        """
+        entry = self.cache.read(_key("url", src))
+        if entry is None:
+            return None, False
+        digest, _, fetched_at = entry.decode().partition(" ")
+        try:
+            fresh = time.time() - float(fetched_at) < settings.IMAGE_SOURCE_TTL
+        except ValueError:
+            fresh = False
+        return digest, fresh
+
+    def _cached(self, src: str, width: int, image_format: str) -> Tuple[Optional[str], Optional[bytes]]:
+        digest, fresh = self._source(src)
+        if not fresh:
+            return None, None
+        return digest, self.cache.read(_variant(digest, width, image_format))
+
+    async def get(self, src: str, width: int, image_format: str) -> Tuple[bytes, str]:
+        """
+        Копия и её ключ (ETag). ImageError — исходник недоступен или не изображение
+        """
+        digest, data = self._cached(src, width, image_format)
+        if data is not None:
+            IMAGE_REQUESTS.inc("hit")
+            return data, _variant(digest, width, image_format)
+        result = await run_in_threadpool(self._build, src, width, image_format)
+        IMAGE_REQUESTS.inc("miss")
+        return result
+
+    def _build(self, src: str, width: int, image_format: str) -> Tuple[bytes, str]:
+        with self._locks[hash(src) % len(self._locks)]:
+            started = time.perf_counter()
+            digest, data = self._cached(src, width, image_format)
+            if data is not None:
+                return data, _variant(digest, width, image_format)
+            digest, fresh = self._source(src)
+            failure = self._failures.get(src)
+            if failure is not None and failure[0] > time.monotonic():
+                return self._stale(src, digest, width, image_format, failure[1])
+            try:
+                source = self.cache.read(digest) if fresh else None
+                if source is None:
+                    source = load_source(src)
+                    IMAGE_FETCHES.inc()
+                    digest = hashlib.sha256(source).hexdigest()
+                    self.cache.write(digest, source)
+                    self.cache.write(_key("url", src), f"{digest} {time.time()}".encode())
+                variant = _variant(digest, width, image_format)
+                # Исходник по ссылке мог не измениться: копия уже построена
+                data = self.cache.read(variant)
+                if data is None:
+                    data = render(source, width, image_format)
+                    self.cache.write(variant, data)
+                    IMAGE_BUILD_SECONDS.observe(time.perf_counter() - started)
+            except ImageError as exc:
+                if len(self._failures) >= MAX_FAILURES:
+                    self._failures.clear()
+                self._failures[src] = (time.monotonic() + FAILURE_TTL, exc)
+                return self._stale(src, digest, width, image_format, exc)
+            return data, variant
+
+    def _stale(self, src: str, digest: Optional[str], width: int, image_format: str, exc: ImageError):
+        """
+        Исходник не удалось загрузить заново: прежняя копия, если она есть
+        """
+        data = self.cache.read(_variant(digest, width, image_format)) if digest else None
+        if data is None:
+            raise exc
+        logger.warning("Прокси изображений: %s недоступен, отдаётся прежняя копия", src)
+        return data, _variant(digest, width, image_format)
+
+
+image_proxy = ImageProxy(DiskCache(settings.IMAGE_CACHE_DIR, settings.IMAGE_CACHE_MAX_BYTES))
+
+
+@register_collector
+def image_metrics() -> list:
+    return gauge(
+        "image_proxy_cache_bytes", "Размер дискового кэша изображений по сведениям воркера",
+        image_proxy.cache.size or 0,
+    )
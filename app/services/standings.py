@@ -0,0 +1,269 @@
+import datetime
+from typing import Iterable, Optional, Tuple
+from sqlalchemy import Float, and_, cast, delete, func, insert, literal, select, union_all, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..core.cache import cache
+from ..core.config import settings
+from ..core.jobs import after_commit, enqueue, job_handler
+from ..models.game import Game
+from ..models.standing import Standing
+from ..models.team import Team
+from ..schemas.player import GenderType
+from .stream import LEADERBOARD_CHANGED, publish_event
+
+# Ключ advisory-блокировки: параллельные пересчёты одного пола выполняются по очереди
+LOCK_NAMESPACE = "standings"
+
+REFRESH_STANDINGS = "standings.refresh"
+REFRESH_TEAM_STANDINGS = "standings.refresh_team"
+
+STANDING_COLUMNS = (
+    "position", "name", "games", "wins", "losses", "scored", "conceded", "points_difference", "win_percentage",
+)
+
+
+def is_finished(game) -> bool:
+    return game.score_black_bears is not None and game.score_opponent is not None
+
+
+def _totals(gender: GenderType):
+    """
+    Итоги команд по сыгранным играм одного пола.
+
+    Каждая игра даёт две строки — соперника и нашей команды, — после чего
+    всё сводится одним GROUP BY. Ничьих в баскетболе нет, поэтому равный
+    счёт (например, при ошибке ввода) не считается ни победой, ни поражением.
+    """
+    finished = and_(
+        Game.gender == gender,
+        Game.score_black_bears.isnot(None),
+        Game.score_opponent.isnot(None),
+    )
+    sides = union_all(
+        select(
+            Game.team_name.label("name"),
+            Game.score_opponent.label("scored"),
+            Game.score_black_bears.label("conceded"),
+        ).where(finished),
+        select(
+            literal(settings.HOME_TEAM_NAME).label("name"),
+            Game.score_black_bears.label("scored"),
+            Game.score_opponent.label("conceded"),
+        ).where(finished),
+    ).subquery("sides")
+    return select(
+        sides.c.name,
+        func.count().label("games"),
+        func.count().filter(sides.c.scored > sides.c.conceded).label("wins"),
+        func.count().filter(sides.c.scored < sides.c.conceded).label("losses"),
+        func.sum(sides.c.scored).label("scored"),
+        func.sum(sides.c.conceded).label("conceded"),
+    ).group_by(sides.c.name).subquery("totals")
+
+
+def _opponent_totals(gender: GenderType, names: Iterable[str]):
+    """
+    Итоги соперников names по их сыгранным играм одного пола
+    """
+    scored, conceded = Game.score_opponent, Game.score_black_bears
+    return select(
+        Game.team_name.label("name"),
+        func.count().label("games"),
+        func.count().filter(scored > conceded).label("wins"),
+        func.count().filter(scored < conceded).label("losses"),
+        func.sum(scored).label("scored"),
+        func.sum(conceded).label("conceded"),
+    ).where(
+        Game.gender == gender,
+        Game.team_name.in_(names),
+        scored.isnot(None),
+        conceded.isnot(None),
+    ).group_by(Game.team_name)
+
+
+def _ranked(totals):
+    """
+    Строки таблицы с местами.
+
+    Порядок мест: процент побед, число побед, разница очков, набранные
+    очки и, наконец, название — так места не зависят от порядка строк.
+    """
+    difference = totals.c.scored - totals.c.conceded
+    percentage = cast(totals.c.wins, Float) / totals.c.games
+    position = func.row_number().over(order_by=[
+        percentage.desc(),
+        totals.c.wins.desc(),
+        difference.desc(),
+        totals.c.scored.desc(),
+        totals.c.name.asc(),
+    ])
+    return select(
+        position.label("position"),
+        totals.c.name,
+        totals.c.games,
+        totals.c.wins,
+        totals.c.losses,
+        totals.c.scored,
+        totals.c.conceded,
+        difference.label("points_difference"),
+        percentage.label("win_percentage"),
+    )
+
+
+def _snapshot(gender: GenderType):
+    """
+    INSERT ... SELECT всех строк таблицы одного пола
+    """
+    ranked = _ranked(_totals(gender)).subquery("ranked")
+    rows = select(
+        literal(gender, Standing.gender.type),
+        *(ranked.c[column] for column in STANDING_COLUMNS),
+        literal(datetime.datetime.utcnow(), Standing.updated_at.type),
+    )
+    return insert(Standing).from_select(["gender", *STANDING_COLUMNS, "updated_at"], rows)
+
+
+def _sync_teams(gender: GenderType, names: Optional[Iterable[str]] = None):
+    """
+    Переносит итоги в счётчики teams (всех команд пола или только names);
+    у команд без сыгранных игр они обнуляются
+    """
+    source = (
+        select(Team.id.label("team_id"), Standing)
+        .select_from(Team)
+        .outerjoin(Standing, and_(Standing.gender == Team.gender, Standing.name == Team.name))
+        .where(Team.gender == gender)
+    )
+    if names is not None:
+        source = source.where(Team.name.in_(names))
+    source = source.subquery("source")
+    return (
+        update(Team)
+        .where(Team.id == source.c.team_id)
+        .values(
+            games_played=func.coalesce(source.c.games, 0),
+            wins=func.coalesce(source.c.wins, 0),
+            losses=func.coalesce(source.c.losses, 0),
+            points_scored=func.coalesce(source.c.scored, 0),
+            points_conceded=func.coalesce(source.c.conceded, 0),
+            points_difference=func.coalesce(source.c.points_difference, 0),
+            win_percentage=func.coalesce(source.c.win_percentage, 0.0),
+            current_position=source.c.position,
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def _lock(db: AsyncSession, gender: GenderType):
+    await db.execute(select(func.pg_advisory_xact_lock(func.hashtext(f"{LOCK_NAMESPACE}:{gender.name}"))))
+
+
+async def refresh_standings(db: AsyncSession, genders: Iterable[GenderType]):
+    """
+    Пересчитывает таблицу для указанных полов в текущей транзакции
+    """
+    for gender in sorted(set(genders)):
+        await _lock(db, gender)
+        await db.execute(delete(Standing).where(Standing.gender == gender).execution_options(synchronize_session=False))
+        await db.execute(_snapshot(gender))
+        await db.execute(_sync_teams(gender))
+
+
+async def refresh_team_standings(db: AsyncSession, gender: GenderType, names: Iterable[str]):
+    """
+    Обновляет в текущей транзакции строки соперников names после изменения
+    их игр, не пересчитывая остальных.
+
+    Итоги соперников names считаются по их играм, остальные соперники
+    берутся из таблицы как есть. Наша команда играет во всех играх, поэтому
+    её строка — сумма строк соперников с переставленными победами и
+    поражениями, набранными и пропущенными очками. Места пересчитываются
+    для всех, но переписываются только строки, которые изменились
+    """
+    names = set(names) - {settings.HOME_TEAM_NAME}
+    if not names:
+        return
+    await _lock(db, gender)
+    kept = select(
+        Standing.name, Standing.games, Standing.wins, Standing.losses, Standing.scored, Standing.conceded,
+    ).where(Standing.gender == gender, Standing.name.notin_([*names, settings.HOME_TEAM_NAME]))
+    opponents = union_all(kept, _opponent_totals(gender, names)).subquery("opponents")
+    home = select(
+        literal(settings.HOME_TEAM_NAME).label("name"),
+        func.sum(opponents.c.games).label("games"),
+        func.sum(opponents.c.losses).label("wins"),
+        func.sum(opponents.c.wins).label("losses"),
+        func.sum(opponents.c.conceded).label("scored"),
+        func.sum(opponents.c.scored).label("conceded"),
+    ).having(func.count() > 0)
+    totals = union_all(select(opponents), home).subquery("totals")
+    ranked = {row.name: tuple(row) for row in (await db.execute(_ranked(totals))).all()}
+    current = {
+        row.name: tuple(row)
+        for row in (await db.execute(
+            select(*(Standing.__table__.c[column] for column in STANDING_COLUMNS)).where(Standing.gender == gender)
+        )).all()
+    }
+    # Место строки, которая не изменилась, никому другому не достаётся,
+    # поэтому удаление изменённых строк освобождает все нужные места
+    changed = {name for name in ranked.keys() | current.keys() if ranked.get(name) != current.get(name)}
+    if not changed:
+        return
+    await db.execute(
+        delete(Standing)
+        .where(Standing.gender == gender, Standing.name.in_(changed))
+        .execution_options(synchronize_session=False)
+    )
+    updated_at = datetime.datetime.utcnow()
+    rows = [
+        {"gender": gender, **dict(zip(STANDING_COLUMNS, ranked[name])), "updated_at": updated_at}
+        for name in changed if name in ranked
+    ]
+    if rows:
+        await db.execute(insert(Standing), rows)
+    await db.execute(_sync_teams(gender, changed))
+
+
+async def standings_changed(genders: Iterable[GenderType]):
+    """
+    Сбрасывает кэш таблицы и оповещает поток; вызывается после commit
+    """
+    genders = sorted(set(genders))
+    await cache.invalidate(*(f"standings:{gender.value}" for gender in genders))
+    await publish_event(LEADERBOARD_CHANGED, {"genders": [gender.value for gender in genders]})
+
+
+async def schedule_standings(db: AsyncSession, genders: Iterable[GenderType]):
+    """
+    Ставит в текущей транзакции полный пересчёт таблицы этих полов. Пока
+    пересчёт пола ждёт запуска, новые изменения игр к нему присоединяются:
+    он читает games уже после их фиксации
+    """
+    for gender in sorted(set(genders)):
+        await enqueue(db, REFRESH_STANDINGS, {"gender": gender.value}, key=f"{REFRESH_STANDINGS}:{gender.value}")
+
+
+async def schedule_team_standings(db: AsyncSession, teams: Iterable[Tuple[GenderType, str]]):
+    """
+    Ставит в текущей транзакции обновление строк соперников (пол, название),
+    чьи сыгранные игры изменились; одинаковые ждущие задачи объединяются
+    """
+    for gender, name in sorted(set(teams)):
+        await enqueue(
+            db, REFRESH_TEAM_STANDINGS, {"gender": gender.value, "name": name},
+            key=f"{REFRESH_TEAM_STANDINGS}:{gender.value}:{name}",
+        )
+
+
+@job_handler(REFRESH_STANDINGS)
+async def refresh_standings_job(db: AsyncSession, payload: dict):
+    gender = GenderType(payload["gender"])
+    await refresh_standings(db, [gender])
+    after_commit(db, standings_changed, (gender,))
+
+
+@job_handler(REFRESH_TEAM_STANDINGS)
+async def refresh_team_standings_job(db: AsyncSession, payload: dict):
+    gender = GenderType(payload["gender"])
+    await refresh_team_standings(db, gender, [payload["name"]])
+    after_commit(db, standings_changed, (gender,))
@@ -0,0 +1,249 @@
+import asyncio
+import json
+import logging
+import time
+from collections import deque
+from typing import Iterable, List, Optional
+from ..core.broker import GAP, broker
+from ..core.config import settings
+from ..core.metrics import Counter, gauge, register, register_collector
+
+logger = logging.getLogger("uvicorn.error")
+
+# Канал брокера: событие, опубликованное любым воркером, рассылают все
+EVENTS_CHANNEL = "events"
+
+# Типы событий потока /api/v1/stream
+NEWS_CREATED = "news.created"
+NEWS_UPDATED = "news.updated"
+GAME_SCORE_CHANGED = "game.score_changed"
+LEADERBOARD_CHANGED = "leaderboard.changed"
+# Брокер переподключался и события могли потеряться: клиенту нужно
+# перечитать данные. Приходит всем подписчикам независимо от фильтра
+STREAM_RESYNC = "stream.resync"
+EVENT_TYPES = (NEWS_CREATED, NEWS_UPDATED, GAME_SCORE_CHANGED, LEADERBOARD_CHANGED, STREAM_RESYNC)
+
+# Сколько id перечисляется в событии о новостях: сообщение брокера не должно
+# выходить за 8000 байт NOTIFY; при массовом импорте клиенту хватает count
+MAX_EVENT_IDS = 200
+
+STREAM_EVENTS = register(Counter(
+    "stream_events_total",
+    "События, разосланные подписчикам потока",
+    ("type",),
+))
+
+STREAM_DROPPED = register(Counter(
+    "stream_dropped_total",
+    "Подписчики потока, отключённые из-за переполнения очереди",
+))
+
+
+def new_event_id() -> int:
+    # Время публикации в микросекундах: id одного события совпадает во всех
+    # воркерах, поэтому Last-Event-ID понимает любой из них
+    return time.time_ns() // 1000
+
+
+class Event:
+    """
+    Событие потока. JSON и кадр SSE строятся один раз и отправляются всем
+    подписчикам как есть
+    """
+
+    __slots__ = ("id", "type", "json", "sse")
+
+    def __init__(self, event_id: int, event_type: str, payload: str):
+        self.id = event_id
+        self.type = event_type
+        self.json = payload
+        self.sse = f"id: {event_id}\nevent: {event_type}\ndata: {payload}\n\n".encode()
+
+
+def _resync_event() -> Event:
+    event_id = new_event_id()
+    return Event(event_id, STREAM_RESYNC, json.dumps({"id": event_id, "type": STREAM_RESYNC, "data": {}}))
+
+
+class SlowConsumer(Exception):
+    """
+    Очередь подписчика переполнилась: он отключается и переподключается
+    с Last-Event-ID (пропущенное берётся из буфера последних событий)
+    """
+
+
+class Subscriber:
+    # Простаивающий подписчик — несколько ссылок: очередь создаётся
+    # с первым событием, future — только на время ожидания
+    __slots__ = ("types", "queue", "waiter", "dropped", "closed")
+
+    def __init__(self, types: Optional[frozenset]):
+        self.types = types
+        self.queue = None
+        self.waiter = None
+        self.dropped = False
+        self.closed = False
+
+
+class EventHub:
+    """
+    Рассылка событий подписчикам потока внутри воркера.
+
+    События приходят из брокера (их публикуют обработчики записи в любом
+    воркере) и раскладываются по очередям подписчиков без ожидания: запись
+    в сокет идёт в корутине каждого подписчика. Очередь ограничена
+    queue_size событиями; подписчик, который не успевает её разбирать,
+    отключается, а не задерживает остальных и не копит память.
+    """
+
+    def __init__(self, queue_size: int, replay_size: int, max_subscribers: int):
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self._subscribers = set()
+        self._replay = deque(maxlen=replay_size)
+        self._subscription = None
+        self._listener = None
+        self.accepting = True
+
+    def __len__(self) -> int:
+        return len(self._subscribers)
+
+    async def start(self):
+        self._subscription = await broker.subscribe(EVENTS_CHANNEL)
+        self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            self._listener = None
+        if self._subscription is not None:
+            await self._subscription.close()
+            self._subscription = None
+        self.shutdown()
+
+    def shutdown(self):
+        """
+        Воркер останавливается: потоки завершаются сразу, а не держат его до
+        graceful-таймаута; клиенты переподключаются к другому воркеру
+        """
+        self.accepting = False
+        for subscriber in list(self._subscribers):
+            self.close(subscriber)
+
+    async def _listen(self):
+        async for payload in self._subscription:
+            if payload is GAP:
+                self.dispatch(_resync_event())
+                continue
+            try:
+                message = json.loads(payload)
+                self.dispatch(Event(message["id"], message["type"], payload.decode()))
+            except (ValueError, KeyError, TypeError) as exc:
+                logger.warning("Поток: некорректное событие из брокера: %s", exc)
+
+    def subscribe(self, types: Iterable[str] = (), last_event_id: Optional[int] = None) -> Optional[Subscriber]:
+        """
+        Новый подписчик (None — достигнут предел подписчиков воркера или
+        воркер останавливается).
+        С last_event_id в очередь сразу попадают пропущенные события из буфера
+        """
+        if not self.accepting or len(self._subscribers) >= self.max_subscribers:
+            return None
+        types = frozenset(types)
+        subscriber = Subscriber(types or None)
+        self._subscribers.add(subscriber)
+        if last_event_id is not None:
+            replay = [event for event in self._replay if event.id > last_event_id]
+            if len(replay) == self._replay.maxlen:
+                # Буфер заполнен целиком более новыми событиями: часть пропущенных уже вытеснена
+                replay = [_resync_event()]
+            for event in replay:
+                self._put(subscriber, event)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        self._subscribers.discard(subscriber)
+
+    def close(self, subscriber: Subscriber):
+        """
+        Клиент отключился: ожидание next_events() завершается
+        """
+        subscriber.closed = True
+        self._subscribers.discard(subscriber)
+        self._wake(subscriber)
+
+    def dispatch(self, event: Event):
+        self._replay.append(event)
+        STREAM_EVENTS.inc(event.type)
+        for subscriber in list(self._subscribers):
+            self._put(subscriber, event)
+
+    def _put(self, subscriber: Subscriber, event: Event):
+        if subscriber.types is not None and event.type not in subscriber.types and event.type != STREAM_RESYNC:
+            return
+        if subscriber.queue is None:
+            subscriber.queue = deque()
+        if len(subscriber.queue) >= self.queue_size:
+            subscriber.dropped = True
+            self._subscribers.discard(subscriber)
+            STREAM_DROPPED.inc()
+        else:
+            subscriber.queue.append(event)
+        self._wake(subscriber)
+
+    @staticmethod
+    def _wake(subscriber: Subscriber):
+        if subscriber.waiter is not None and not subscriber.waiter.done():
+            subscriber.waiter.set_result(None)
+
+    async def next_events(self, subscriber: Subscriber, timeout: float) -> Optional[List[Event]]:
+        """
+        Накопившиеся события подписчика; пустой список — за timeout секунд
+        ничего не пришло, None — клиент отключился. SlowConsumer — подписчик
+        отключён из-за переполнения очереди
+        """
+        if not subscriber.queue and not subscriber.dropped and not subscriber.closed:
+            subscriber.waiter = asyncio.get_running_loop().create_future()
+            try:
+                await asyncio.wait_for(subscriber.waiter, timeout)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                subscriber.waiter = None
+        if subscriber.closed:
+            return None
+        events = list(subscriber.queue or ())
+        if subscriber.queue:
+            subscriber.queue.clear()
+        if not events and subscriber.dropped:
+            raise SlowConsumer()
+        return events
+
+
+event_hub = EventHub(settings.STREAM_QUEUE_SIZE, settings.STREAM_REPLAY_SIZE, settings.STREAM_MAX_SUBSCRIBERS)
+
+
+async def publish_event(event_type: str, data: dict):
+    """
+    Публикует событие для подписчиков потока во всех воркерах.
+
+    Вызывается после commit: ошибка брокера не отменяет уже записанные
+    данные и только пишется в лог
+    """
+    payload = json.dumps(
+        {"id": new_event_id(), "type": event_type, "data": data}, ensure_ascii=False, separators=(",", ":"),
+        default=str,
+    )
+    try:
+        await broker.publish(EVENTS_CHANNEL, payload.encode())
+    except Exception as exc:
+        logger.warning("Поток: не удалось опубликовать %s: %s", event_type, exc)
+
+
+def news_event_data(ids: List[int]) -> dict:
+    return {"ids": ids[:MAX_EVENT_IDS], "count": len(ids)}
+
+
+@register_collector
+def stream_metrics() -> list:
+    return gauge("stream_subscribers", "Подписчики потока /api/v1/stream в воркере", len(event_hub))
@@ -0,0 +1,88 @@
+from typing import Dict, Iterable, List, Tuple
+from sqlalchemy import exists, false, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..models.news import News, Tag, news_tags
+
+# Режимы фильтра по тегам: все теги сразу или хотя бы один
+TAGS_ALL = "all"
+TAGS_ANY = "any"
+
+# Кэш имя -> id. Теги через API не переименовываются и не удаляются,
+# поэтому найденная пара не устаревает; отсутствующие имена не кэшируются,
+# чтобы созданный позже тег сразу находился
+_tag_ids: Dict[str, int] = {}
+TAG_CACHE_MAX_ENTRIES = 10_000
+
+
+def _remember(pairs):
+    if len(_tag_ids) > TAG_CACHE_MAX_ENTRIES:
+        _tag_ids.clear()
+    _tag_ids.update(pairs)
+
+
+async def tag_ids(db: AsyncSession, names: Iterable[str]) -> Dict[str, int]:
+    """
+    id тегов по именам; в БД идёт один IN-запрос только за именами,
+    которых ещё нет в кэше. Неизвестные имена в результат не попадают
+    """
+    names = set(names)
+    found = {name: _tag_ids[name] for name in names if name in _tag_ids}
+    missing = names - found.keys()
+    if missing:
+        rows = (await db.execute(select(Tag.name, Tag.id).where(Tag.name.in_(missing)))).all()
+        _remember(rows)
+        found.update(rows)
+    return found
+
+
+async def resolve_tags(db: AsyncSession, names: Iterable[str]) -> Tuple[List[Tag], bool]:
+    """
+    Теги по именам с созданием недостающих: один SELECT ... IN и один
+    INSERT ... ON CONFLICT DO NOTHING RETURNING.
+
+    Если тот же тег параллельно создал другой запрос, ON CONFLICT его
+    пропускает, и он дочитывается отдельным запросом вместо ошибки
+    уникальности. Возвращает теги в порядке имён (без повторов) и признак
+    того, что были созданы новые.
+    """
+    names = list(dict.fromkeys(names))
+    if not names:
+        return [], False
+    tags = {tag.name: tag for tag in await db.scalars(select(Tag).where(Tag.name.in_(names)))}
+    missing = [name for name in names if name not in tags]
+    created = False
+    if missing:
+        statement = insert(Tag).values([{"name": name} for name in missing])
+        inserted = (await db.scalars(statement.on_conflict_do_nothing(index_elements=[Tag.name]).returning(Tag))).all()
+        tags.update((tag.name, tag) for tag in inserted)
+        created = bool(inserted)
+        if len(inserted) < len(missing):
+            raced = [name for name in missing if name not in tags]
+            tags.update((tag.name, tag) for tag in await db.scalars(select(Tag).where(Tag.name.in_(raced))))
+    # В кэш имён id не заносятся: транзакция ещё может откатиться
+    return [tags[name] for name in names], created
+
+
+async def tag_filter(db: AsyncSession, names: Iterable[str], mode: str = TAGS_ALL) -> list:
+    """
+    Условия WHERE для выборки News по тегам (false(), если выборка заведомо
+    пуста: неизвестный тег в режиме all или ни одного известного в any).
+
+    Каждый тег проверяется через EXISTS по индексу (tag_id, news_id):
+    планировщик либо проверяет новости по порядку страницы и останавливается
+    на limit, либо начинает с самого редкого тега — без GROUP BY по всем
+    связям. Повторяющиеся связи новости с тегом на результат не влияют.
+    """
+    names = set(names)
+    ids = await tag_ids(db, names)
+    if mode == TAGS_ANY:
+        if not ids:
+            return [false()]
+        return [exists().where(news_tags.c.news_id == News.id, news_tags.c.tag_id.in_(ids.values()))]
+    if len(ids) < len(names):
+        return [false()]
+    return [
+        exists().where(news_tags.c.news_id == News.id, news_tags.c.tag_id == tag_id)
+        for tag_id in sorted(ids.values())
+    ]
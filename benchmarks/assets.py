@@ -0,0 +1,153 @@
+"""
+Байты холодной загрузки страницы Flet-клиента до и после build_assets.py.
+
+Запуск (сервер и БД не нужны):
+    python -m benchmarks.assets
+
+Собирает статику во временный каталог и запрашивает у ASGI-приложения
+Flet (main.py) то, что браузер загружает при первом открытии страницы:
+веб-оболочку (index.html, flutter_bootstrap.js, main.dart.js, манифесты,
+шрифты иконок), Montserrat и картинки подвала. До — приложение Flet как
+есть, после — с StaticAssets и путями из манифеста. CanvasKit браузер
+берёт с CDN, он не учитывается. Запросы идут с Accept-Encoding: br, gzip.
+
+Печатает байты и число запросов холодной загрузки и повторного визита
+(файлы с Cache-Control immutable браузер не запрашивает повторно) и
+проверяет заголовки, выбор кодирования и 304. Завершается с кодом 1, если
+проверка не прошла или холодная загрузка не стала меньше.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import flet as ft
+import build_assets
+import main as client
+from static_assets import StaticAssets, load_manifest
+
+SHELL = (
+    "/",
+    "/flutter_bootstrap.js",
+    "/main.dart.js",
+    "/manifest.json",
+    "/favicon.png",
+    "/assets/AssetManifest.bin.json",
+    "/assets/FontManifest.json",
+    "/assets/fonts/MaterialIcons-Regular.otf",
+    "/assets/packages/cupertino_icons/assets/CupertinoIcons.ttf",
+)
+# Файлы assets/, которые запрашивает main.py
+APP_ASSETS = ("Montserrat.ttf", "polytech.png", "asb.png", "vk.png", "youtube.png", "tg.png")
+
+BROWSER_HEADERS = {"Accept-Encoding": "br, gzip"}
+
+
+async def fetch(app, path: str, headers: dict = None) -> tuple:
+    """
+    Запрос к ASGI-приложению напрямую: (статус, заголовки, байтов тела)
+    """
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": path, "raw_path": path.encode(), "root_path": "", "query_string": b"",
+        "headers": [(name.lower().encode(), value.encode()) for name, value in (headers or {}).items()],
+        "client": ("127.0.0.1", 50000), "server": ("127.0.0.1", 80),
+    }
+    status = None
+    response_headers = {}
+    size = 0
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        nonlocal status, size
+        if message["type"] == "http.response.start":
+            status = message["status"]
+            response_headers.update((name.decode().lower(), value.decode()) for name, value in message["headers"])
+        elif message["type"] == "http.response.body":
+            size += len(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return status, response_headers, size
+
+
+async def page_load(app, asset_paths: list) -> dict:
+    requests = []
+    for path in (*SHELL, *asset_paths):
+        status, headers, size = await fetch(app, path, BROWSER_HEADERS)
+        requests.append({
+            "path": path, "status": status, "bytes": size,
+            "encoding": headers.get("content-encoding"), "cache_control": headers.get("cache-control"),
+            "etag": headers.get("etag"),
+        })
+    # Повторный визит: immutable-файлы берутся из кэша браузера, остальные
+    # проверяются по ETag (If-None-Match)
+    repeat_requests = repeat_bytes = 0
+    for request in requests:
+        if request["cache_control"] and "immutable" in request["cache_control"]:
+            continue
+        repeat_requests += 1
+        _, _, size = await fetch(app, request["path"], {**BROWSER_HEADERS, "If-None-Match": request["etag"] or ""})
+        repeat_bytes += size
+    return {
+        "requests": len(requests),
+        "bytes": sum(request["bytes"] for request in requests),
+        "app_assets_bytes": sum(request["bytes"] for request in requests[len(SHELL):]),
+        "repeat_visit_requests": repeat_requests,
+        "repeat_visit_bytes": repeat_bytes,
+        "files": requests,
+    }
+
+
+async def run(build_dir: str) -> tuple:
+    manifest = load_manifest(build_dir)
+    flet_app = ft.app(target=client.main, export_asgi_app=True)
+    before = await page_load(flet_app, ["/" + name for name in APP_ASSETS])
+    after_app = StaticAssets(flet_app, build_dir, manifest)
+    after = await page_load(after_app, ["/" + manifest["files"][name]["path"] for name in APP_ASSETS])
+
+    checks = {}
+    font = "/" + manifest["files"]["Montserrat.ttf"]["path"]
+    status, headers, _ = await fetch(after_app, font, BROWSER_HEADERS)
+    checks["font_brotli_immutable"] = (
+        status == 200 and headers.get("content-encoding") == "br" and "immutable" in headers.get("cache-control", "")
+    )
+    status, headers, size = await fetch(after_app, font)
+    checks["font_identity_without_accept_encoding"] = (
+        "content-encoding" not in headers and size == manifest["files"]["Montserrat.ttf"]["bytes"]
+    )
+    status, headers, _ = await fetch(after_app, "/main.dart.js", {"Accept-Encoding": "gzip"})
+    checks["shell_gzip_revalidate"] = headers.get("content-encoding") == "gzip" and headers.get("cache-control") == "no-cache"
+    status, _, _ = await fetch(after_app, "/main.dart.js", {**BROWSER_HEADERS, "If-None-Match": headers.get("etag", "")})
+    checks["shell_gzip_etag_not_for_br"] = status == 200
+    checks["all_ok"] = all(request["status"] == 200 for request in after["files"])
+    checks["smaller"] = after["bytes"] < before["bytes"]
+    return before, after, checks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", action="store_true", help="печатать каждый запрос")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as build_dir:
+        manifest = {
+            "files": build_assets.build_assets(build_dir),
+            "flet_web": {"version": ft.version.version, "files": build_assets.build_flet_web(build_dir)},
+        }
+        with open(os.path.join(build_dir, "manifest.json"), "w", encoding="utf-8") as file:
+            json.dump(manifest, file)
+        before, after, checks = asyncio.run(run(build_dir))
+
+    if not args.files:
+        for report in (before, after):
+            report.pop("files")
+    print(json.dumps({"before": before, "after": after, "checks": checks}, indent=2, ensure_ascii=False))
+    if not all(checks.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+"""
+Бенчмарки чата вкладки «Обсуждение».
+
+Запуск:
+    python -m benchmarks.chat ui --sessions 20 --messages 200
+    python -m benchmarks.chat server --workers 2 --pollers 8 --messages 200
+
+ui (сервер и БД не нужны) — сколько обновлений и байтов Flet отправляет
+по websocket, когда во все сессии приходит всплеск сообщений: прежний
+обработчик pubsub (по page.update() на сообщение в каждой сессии,
+сообщения копятся без предела) против ChatView (пачка раз в
+CHAT_FLUSH_INTERVAL, не больше MAX_CHAT_MESSAGES в окне).
+
+server (нужна БД из настроек приложения с применёнными миграциями) —
+app.server с --workers воркерами; --pollers клиентов держат long-poll
+запросы /chat/messages/updates, как ChatFeed, а сообщения отправляются
+POST-запросами с интервалом --interval. Печатает долю доставленных
+сообщений (pollers попадают в разные воркеры), задержку доставки и время
+страницы истории. Варианты: брокер memory (только внутри воркера),
+postgres и postgres без кольцевого буфера (история из БД).
+"""
+import argparse
+import asyncio
+import json
+import threading
+import time
+import flet as ft
+import main as client
+from benchmarks.flet_feed import new_page
+from benchmarks.load import free_port, percentile, server_command, server_env, start_server
+
+
+def api_message(message_id: int) -> dict:
+    return {
+        "id": message_id, "user_name": f"Болельщик {message_id % 7}", "text": f"Сообщение номер {message_id}",
+        "kind": "message", "created_at": "2026-01-01T00:00:00",
+    }
+
+
+def ui_before(sessions: int, messages: int) -> dict:
+    # Как прежний on_message: новый элемент и page.update() на каждое сообщение
+    pages = []
+    for _ in range(sessions):
+        connection, page = new_page()
+        chat = ft.ListView(expand=True, spacing=10, auto_scroll=True)
+        page.add(chat)
+        pages.append((connection, page, chat))
+    bytes_before = sum(connection.bytes for connection, _, _ in pages)
+    messages_before = sum(connection.messages for connection, _, _ in pages)
+    started = time.perf_counter()
+    for message_id in range(1, messages + 1):
+        for _, page, chat in pages:
+            message = client.Message(f"Болельщик {message_id % 7}", f"Сообщение номер {message_id}", "chat_message")
+            chat.controls.append(client.ChatMessage(message))
+            page.update()
+    return {
+        "updates": sum(connection.messages for connection, _, _ in pages) - messages_before,
+        "bytes": sum(connection.bytes for connection, _, _ in pages) - bytes_before,
+        "seconds": round(time.perf_counter() - started, 3),
+        "rendered_per_session": len(pages[0][2].controls),
+    }
+
+
+def ui_after(sessions: int, messages: int, interval: float) -> dict:
+    pages = []
+    threads = []
+
+    def run(task):
+        thread = threading.Thread(target=task)
+        threads.append(thread)
+        thread.start()
+
+    for _ in range(sessions):
+        connection, page = new_page()
+        chat = client.ChatView(run)
+        page.add(chat)
+        pages.append((connection, page, chat))
+    bytes_before = sum(connection.bytes for connection, _, _ in pages)
+    messages_before = sum(connection.messages for connection, _, _ in pages)
+    started = time.perf_counter()
+    # Худший случай: ChatFeed доставляет каждое сообщение отдельной пачкой
+    for message_id in range(1, messages + 1):
+        for _, _, chat in pages:
+            chat.push([api_message(message_id)])
+        time.sleep(interval)
+    for thread in list(threads):
+        thread.join()
+    return {
+        "updates": sum(connection.messages for connection, _, _ in pages) - messages_before,
+        "bytes": sum(connection.bytes for connection, _, _ in pages) - bytes_before,
+        "seconds": round(time.perf_counter() - started, 3),
+        "rendered_per_session": len(pages[0][2].controls),
+    }
+
+
+def ui(args) -> dict:
+    return {
+        "before": ui_before(args.sessions, args.messages),
+        "after": ui_after(args.sessions, args.messages, args.interval),
+    }
+
+
+async def server_run(args, broker: str, buffer_size: int) -> dict:
+    port = free_port()
+    env = {**server_env(args.workers, port), "BROKER_BACKEND": broker, "CHAT_BUFFER_SIZE": str(buffer_size)}
+    process, http = await start_server(server_command(), env, "app.server", port)
+    try:
+        _, _, body = await http.request("GET", "/api/v1/chat/messages?limit=1")
+        latest = json.loads(body)
+        start_id = latest[0]["id"] if latest else 0
+        sent_at = {}
+        received = [dict() for _ in range(args.pollers)]
+        done = asyncio.Event()
+
+        async def poller(index: int):
+            after = start_id
+            while not done.is_set():
+                status, _, body = await http.request("GET", f"/api/v1/chat/messages/updates?after={after}&wait=2")
+                now = time.perf_counter()
+                for item in json.loads(body) if status == 200 else ():
+                    received[index].setdefault(item["id"], now)
+                    after = max(after, item["id"])
+
+        pollers = [asyncio.create_task(poller(index)) for index in range(args.pollers)]
+        await asyncio.sleep(0.5)
+        for number in range(args.messages):
+            started = time.perf_counter()
+            status, _, body = await http.request(
+                "POST", "/api/v1/chat/messages",
+                json_body={"user_name": "bench", "text": f"Сообщение {number}"},
+            )
+            if status == 200:
+                sent_at[json.loads(body)["id"]] = started
+            await asyncio.sleep(args.interval)
+        await asyncio.sleep(2.5)
+        done.set()
+        await asyncio.gather(*pollers)
+
+        delays = sorted(
+            seen[message_id] - started for seen in received for message_id, started in sent_at.items()
+            if message_id in seen
+        )
+        history = []
+        for _ in range(args.history_reads):
+            started = time.perf_counter()
+            await http.request("GET", "/api/v1/chat/messages?limit=50")
+            history.append(time.perf_counter() - started)
+        history.sort()
+        expected = len(sent_at) * args.pollers
+        return {
+            "delivered": round(len(delays) / expected, 3) if expected else None,
+            "delivery_p50_ms": round(percentile(delays, 50) * 1000, 2) if delays else None,
+            "delivery_p95_ms": round(percentile(delays, 95) * 1000, 2) if delays else None,
+            "history_p50_ms": round(percentile(history, 50) * 1000, 2),
+            "history_p95_ms": round(percentile(history, 95) * 1000, 2),
+        }
+    finally:
+        await http.close()
+        process.terminate()
+        process.wait()
+
+
+async def server(args) -> dict:
+    return {
+        "memory": await server_run(args, "memory", 500),
+        "postgres": await server_run(args, "postgres", 500),
+        "postgres_no_buffer": await server_run(args, "postgres", 0),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    ui_parser = commands.add_parser("ui")
+    ui_parser.add_argument("--sessions", type=int, default=20)
+    ui_parser.add_argument("--messages", type=int, default=200)
+    ui_parser.add_argument("--interval", type=float, default=0.002, help="секунд между сообщениями всплеска")
+
+    server_parser = commands.add_parser("server")
+    server_parser.add_argument("--workers", type=int, default=2)
+    server_parser.add_argument("--pollers", type=int, default=8)
+    server_parser.add_argument("--messages", type=int, default=200)
+    server_parser.add_argument("--interval", type=float, default=0.01, help="секунд между сообщениями")
+    server_parser.add_argument("--history-reads", type=int, default=200)
+
+    args = parser.parse_args()
+    if args.command == "ui":
+        report = ui(args)
+    else:
+        report = asyncio.run(server(args))
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+Минимальные HTTP-клиенты для бенчмарков без сторонних зависимостей.
+
+AsgiClient вызывает приложение напрямую через ASGI (без сети и сокетов),
+HttpClient ходит по HTTP/1.1 с keep-alive в запущенный сервер (uvicorn).
+У обоих один метод:
+
+    status, headers, body = await client.request("GET", "/api/v1/news/?limit=20")
+
+headers — словарь с именами в нижнем регистре. Если передан sink, части
+тела передаются в него и не накапливаются (body тогда пустой).
+"""
+import asyncio
+import json
+from typing import Callable, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+Response = Tuple[int, Dict[str, str], bytes]
+
+
+def _encode_body(json_body) -> Tuple[bytes, list]:
+    if json_body is None:
+        return b"", []
+    body = json.dumps(json_body, ensure_ascii=False).encode()
+    return body, [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+
+
+class AsgiClient:
+    def __init__(self, app):
+        self.app = app
+
+    async def request(
+        self, method: str, target: str, json_body=None, headers: Optional[dict] = None,
+        sink: Optional[Callable[[bytes], None]] = None,
+    ) -> Response:
+        path, _, query = target.partition("?")
+        body, body_headers = _encode_body(json_body)
+        raw_headers = [(b"host", b"bench"), *body_headers]
+        raw_headers.extend((name.lower().encode(), value.encode()) for name, value in (headers or {}).items())
+        result = {"status": None, "headers": {}, "chunks": []}
+        requested = False
+        finished = asyncio.Event()
+
+        async def receive():
+            # StreamingResponse слушает receive() до http.disconnect:
+            # после тела запроса ждём конца ответа, как настоящий клиент
+            nonlocal requested
+            if not requested:
+                requested = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            await finished.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                result["status"] = message["status"]
+                result["headers"] = {name.decode().lower(): value.decode() for name, value in message["headers"]}
+            elif message["type"] == "http.response.body":
+                chunk = message.get("body", b"")
+                if sink is not None:
+                    sink(chunk)
+                else:
+                    result["chunks"].append(chunk)
+                if not message.get("more_body", False):
+                    finished.set()
+
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": method,
+            "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "",
+            "query_string": query.encode(), "headers": raw_headers,
+            "client": ("127.0.0.1", 0), "server": ("bench", 80),
+        }
+        await self.app(scope, receive, send)
+        return result["status"], result["headers"], b"".join(result["chunks"])
+
+    async def close(self):
+        pass
+
+
+class HttpClient:
+    """
+    HTTP/1.1-клиент с пулом keep-alive соединений (по одному на
+    одновременный запрос). Понимает Content-Length и chunked
+    """
+
+    def __init__(self, base_url: str):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self._idle = []
+
+    async def request(
+        self, method: str, target: str, json_body=None, headers: Optional[dict] = None,
+        sink: Optional[Callable[[bytes], None]] = None,
+    ) -> Response:
+        body, body_headers = _encode_body(json_body)
+        lines = [f"{method} {target} HTTP/1.1", f"Host: {self.host}:{self.port}"]
+        lines.extend(f"{name.decode()}: {value.decode()}" for name, value in body_headers)
+        lines.extend(f"{name}: {value}" for name, value in (headers or {}).items())
+        head = ("\r\n".join(lines) + "\r\n\r\n").encode() + body
+        while True:
+            reused = bool(self._idle)
+            reader, writer = self._idle.pop() if reused else await asyncio.open_connection(self.host, self.port)
+            try:
+                writer.write(head)
+                await writer.drain()
+                status, response_headers = await self._read_head(reader)
+                break
+            except (ConnectionError, asyncio.IncompleteReadError):
+                writer.close()
+                # Простаивавшее соединение сервер мог закрыть по keep-alive таймауту
+                if not reused:
+                    raise
+        try:
+            chunks = []
+            emit = sink or chunks.append
+            if response_headers.get("transfer-encoding") == "chunked":
+                while True:
+                    size = int((await reader.readline()).split(b";")[0], 16)
+                    if size == 0:
+                        await reader.readline()
+                        break
+                    emit(await reader.readexactly(size))
+                    await reader.readline()
+            elif method != "HEAD" and status not in (204, 304):
+                emit(await reader.readexactly(int(response_headers.get("content-length", 0))))
+        except BaseException:
+            writer.close()
+            raise
+        if response_headers.get("connection", "").lower() == "close":
+            writer.close()
+        else:
+            self._idle.append((reader, writer))
+        return status, response_headers, b"".join(chunks)
+
+    @staticmethod
+    async def _read_head(reader) -> Tuple[int, Dict[str, str]]:
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionError("Сервер закрыл соединение")
+        status = int(status_line.split()[1])
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                return status, headers
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+    async def close(self):
+        for _, writer in self._idle:
+            writer.close()
+        self._idle.clear()
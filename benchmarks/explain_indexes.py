@@ -0,0 +1,194 @@
+"""
+Регрессионная проверка планов запросов: основные выборки API должны
+использовать индексы из миграции e8b7a917c29e, а не последовательное чтение.
+
+Запуск (нужна БД из настроек приложения после alembic upgrade head):
+    python -m benchmarks.explain_indexes --scale 1
+
+Таблицы дополняются сгенерированными строками до нужного объёма (масштаб
+--scale умножает размеры), затем для каждого запроса снимается
+EXPLAIN (FORMAT JSON) и проверяется, что в плане есть ожидаемый индекс
+и нет Seq Scan. Всё выполняется в одной транзакции, которая в конце
+откатывается: сгенерированные строки в БД не остаются, после отката
+статистика таблиц пересобирается заново.
+Код возврата 1, если хоть один план не совпал.
+"""
+import argparse
+import json
+import sys
+from sqlalchemy import text
+from app.core.database import engine
+from benchmarks.news_search import RARE_MATCHES, RARE_WORD, SELECTIVE_EVERY, SELECTIVE_WORD, VOCABULARY
+from benchmarks.news_search import SEED_SQL as NEWS_SQL
+
+BENCH_TEAM = "Bench Opponent"
+NEWS_PREFIX = "Бенчмарк индексов"
+
+SEED = {
+    "players": ("""
+        INSERT INTO players (first_name, last_name, gender, number, position, height, weight,
+                             birth_date, games_played, total_points, total_rebounds, total_assists,
+                             total_steals, total_blocks, total_turnovers)
+        SELECT 'Имя' || n, 'Фамилия' || md5(n::text), (ARRAY['MALE', 'FEMALE'])[1 + n % 2]::gendertype,
+               n % 100, 'F', 190, 85, date '2000-01-01', n % 40, n % 900, 0, 0, 0, 0, 0
+        FROM generate_series(1, :count) AS n
+    """, 200_000),
+    "games": ("""
+        INSERT INTO games (gender, team_name, date_time, location, is_home_game, score_black_bears, score_opponent)
+        SELECT (ARRAY['MALE', 'FEMALE'])[1 + n % 2]::gendertype, :team,
+               timestamp '2015-01-01' + n * interval '10 minutes', 'Политехник', n % 2 = 0,
+               CASE WHEN n % 10 = 0 THEN NULL ELSE n % 100 END, CASE WHEN n % 10 = 0 THEN NULL ELSE n % 90 END
+        FROM generate_series(1, :count) AS n
+    """, 500_000),
+    "leaderboard": ("""
+        INSERT INTO leaderboard (name, gender, games, wins, losses, scored, conceded, position)
+        SELECT 'Команда ' || n, (ARRAY['MALE', 'FEMALE'])[1 + n % 2]::gendertype, 20, n % 20, 20 - n % 20, 0, 0, n
+        FROM generate_series(1, :count) AS n
+    """, 100_000),
+    # Статьи из словаря news_search: по RARE_WORD находится RARE_MATCHES штук
+    "news": (NEWS_SQL, 350_000),
+    # Три тега bench-N у каждой новости
+    "news_tags": ("""
+        INSERT INTO news_tags (news_id, tag_id)
+        SELECT news.id, tags.id
+        FROM news CROSS JOIN (SELECT id FROM tags WHERE name LIKE 'bench-_') AS tags
+        ORDER BY news.id, tags.id
+        LIMIT :count
+    """, 1_000_000),
+}
+
+# Редкий тег: фильтр по нему должен идти через индекс, а не через чтение всех связей
+RARE_TAG_SQL = """
+    INSERT INTO news_tags (news_id, tag_id)
+    SELECT id, :tag_id FROM news ORDER BY id LIMIT 50
+"""
+
+# (название, SQL, индексы, любой из которых должен оказаться в плане)
+CHECKS = [
+    ("games by gender and date range", """
+        SELECT * FROM games WHERE gender = 'MALE'
+          AND date_time >= timestamp '2016-01-01' AND date_time <= timestamp '2016-02-01'
+        ORDER BY date_time DESC, id DESC LIMIT 100
+    """, {"ix_games_gender_date_time", "ix_games_date_time"}),
+    ("finished games (results)", """
+        SELECT * FROM games WHERE date_time < now() AND gender = 'FEMALE'
+          AND score_black_bears IS NOT NULL AND score_opponent IS NOT NULL
+        ORDER BY date_time DESC, id DESC LIMIT 100
+    """, {"ix_games_finished"}),
+    ("upcoming games", """
+        SELECT * FROM games WHERE date_time >= timestamp '2020-01-01' ORDER BY date_time ASC LIMIT 10
+    """, {"ix_games_date_time", "ix_games_gender_date_time"}),
+    ("leaderboard by gender", """
+        SELECT * FROM leaderboard WHERE gender = 'MALE' ORDER BY position ASC LIMIT 20
+    """, {"ix_leaderboard_gender_position"}),
+    ("players sorted by name", """
+        SELECT * FROM players ORDER BY last_name, first_name, id LIMIT 100
+    """, {"ix_players_name_sort"}),
+    ("players sorted by points", """
+        SELECT * FROM players ORDER BY total_points DESC, id DESC LIMIT 100
+    """, {"ix_players_total_points"}),
+    ("players search (ilike)", """
+        SELECT * FROM players WHERE first_name ILIKE '%мя1234%' OR last_name ILIKE '%abc12%' LIMIT 100
+    """, {"ix_players_first_name_trgm", "ix_players_last_name_trgm"}),
+    ("news filtered by a rare tag id", """
+        SELECT news.id FROM news JOIN news_tags ON news_tags.news_id = news.id
+        WHERE news_tags.tag_id IN (:rare_tag_id)
+        ORDER BY news.id DESC LIMIT 100
+    """, {"ix_news_tags_tag_id_news_id"}),
+    ("tags of a news page (selectinload)", """
+        SELECT * FROM news_tags WHERE news_id IN (SELECT id FROM news ORDER BY id DESC LIMIT 100)
+    """, {"ix_news_tags_news_id", "ix_news_tags_tag_id_news_id"}),
+    ("news full-text search", """
+        SELECT id FROM news WHERE search_vector @@ websearch_to_tsquery('russian', 'суперкубок финал')
+    """, {"ix_news_search_vector"}),
+]
+
+
+def seed(conn, scale: float):
+    """
+    Дополняет таблицы в текущей транзакции соединения; не фиксирует её
+    """
+    conn.execute(
+        text(
+            "INSERT INTO teams (name, gender, games_played, wins, losses, points_scored, points_conceded,"
+            " win_percentage, points_difference) VALUES (:team, 'MALE', 0, 0, 0, 0, 0, 0, 0)"
+            " ON CONFLICT (name) DO NOTHING"
+        ),
+        {"team": BENCH_TEAM},
+    )
+    conn.execute(text(
+        "INSERT INTO tags (name) SELECT 'bench-' || n FROM generate_series(1, 3) AS n ON CONFLICT (name) DO NOTHING"
+    ))
+    for table, (sql, size) in SEED.items():
+        existing = conn.scalar(text(f"SELECT count(*) FROM {table}"))
+        missing = int(size * scale) - existing
+        if missing > 0:
+            conn.execute(text(sql) if isinstance(sql, str) else sql, {
+                "count": missing, "team": BENCH_TEAM,
+                "prefix": NEWS_PREFIX, "vocab": list(VOCABULARY), "start": existing + 1, "stop": existing + missing,
+                "selective": SELECTIVE_WORD, "selective_every": SELECTIVE_EVERY,
+                "rare": RARE_WORD, "rare_matches": RARE_MATCHES,
+            })
+    rare_tag = conn.execute(text(
+        "INSERT INTO tags (name) VALUES ('bench-rare') ON CONFLICT (name) DO NOTHING RETURNING id"
+    )).scalar()
+    if rare_tag is not None:
+        conn.execute(text(RARE_TAG_SQL), {"tag_id": rare_tag})
+    analyze(conn)
+    return {"rare_tag_id": conn.scalar(text("SELECT id FROM tags WHERE name = 'bench-rare'"))}
+
+
+def analyze(conn):
+    for table in (*SEED, "teams", "tags"):
+        conn.execute(text(f"ANALYZE {table}"))
+
+
+def plan_nodes(node: dict) -> tuple:
+    """
+    Возвращает (использованные индексы, таблицы с последовательным чтением)
+    """
+    indexes = {node["Index Name"]} if "Index Name" in node else set()
+    seq_scans = {node["Relation Name"]} if node["Node Type"].endswith("Seq Scan") else set()
+    for child in node.get("Plans", []):
+        child_indexes, child_seq_scans = plan_nodes(child)
+        indexes |= child_indexes
+        seq_scans |= child_seq_scans
+    return indexes, seq_scans
+
+
+def run(scale: float) -> list:
+    report = []
+    with engine.connect() as conn:
+        try:
+            params = seed(conn, scale)
+            for name, sql, expected in CHECKS:
+                statement = text("EXPLAIN (FORMAT JSON) " + sql)
+                statement = statement.bindparams(**{key: value for key, value in params.items() if f":{key}" in sql})
+                plan = conn.scalar(statement)[0]["Plan"]
+                used, seq_scans = plan_nodes(plan)
+                report.append({
+                    "query": name,
+                    "ok": bool(used & expected) and not seq_scans,
+                    "indexes": sorted(used),
+                    "seq_scans": sorted(seq_scans),
+                })
+        finally:
+            conn.rollback()
+            # Число строк в pg_class ANALYZE обновляет вне транзакции: после
+            # отката оно всё ещё учитывало бы сгенерированные строки
+            analyze(conn)
+            conn.commit()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=float, default=1.0)
+    args = parser.parse_args()
+    report = run(args.scale)
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    sys.exit(0 if all(item["ok"] for item in report) else 1)
+
+
+if __name__ == "__main__":
+    main()
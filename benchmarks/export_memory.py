@@ -0,0 +1,121 @@
+"""
+Проверка, что потоковая выгрузка /export не накапливает результат в памяти.
+
+Запуск (нужна БД из настроек приложения после alembic upgrade head):
+    python -m benchmarks.export_memory --rows 1000000 --max-growth-mb 150
+
+Таблица news дополняется до --rows строк, затем GET /api/v1/news/export
+выполняется прямо через ASGI-интерфейс приложения (без сети), тело ответа
+читается и отбрасывается. Выгрузка идёт через пул приложения, поэтому
+добавленные строки фиксируются, а после замера удаляются. Пиковый RSS процесса (ru_maxrss) сравнивается
+с замером после прогрева. Код возврата 1, если прирост больше
+--max-growth-mb или выгружено меньше строк, чем в таблице.
+
+С --compare-buffered N после выгрузки дополнительно загружает N строк через
+.all(), как это делает обычный список, чтобы показать разницу в памяти.
+"""
+import argparse
+import asyncio
+import json
+import resource
+import sys
+import time
+from sqlalchemy import delete, func, select, text
+from sqlalchemy.orm import selectinload
+from app.core.database import SessionLocal, engine
+from app.main import app
+from app.models.news import News
+from benchmarks.client import AsgiClient
+from benchmarks.pagination import seed
+
+
+def peak_rss_mb() -> float:
+    # В Linux ru_maxrss в килобайтах
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def export(target: str) -> dict:
+    """
+    Выполняет GET через ASGI и считает байты и строки тела, не сохраняя его
+    """
+    stats = {"bytes": 0, "lines": 0}
+
+    def sink(chunk: bytes):
+        stats["bytes"] += len(chunk)
+        stats["lines"] += chunk.count(b"\n")
+
+    stats["status"], _, _ = await AsgiClient(app).request("GET", target, sink=sink)
+    return stats
+
+
+def buffered(rows: int) -> float:
+    session = SessionLocal()
+    try:
+        started = time.perf_counter()
+        session.scalars(select(News).options(selectinload(News.tags)).limit(rows)).all()
+        return time.perf_counter() - started
+    finally:
+        session.close()
+
+
+def cleanup(after_id: int):
+    """
+    Удаляет новости, добавленные seed (id больше after_id)
+    """
+    with engine.connect() as conn:
+        conn.execute(delete(News).where(News.id > after_id))
+        conn.execute(text("ANALYZE news"))
+        conn.commit()
+
+
+async def run(rows: int, compare_buffered: int) -> dict:
+    with engine.connect() as conn:
+        last_id = conn.scalar(select(func.max(News.id))) or 0
+        seed(conn, rows)
+        conn.commit()
+        total = conn.scalar(select(func.count()).select_from(News))
+    try:
+        return await measure(total, compare_buffered)
+    finally:
+        cleanup(last_id)
+
+
+async def measure(total: int, compare_buffered: int) -> dict:
+    # Прогрев: импорт модулей, пул соединений, кэши адаптеров pydantic
+    await export("/api/v1/news/export?tags=__warmup__")
+    baseline = peak_rss_mb()
+
+    started = time.perf_counter()
+    stats = await export("/api/v1/news/export?format=ndjson")
+    elapsed = time.perf_counter() - started
+    report = {
+        "rows_in_table": total,
+        "rows_exported": stats["lines"],
+        "status": stats["status"],
+        "megabytes_sent": round(stats["bytes"] / 2 ** 20, 1),
+        "seconds": round(elapsed, 1),
+        "baseline_rss_mb": round(baseline, 1),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "growth_mb": round(peak_rss_mb() - baseline, 1),
+    }
+    if compare_buffered:
+        report["buffered_rows"] = compare_buffered
+        report["buffered_seconds"] = round(buffered(compare_buffered), 1)
+        report["buffered_peak_rss_mb"] = round(peak_rss_mb(), 1)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--max-growth-mb", type=float, default=150.0)
+    parser.add_argument("--compare-buffered", type=int, default=0, metavar="N")
+    args = parser.parse_args()
+    report = asyncio.run(run(args.rows, args.compare_buffered))
+    print(json.dumps(report, indent=2))
+    ok = report["status"] == 200 and report["rows_exported"] >= report["rows_in_table"]
+    sys.exit(0 if ok and report["growth_mb"] <= args.max_growth_mb else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Загрузка данных Flet-клиента: прежние requests.get на каждый клик против
+api_client (пул соединений, TTL-кэш, ETag и фоновая загрузка последнего
+запроса).
+
+Запуск (нужна БД из настроек приложения, заполненная benchmarks.seed):
+    python -m benchmarks.flet_client --clicks 12 --interval 0.05
+
+Поднимается локальный uvicorn, пользователь --clicks раз с интервалом
+--interval секунд переключает теги (каждый клик загружает ленту). Для
+каждого варианта печатается число HTTP-запросов и новых TCP-соединений,
+сколько секунд был заблокирован обработчик клика (в прежнем варианте — весь
+запрос) и через сколько после последнего клика показана актуальная лента.
+Затем та же серия повторяется (ответы из кэша) и нажимается «Обновить»
+(проверка по ETag, ответ 304).
+"""
+import argparse
+import asyncio
+import json
+import random
+import threading
+import time
+import requests
+from api_client import ApiClient, LatestOnly
+from benchmarks.load import start_server, uvicorn_command
+
+
+def click_sequence(tag_names: list, clicks: int, seed: int) -> list:
+    """Наборы выбранных тегов после каждого клика"""
+    rng = random.Random(seed)
+    selected = []
+    sequence = []
+    for _ in range(clicks):
+        tag = rng.choice(tag_names[:6])
+        if tag in selected:
+            selected.remove(tag)
+        else:
+            selected.append(tag)
+        sequence.append(list(selected))
+    return sequence
+
+
+def before(base_url: str, sequence: list, interval: float) -> dict:
+    # Как в прежнем main.py: синхронный requests.get в обработчике клика
+    blocked = 0.0
+    last_call = 0.0
+    for tags in sequence:
+        call_started = time.perf_counter()
+        response = requests.get(base_url + "/news/", params=[("limit", 100), *(("tags", tag) for tag in tags)])
+        response.raise_for_status()
+        response.json()
+        last_call = time.perf_counter() - call_started
+        blocked += last_call
+        time.sleep(interval)
+    return {
+        "requests": len(sequence),
+        "connections": len(sequence),
+        "blocked_s": round(blocked, 3),
+        # Лента показывается, когда завершился запрос последнего клика
+        "feed_ready_after_last_click_s": round(last_call, 3),
+    }
+
+
+def connections(client: ApiClient) -> int:
+    pools = client.session.get_adapter("http://").poolmanager.pools
+    return sum(pool.num_connections for pool in pools._container.values())
+
+
+def after(client: ApiClient, sequence: list, interval: float, revalidate: bool = False) -> dict:
+    loader = LatestOnly()
+    stats_before = dict(client.stats)
+    connections_before = connections(client)
+    delivered = threading.Event()
+    blocked = 0.0
+    last_click = None
+    for tags in sequence:
+        delivered.clear()
+        call_started = time.perf_counter()
+        loader.submit(lambda tags=tags: client.news_page(tags, limit=100, revalidate=revalidate), lambda _: delivered.set())
+        last_click = time.perf_counter()
+        blocked += last_click - call_started
+        time.sleep(interval)
+    delivered.wait(30)
+    return {
+        "requests": sum(client.stats[name] - stats_before.get(name, 0) for name in ("fetched", "not_modified")),
+        "connections": connections(client) - connections_before,
+        "blocked_s": round(blocked, 4),
+        "feed_ready_after_last_click_s": round(time.perf_counter() - last_click, 3),
+        "loader": dict(loader.stats),
+        "cache": {name: client.stats[name] - stats_before.get(name, 0) for name in client.stats},
+    }
+
+
+async def run(args) -> dict:
+    process, http = await start_server(uvicorn_command(1))
+    await http.close()
+    base_url = f"http://{http.host}:{http.port}/api/v1"
+    try:
+        loop = asyncio.get_running_loop()
+        tag_names = [tag["name"] for tag in requests.get(base_url + "/news/tags/").json()]
+        sequence = click_sequence(tag_names, args.clicks, args.seed)
+        report = {"before": await loop.run_in_executor(None, before, base_url, sequence, args.interval)}
+        client = ApiClient(base_url, ttl=args.ttl)
+        report["after"] = await loop.run_in_executor(None, after, client, sequence, args.interval)
+        report["after_repeat"] = await loop.run_in_executor(None, after, client, sequence, args.interval)
+        report["after_refresh"] = await loop.run_in_executor(None, after, client, sequence[-1:], 0, True)
+        client.close()
+        return report
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clicks", type=int, default=12)
+    parser.add_argument("--interval", type=float, default=0.05, help="секунд между кликами")
+    parser.add_argument("--ttl", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args)), indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
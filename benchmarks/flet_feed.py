@@ -0,0 +1,145 @@
+"""
+Байты, которые Flet отправляет по websocket при обновлениях ленты новостей:
+прежняя лента (Column, 100 карточек пересоздаются при каждом изменении и
+page.update()) против NewsFeed из main.py (ListView, страницы по
+NEWS_PAGE_SIZE, переиспользование карточек, не больше MAX_NEWS_CARDS).
+
+Запуск (сервер и БД не нужны, новости генерируются):
+    python -m benchmarks.flet_feed --news 400
+
+Страница Flet подключается к соединению, которое не ходит в сеть, а
+сериализует команды так же, как FletSocketServer, и считает байты.
+Шаги: первая загрузка, смена тегов (в выдаче остаётся часть прежних
+новостей), «Обновить» без изменений на сервере и, для новой ленты,
+подгрузка страниц при прокрутке до упора в MAX_NEWS_CARDS и дальше.
+"""
+import argparse
+import asyncio
+import json
+import random
+from datetime import datetime, timedelta
+import flet as ft
+from flet.core.local_connection import LocalConnection
+from flet.core.protocol import ClientActions, ClientMessage, CommandEncoder, PageCommandsBatchResponsePayload
+import main as client
+from api_client import LatestOnly
+from benchmarks.news_search import VOCABULARY
+
+
+class RecordingConnection(LocalConnection):
+    def __init__(self):
+        super().__init__()
+        self.bytes = 0
+        self.messages = 0
+
+    def _record(self, message: ClientMessage):
+        self.bytes += len(json.dumps(message, cls=CommandEncoder, separators=(",", ":")).encode())
+        self.messages += 1
+
+    def send_command(self, session_id: str, command):
+        result, message = self._process_command(command)
+        if message:
+            self._record(message)
+        return PageCommandsBatchResponsePayload(results=[result], error="")
+
+    def send_commands(self, session_id: str, commands):
+        results = []
+        messages = []
+        for command in commands:
+            result, message = self._process_command(command)
+            if command.name in ["add", "get"]:
+                results.append(result)
+            if message:
+                messages.append(message)
+        if messages:
+            self._record(ClientMessage(ClientActions.PAGE_CONTROLS_BATCH, messages))
+        return PageCommandsBatchResponsePayload(results=results, error="")
+
+
+def generate_news(count: int, seed: int) -> list:
+    rng = random.Random(seed)
+    now = datetime(2026, 1, 1)
+    items = []
+    for news_id in range(count, 0, -1):
+        created = now - timedelta(hours=count - news_id)
+        items.append({
+            "id": news_id,
+            "title": " ".join(rng.choices(VOCABULARY, k=5)).capitalize(),
+            "content": " ".join(rng.choices(VOCABULARY, k=rng.randint(40, 90))),
+            "image_url": f"https://example.com/news/{news_id}.jpg",
+            "created_at": created.isoformat(),
+            "updated_at": created.isoformat(),
+        })
+    return items
+
+
+def filtered(items: list, tags: list) -> list:
+    # Выбор тега оставляет в выдаче две трети прежних новостей
+    return [item for item in items if not tags or item["id"] % 3 != 0]
+
+
+def new_page() -> tuple:
+    connection = RecordingConnection()
+    page = ft.Page(connection, "bench", asyncio.new_event_loop())
+    return connection, page
+
+
+def measure(connection, action) -> dict:
+    bytes_before, messages_before = connection.bytes, connection.messages
+    action()
+    return {"bytes": connection.bytes - bytes_before, "messages": connection.messages - messages_before}
+
+
+def before(items: list) -> dict:
+    connection, page = new_page()
+    feed = ft.Column(spacing=20, scroll=ft.ScrollMode.AUTO, expand=True)
+    page.add(feed)
+
+    def update_news(tags):
+        # Как прежний update_news: 100 новых карточек и page.update()
+        feed.controls.clear()
+        feed.controls.extend(client.news_card(news) for news in client.prepare_news(filtered(items, tags)[:100]))
+        page.update()
+
+    return {
+        "initial": measure(connection, lambda: update_news([])),
+        "tags_changed": measure(connection, lambda: update_news(["тег 1"])),
+        "refresh_unchanged": measure(connection, lambda: update_news(["тег 1"])),
+        "live_cards": len(feed.controls),
+    }
+
+
+def after(items: list, scrolls: int) -> dict:
+    connection, page = new_page()
+
+    def fetch(tags, cursor=None, revalidate=False):
+        rows = [item for item in filtered(items, tags) if cursor is None or item["id"] < int(cursor)]
+        rows = rows[:client.NEWS_PAGE_SIZE]
+        next_cursor = str(rows[-1]["id"]) if len(rows) == client.NEWS_PAGE_SIZE else None
+        return client.prepare_news(rows), next_cursor
+
+    # Загрузка выполняется сразу в этом потоке
+    feed = client.NewsFeed(LatestOnly(run=lambda task: task(), delay=0), fetch=fetch)
+    page.add(feed.progress, feed)
+    report = {
+        "initial": measure(connection, lambda: feed.load([])),
+        "tags_changed": measure(connection, lambda: feed.load(["тег 1"])),
+        "refresh_unchanged": measure(connection, lambda: feed.load(["тег 1"], revalidate=True)),
+        "load_more": [measure(connection, feed.load_more) for _ in range(scrolls)],
+    }
+    report["live_cards"] = len(feed.controls)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--news", type=int, default=400)
+    parser.add_argument("--scrolls", type=int, default=5, help="подгрузок страниц при прокрутке")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    items = generate_news(args.news, args.seed)
+    print(json.dumps({"before": before(items), "after": after(items, args.scrolls)}, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
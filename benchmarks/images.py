@@ -0,0 +1,227 @@
+"""
+Прокси изображений /api/v1/img.
+
+Запуск (нужна БД из настроек приложения с применёнными миграциями):
+    python -m benchmarks.images --workers 2 --cards 20
+
+Исходники — сгенерированные изображения: фото 2400x1600 (JPEG) и логотип
+с прозрачностью (PNG), их раздаёт локальный файловый сервер, который
+считает запросы. app.server запускается с отдельным каталогом кэша,
+IMAGE_ALLOW_PRIVATE_HOSTS (источник на localhost) и коротким
+IMAGE_SOURCE_TTL (--source-ttl).
+
+Печатает размер и время ответа по сравнению с исходником для карточки
+ленты (ширина 800) в WebP и JPEG, а также объём ленты из --cards карточек
+и проверяет:
+- каждый исходник загружается один раз, сколько бы копий ни строилось;
+- формат выбирается по Accept, прозрачность сохраняется (PNG вместо JPEG);
+- повторный запрос отдаётся из кэша, с If-None-Match — 304;
+- ответ кэшируется на IMAGE_SOURCE_TTL, после него замена файла по той же
+  ссылке даёт новую копию с новым ETag, а пропавший исходник — прежнюю копию;
+- битый и недоступный исходники — 422 и 502;
+- каталог кэша не растёт сверх IMAGE_CACHE_MAX_BYTES;
+- в ответе /news/ есть поле image с src и srcset.
+Завершается с кодом 1, если какая-то проверка не прошла.
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import quote
+from PIL import Image, ImageDraw, ImageFilter
+from benchmarks.load import free_port, percentile, server_command, server_env, start_server
+
+WEBP_ACCEPT = "image/avif,image/webp,image/apng,image/*,*/*;q=0.8"
+JPEG_ACCEPT = "image/*"
+
+
+def photo(width: int, height: int, seed: int) -> bytes:
+    # Градиент, фигуры и шум: сжимается примерно как фотография
+    rng = random.Random(seed)
+    image = Image.linear_gradient("L").resize((width, height)).convert("RGB")
+    draw = ImageDraw.Draw(image)
+    for _ in range(60):
+        x, y = rng.randrange(width), rng.randrange(height)
+        radius = rng.randrange(20, 300)
+        color = tuple(rng.randrange(256) for _ in range(3))
+        draw.ellipse((x - radius, y - radius, x + radius, y + radius), fill=color)
+    image = image.filter(ImageFilter.GaussianBlur(3))
+    noise = Image.effect_noise((width, height), 40).convert("RGB")
+    image = Image.blend(image, noise, 0.15)
+    output = io.BytesIO()
+    image.save(output, "JPEG", quality=92)
+    return output.getvalue()
+
+
+def logo(size: int) -> bytes:
+    image = Image.new("RGBA", (size, size), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(image)
+    draw.ellipse((size // 8, size // 8, size * 7 // 8, size * 7 // 8), fill=(9, 86, 68, 255))
+    output = io.BytesIO()
+    image.save(output, "PNG")
+    return output.getvalue()
+
+
+class CountingHandler(SimpleHTTPRequestHandler):
+    requests = Counter()
+
+    def do_GET(self):
+        CountingHandler.requests[self.path] += 1
+        super().do_GET()
+
+    def log_message(self, *args):
+        pass
+
+
+def start_file_server(directory: str) -> tuple:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), partial(CountingHandler, directory=directory))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def cache_size(directory: str) -> int:
+    return sum(
+        os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(directory) for name in names
+    )
+
+
+async def get_image(http, src: str, width: int, accept: str, headers: dict = None) -> tuple:
+    started = time.perf_counter()
+    status, response_headers, body = await http.request(
+        "GET", f"/api/v1/img?src={quote(src, safe='')}&w={width}", headers={"Accept": accept, **(headers or {})},
+    )
+    return status, response_headers, body, time.perf_counter() - started
+
+
+async def run(args, sources: str, cache_dir: str) -> tuple:
+    checks = {}
+    file_server, origin = start_file_server(sources)
+    port = free_port()
+    env = {
+        **server_env(args.workers, port),
+        "IMAGE_ALLOW_PRIVATE_HOSTS": "true",
+        "IMAGE_CACHE_DIR": cache_dir,
+        "IMAGE_CACHE_MAX_BYTES": str(args.cache_mb * 1024 * 1024),
+        "IMAGE_SOURCE_TTL": str(args.source_ttl),
+    }
+    process, http = await start_server(server_command(), env, "app.server", port)
+    try:
+        photo_url = f"{origin}/photo-0.jpg"
+        report = {"source_bytes": os.path.getsize(os.path.join(sources, "photo-0.jpg"))}
+        for name, accept in (("webp", WEBP_ACCEPT), ("jpeg", JPEG_ACCEPT)):
+            status, headers, body, cold = await get_image(http, photo_url, 800, accept)
+            warm = []
+            for _ in range(args.repeat):
+                *_, seconds = await get_image(http, photo_url, 800, accept)
+                warm.append(seconds)
+            warm.sort()
+            decoded = Image.open(io.BytesIO(body))
+            report[name] = {
+                "status": status,
+                "content_type": headers.get("content-type"),
+                "size": list(decoded.size),
+                "bytes": len(body),
+                "cold_ms": round(cold * 1000, 1),
+                "warm_p50_ms": round(percentile(warm, 50) * 1000, 2),
+            }
+            checks[f"{name}_format"] = headers.get("content-type") == f"image/{name}"
+            checks[f"{name}_width"] = decoded.width == 960
+            checks[f"{name}_headers"] = (
+                headers.get("cache-control") == f"public, max-age={args.source_ttl}" and headers.get("vary") == "Accept"
+            )
+            status, _, _, _ = await get_image(http, photo_url, 800, accept, {"If-None-Match": headers.get("etag")})
+            checks[f"{name}_not_modified"] = status == 304
+
+        for width in (320, 640, 1280):
+            await get_image(http, photo_url, width, WEBP_ACCEPT)
+        checks["source_fetched_once"] = CountingHandler.requests["/photo-0.jpg"] == 1
+
+        status, headers, body, _ = await get_image(http, f"{origin}/logo.png", 320, JPEG_ACCEPT)
+        checks["alpha_kept"] = headers.get("content-type") == "image/png" and Image.open(io.BytesIO(body)).mode == "RGBA"
+        status, _, _, _ = await get_image(http, f"{origin}/broken.jpg", 320, WEBP_ACCEPT)
+        checks["broken_422"] = status == 422
+        status, _, _, _ = await get_image(http, f"http://127.0.0.1:{free_port()}/missing.jpg", 320, WEBP_ACCEPT)
+        checks["unreachable_502"] = status == 502
+
+        # Лента: --cards новостей с разными фото
+        original = optimized = 0
+        for index in range(args.cards):
+            original += os.path.getsize(os.path.join(sources, f"photo-{index}.jpg"))
+            status, _, body, _ = await get_image(http, f"{origin}/photo-{index}.jpg", 800, WEBP_ACCEPT)
+            optimized += len(body) if status == 200 else 0
+        report["feed"] = {"cards": args.cards, "original_bytes": original, "webp_bytes": optimized}
+        checks["feed_smaller"] = 0 < optimized < original / 4
+
+        report["cache_bytes"] = cache_size(cache_dir)
+        report["cache_limit_bytes"] = args.cache_mb * 1024 * 1024
+        checks["cache_within_limit"] = report["cache_bytes"] <= report["cache_limit_bytes"]
+
+        _, _, body = await http.request("GET", "/api/v1/news/?limit=30")
+        news = json.loads(body)
+        checks["news_image_field"] = any(item["image_url"] for item in news) and all(
+            item["image"]["src"].startswith("/api/v1/img?") and " 640w" in item["image"]["srcset"]
+            if item["image_url"] else item["image"] is None
+            for item in news
+        )
+        # Та же ссылка, другое изображение: после IMAGE_SOURCE_TTL — новая копия
+        swap_path, swap_url = os.path.join(sources, "swap.png"), f"{origin}/swap.png"
+        with open(swap_path, "wb") as file:
+            file.write(logo(400))
+        _, first, _, _ = await get_image(http, swap_url, 320, WEBP_ACCEPT)
+        with open(swap_path, "wb") as file:
+            file.write(photo(800, 600, 1))
+        status, cached, _, _ = await get_image(http, swap_url, 320, WEBP_ACCEPT)
+        checks["cached_within_ttl"] = status == 200 and cached.get("etag") == first.get("etag")
+        await asyncio.sleep(args.source_ttl + 1)
+        status, swapped, _, _ = await get_image(http, swap_url, 320, WEBP_ACCEPT, {"If-None-Match": first.get("etag")})
+        checks["replaced_after_ttl"] = status == 200 and swapped.get("etag") != first.get("etag")
+        # Исходник пропал: до следующей попытки отдаётся прежняя копия
+        os.unlink(swap_path)
+        await asyncio.sleep(args.source_ttl + 1)
+        status, stale, _, _ = await get_image(http, swap_url, 320, WEBP_ACCEPT)
+        checks["stale_when_source_gone"] = status == 200 and stale.get("etag") == swapped.get("etag")
+        report["source_requests"] = sum(CountingHandler.requests.values())
+    finally:
+        await http.close()
+        process.terminate()
+        process.wait()
+        file_server.shutdown()
+    return report, checks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--cards", type=int, default=20, help="новостей в ленте (разных исходников)")
+    parser.add_argument("--repeat", type=int, default=200, help="повторных запросов для времени из кэша")
+    parser.add_argument("--cache-mb", type=int, default=8, help="IMAGE_CACHE_MAX_BYTES в мегабайтах")
+    parser.add_argument("--source-ttl", type=int, default=5, help="IMAGE_SOURCE_TTL в секундах")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as sources, tempfile.TemporaryDirectory() as cache_dir:
+        for index in range(args.cards):
+            with open(os.path.join(sources, f"photo-{index}.jpg"), "wb") as file:
+                file.write(photo(2400, 1600, index))
+        with open(os.path.join(sources, "logo.png"), "wb") as file:
+            file.write(logo(1200))
+        with open(os.path.join(sources, "broken.jpg"), "wb") as file:
+            file.write(b"not an image")
+        report, checks = asyncio.run(run(args, sources, cache_dir))
+
+    report["checks"] = checks
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    if not all(checks.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,318 @@
+"""
+Фоновые задачи (app/core/jobs.py): очередь в Postgres и запись игр.
+
+Запуск (нужна БД из настроек приложения после alembic upgrade head,
+заполненная benchmarks.seed; другие экземпляры API не должны работать с ней):
+    python -m benchmarks.jobs --jobs 2000 --workers 3 --concurrency 4 --games 100
+
+Сначала в этом процессе, на задачах с обработчиками бенчмарка:
+- --jobs задач разбирают --workers экземпляров JobWorker через SKIP LOCKED;
+  каждое выполнение пишет строку во временную таблицу, и каждая задача
+  должна выполниться ровно один раз; печатается пропускная способность;
+- 50 постановок с одним ключом дают одну ожидающую задачу;
+- задача с двумя ошибками выполняется с третьей попытки не раньше, чем
+  через суммарную задержку повторов; всегда падающая остаётся failed;
+- задачу «упавшего» воркера (взята и брошена) после аренды выполняет
+  другой, а запоздавшее завершение первого не проходит.
+
+Затем запускается app.server (--server-workers) и --games сыгранных игр
+создаются через POST /api/v1/games/ параллельно. Печатается время ответа
+и время до опустошения очереди по сравнению с временем той же работы
+(games_played и пересчёт таблицы) внутри запроса, как было раньше, и
+проверяется, что games_played выросли ровно на число игр, а таблица
+совпадает с полным пересчётом. Созданные игры затем удаляются, а
+games_played возвращаются к исходным.
+
+Завершается с кодом 1, если какая-то проверка не прошла.
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import random
+import sys
+import time
+from collections import Counter
+from sqlalchemy import func, select, text
+from app.core.jobs import JobWorker, PostgresBackend, db_session, enqueue, job_handler
+from app.models.job import Job
+from app.models.player import Player
+from app.models.standing import Standing
+from app.models.team import Team
+from app.schemas.player import GenderType
+from app.services.games import add_games_played
+from app.services.standings import refresh_standings
+from benchmarks.client import HttpClient
+from benchmarks.load import free_port, percentile, server_command, server_env, start_server
+
+RUNS_TABLE = "bench_job_runs"
+CALLS = Counter()
+
+
+@job_handler("bench.record")
+async def record(db, payload):
+    await db.execute(text(f"INSERT INTO {RUNS_TABLE} (job) VALUES (:job)"), {"job": payload["job"]})
+
+
+@job_handler("bench.flaky")
+async def flaky(db, payload):
+    CALLS[payload["name"]] += 1
+    if CALLS[payload["name"]] <= payload["failures"]:
+        raise RuntimeError(f"ошибка {CALLS[payload['name']]}")
+
+
+async def execute(statement, params=None):
+    async with db_session() as db:
+        await db.execute(statement, params)
+        await db.commit()
+
+
+async def rows(statement, params=None) -> list:
+    async with db_session() as db:
+        return (await db.execute(statement, params)).all()
+
+
+async def scalar(statement, params=None):
+    async with db_session() as db:
+        return await db.scalar(statement, params)
+
+
+async def enqueue_many(kind: str, payloads: list, key: str = None, batch: int = 200):
+    for start in range(0, len(payloads), batch):
+        async with db_session() as db:
+            for payload in payloads[start:start + batch]:
+                await enqueue(db, kind, payload, key=key)
+            await db.commit()
+
+
+async def wait_until(condition, timeout: float, interval: float = 0.02) -> bool:
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if await condition():
+            return True
+        await asyncio.sleep(interval)
+    return False
+
+
+async def pending_jobs(kind_prefix: str = "") -> int:
+    return await scalar(
+        select(func.count()).select_from(Job).where(Job.state.in_(("queued", "running")), Job.kind.startswith(kind_prefix))
+    )
+
+
+async def queue_checks(args) -> tuple:
+    report, checks = {}, {}
+    await execute(text(f"DROP TABLE IF EXISTS {RUNS_TABLE}"))
+    await execute(text(f"CREATE TABLE {RUNS_TABLE} (job integer NOT NULL)"))
+    await execute(text("DELETE FROM jobs WHERE kind LIKE 'bench.%'"))
+    try:
+        # Ровно один раз при нескольких конкурирующих воркерах
+        await enqueue_many("bench.record", [{"job": index} for index in range(args.jobs)])
+        workers = [JobWorker(PostgresBackend(60), args.concurrency, poll_interval=0.05) for _ in range(args.workers)]
+        started = time.perf_counter()
+        for worker in workers:
+            await worker.start()
+        drained = await wait_until(lambda: _no_pending("bench.record"), 120)
+        seconds = time.perf_counter() - started
+        for worker in workers:
+            await worker.stop()
+        [(runs, distinct)] = await rows(text(f"SELECT count(*), count(DISTINCT job) FROM {RUNS_TABLE}"))
+        report["exactly_once"] = {
+            "jobs": args.jobs, "workers": args.workers, "concurrency": args.concurrency,
+            "runs": runs, "seconds": round(seconds, 2), "jobs_per_second": round(args.jobs / seconds),
+        }
+        checks["all_jobs_ran_once"] = drained and runs == distinct == args.jobs
+
+        # Ключ идемпотентности: пока задача ждёт, повторы не добавляются
+        await enqueue_many("bench.record", [{"job": -1}] * 50, key="bench:same", batch=1)
+        checks["key_deduplicated"] = await scalar(
+            select(func.count()).select_from(Job).where(Job.key == "bench:same", Job.state == "queued")
+        ) == 1
+        await execute(text("DELETE FROM jobs WHERE key = 'bench:same'"))
+
+        # Повторы с задержкой и окончательная ошибка
+        base = 0.1
+        worker = JobWorker(PostgresBackend(60), 2, poll_interval=0.02, max_attempts=3, retry_base=base, retry_max=1)
+        await worker.start()
+        started = time.perf_counter()
+        await enqueue_many("bench.flaky", [{"name": "flaky", "failures": 2}, {"name": "broken", "failures": 99}])
+        await wait_until(lambda: _no_pending("bench.flaky"), 30)
+        seconds = time.perf_counter() - started
+        await worker.stop()
+        failed = await rows(
+            select(Job.attempts, Job.last_error).where(Job.kind == "bench.flaky", Job.state == "failed")
+        )
+        report["retry"] = {"flaky_calls": CALLS["flaky"], "broken_calls": CALLS["broken"], "seconds": round(seconds, 2)}
+        # Задержки повторов 1 и 2 из base * 2^(n-1), каждая не меньше половины
+        checks["retried_with_backoff"] = CALLS["flaky"] == 3 and seconds >= (base + 2 * base) / 2
+        checks["failed_after_max_attempts"] = (
+            CALLS["broken"] == 3 and len(failed) == 1 and failed[0][0] == 3 and "ошибка 3" in failed[0][1]
+        )
+
+        # Аренда: задачу, брошенную воркером, выполняет другой
+        lease = 0.5
+        await enqueue_many("bench.record", [{"job": -2}])
+        crashed = PostgresBackend(lease)
+        [abandoned] = await crashed.claim(1)
+        worker = JobWorker(PostgresBackend(60), 1, poll_interval=0.05)
+        started = time.perf_counter()
+        await worker.start()
+        await wait_until(lambda: _no_pending("bench.record"), 10)
+        taken_over = time.perf_counter() - started
+        await worker.stop()
+        async with db_session() as db:
+            late_complete = await crashed.complete(db, abandoned)
+            await db.rollback()
+        reruns = await scalar(text(f"SELECT count(*) FROM {RUNS_TABLE} WHERE job = -2"))
+        report["lease"] = {"lease_seconds": lease, "taken_over_seconds": round(taken_over, 2)}
+        checks["lease_taken_over"] = reruns == 1 and taken_over >= lease * 0.8
+        checks["late_complete_rejected"] = late_complete is False
+    finally:
+        await execute(text(f"DROP TABLE IF EXISTS {RUNS_TABLE}"))
+        await execute(text("DELETE FROM jobs WHERE kind LIKE 'bench.%'"))
+    return report, checks
+
+
+async def _no_pending(kind: str) -> bool:
+    return await pending_jobs(kind) == 0
+
+
+async def games_played_totals() -> dict:
+    totals = await rows(
+        select(Player.gender, func.count(), func.coalesce(func.sum(Player.games_played), 0)).group_by(Player.gender)
+    )
+    return {gender: (players, total) for gender, players, total in totals}
+
+
+async def standings_rows() -> list:
+    return [tuple(row) for row in await rows(
+        select(Standing.gender, Standing.position, Standing.name, Standing.wins, Standing.losses, Standing.scored)
+        .order_by(Standing.gender, Standing.position)
+    )]
+
+
+async def inline_followup(gender: GenderType, repeat: int) -> list:
+    """
+    Время работы, которую POST /games/ раньше делал внутри запроса (откатывается)
+    """
+    timings = []
+    for _ in range(repeat):
+        async with db_session() as db:
+            started = time.perf_counter()
+            await add_games_played(db, {"counts": {gender.value: 1}})
+            await refresh_standings(db, [gender])
+            timings.append(time.perf_counter() - started)
+            await db.rollback()
+    return sorted(timings)
+
+
+async def games_checks(args, port: int) -> tuple:
+    report, checks = {}, {}
+    teams = await rows(select(Team.name, Team.gender))
+    rng = random.Random(1)
+    bodies = []
+    for index in range(args.games):
+        name, gender = rng.choice(teams)
+        bodies.append({
+            "gender": gender.value, "team_name": name, "location": "Бенчмарк", "is_home_game": True,
+            "date_time": (datetime.datetime(2020, 1, 1) + datetime.timedelta(hours=index)).isoformat(),
+            "score_black_bears": rng.randint(55, 100), "score_opponent": rng.randint(55, 100),
+        })
+    added = Counter(body["gender"] for body in bodies)
+    before = await games_played_totals()
+
+    env = server_env(args.server_workers, port)
+    process, http = await start_server(server_command(), env, "app.server", port)
+    created, latencies = [], []
+    try:
+        queue = list(bodies)
+
+        async def client():
+            connection = HttpClient(f"http://127.0.0.1:{port}")
+            try:
+                while queue:
+                    body = queue.pop()
+                    started = time.perf_counter()
+                    status, _, response = await connection.request("POST", "/api/v1/games/", json_body=body)
+                    latencies.append(time.perf_counter() - started)
+                    if status == 200:
+                        created.append(json.loads(response)["id"])
+            finally:
+                await connection.close()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(args.clients)))
+        responded = time.perf_counter() - started
+        drained = await wait_until(lambda: _no_pending(""), 60)
+        done = time.perf_counter() - started
+        latencies.sort()
+        inline = await inline_followup(GenderType.MALE, 20)
+        report["post_game"] = {
+            "games": args.games, "clients": args.clients, "server_workers": args.server_workers,
+            "p50_ms": round(percentile(latencies, 50) * 1000, 1), "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+            "all_responded_s": round(responded, 2), "queue_drained_s": round(done, 2),
+            "inline_followup_p50_ms": round(percentile(inline, 50) * 1000, 1),
+        }
+        after = await games_played_totals()
+        checks["games_created"] = len(created) == args.games
+        checks["queue_drained"] = drained
+        checks["games_played_exact"] = all(
+            after[gender][1] - before[gender][1] == players * added.get(gender.value, 0)
+            for gender, (players, _) in after.items()
+        )
+        computed = await standings_rows()
+        await http.request("POST", "/api/v1/leaderboard/refresh")
+        checks["standings_match_full_refresh"] = computed == await standings_rows()
+
+        _, _, body = await http.request("GET", "/metrics")
+        metrics = body.decode()
+        checks["metrics_exported"] = all(
+            name in metrics for name in ("jobs_total", "job_latency_seconds_bucket", "jobs_queued", "jobs_in_flight")
+        )
+    finally:
+        for game_id in created:
+            await http.request("DELETE", f"/api/v1/games/{game_id}")
+        await wait_until(lambda: _no_pending(""), 60)
+        # Возврат к исходным по фактическому приросту (учитывает и упавшие задачи)
+        current = await games_played_totals()
+        async with db_session() as db:
+            for gender, (players, total) in current.items():
+                await db.execute(
+                    text("UPDATE players SET games_played = games_played - :delta WHERE gender = :gender"),
+                    {"delta": (total - before[gender][1]) // players, "gender": gender.name},
+                )
+            await db.commit()
+        await http.close()
+        process.terminate()
+        process.wait()
+    return report, checks
+
+
+async def run(args) -> tuple:
+    report, checks = await queue_checks(args)
+    if args.games:
+        games_report, games_checks_ = await games_checks(args, free_port())
+        report.update(games_report)
+        checks.update(games_checks_)
+    return report, checks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jobs", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=3, help="экземпляров JobWorker в этом процессе")
+    parser.add_argument("--concurrency", type=int, default=4, help="задач одновременно в каждом")
+    parser.add_argument("--games", type=int, default=100, help="игр через API, 0 — без app.server")
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--server-workers", type=int, default=2)
+    args = parser.parse_args()
+
+    report, checks = asyncio.run(run(args))
+    report["checks"] = checks
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    if not all(checks.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
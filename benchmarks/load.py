@@ -0,0 +1,380 @@
+"""
+Нагрузочный прогон взвешенной смеси запросов к API и сравнение прогонов.
+
+Запуск (нужна БД из настроек приложения, заполненная benchmarks.seed):
+    python -m benchmarks.load run --target asgi --concurrency 16 --duration 30 --output runs/base.json
+    python -m benchmarks.load run --target uvicorn --workers 2 --mix read --output runs/new.json
+    python -m benchmarks.load run --target http://127.0.0.1:8000 --weight news_create=0
+    python -m benchmarks.load compare runs/base.json runs/new.json --threshold 10
+
+--target:
+- asgi — app.main:app вызывается в этом же процессе через ASGI, без сети;
+- uvicorn — поднимается локальный uvicorn app.main:app (--workers), прогон
+  идёт по HTTP, после прогона сервер останавливается;
+- server — то же для production-запуска python -m app.server (--workers);
+- http://host:port — уже запущенный сервер.
+
+--concurrency клиентов в течение --duration секунд выбирают сценарий по
+весам смеси (--mix, веса можно переопределить --weight имя=вес) и сразу
+отправляют следующий запрос. Первые --warmup секунд не учитываются. Выбор
+сценариев и параметров воспроизводим (--seed).
+
+Результат — JSON с p50/p95/p99, средним и максимумом (мс), числом запросов,
+ошибок (код >= 400 или исключение) и пропускной способностью (запросов в
+секунду) по каждому сценарию и в целом. compare печатает изменения по
+сценариям в процентах и список регрессий: рост p95 или падение
+пропускной способности больше --threshold процентов. С --fail-on-regression
+код возврата 1, если регрессии есть.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from collections import Counter, defaultdict
+from urllib.parse import urlencode
+from benchmarks.client import AsgiClient, HttpClient
+from benchmarks.news_search import VOCABULARY
+
+
+def news_feed(rng, data, state):
+    # Половина читателей листает ленту дальше по X-Next-Cursor
+    cursor = state.get("news_feed")
+    if cursor and rng.random() < 0.5:
+        return "GET", "/api/v1/news/?" + urlencode({"limit": 20, "cursor": cursor}), None
+    return "GET", "/api/v1/news/?limit=20", None
+
+
+def news_tags(rng, data, state):
+    tags = rng.sample(data["tags"], k=min(len(data["tags"]), rng.choice((1, 1, 2))))
+    mode = rng.choice(("all", "all", "any"))
+    return "GET", "/api/v1/news/?" + urlencode({"tags": tags, "tags_mode": mode, "limit": 20}, doseq=True), None
+
+
+def news_search(rng, data, state):
+    return "GET", "/api/v1/news/search?" + urlencode({"q": rng.choice(VOCABULARY), "limit": 20}), None
+
+
+def leaderboard(rng, data, state):
+    return "GET", "/api/v1/leaderboard/?gender=" + rng.choice(("male", "female")), None
+
+
+def games_upcoming(rng, data, state):
+    return "GET", "/api/v1/games/upcoming?limit=10", None
+
+
+def games_results(rng, data, state):
+    return "GET", "/api/v1/games/results?limit=20&gender=" + rng.choice(("male", "female")), None
+
+
+def player(rng, data, state):
+    return "GET", f"/api/v1/players/{rng.choice(data['players'])}", None
+
+
+def players_list(rng, data, state):
+    params = {"limit": 50, "gender": rng.choice(("male", "female")), "sort_by": rng.choice(("name", "points"))}
+    return "GET", "/api/v1/players/?" + urlencode(params), None
+
+
+def news_create(rng, data, state):
+    words = rng.sample(VOCABULARY, 12)
+    body = {
+        "title": " ".join(words[:3]).capitalize(),
+        "content": " ".join(words * 4),
+        "tags": rng.sample(data["tags"], k=min(len(data["tags"]), 2)),
+    }
+    return "POST", "/api/v1/news/", body
+
+
+def game_score(rng, data, state):
+    # Исправление счёта сыгранной игры: пересчитывает турнирную таблицу
+    body = {"score_black_bears": rng.randint(55, 100), "score_opponent": rng.randint(55, 100)}
+    return "PUT", f"/api/v1/games/{rng.choice(data['finished_games'])}", body
+
+
+SCENARIOS = {
+    scenario.__name__: scenario
+    for scenario in (
+        news_feed, news_tags, news_search, leaderboard, games_upcoming, games_results,
+        player, players_list, news_create, game_score,
+    )
+}
+
+MIXES = {
+    "default": {
+        "news_feed": 30, "news_tags": 15, "news_search": 5, "leaderboard": 10, "games_upcoming": 15,
+        "games_results": 5, "player": 10, "players_list": 5, "news_create": 3, "game_score": 2,
+    },
+    "read": {
+        "news_feed": 30, "news_tags": 15, "news_search": 5, "leaderboard": 10, "games_upcoming": 15,
+        "games_results": 5, "player": 15, "players_list": 5,
+    },
+    "write": {
+        "news_feed": 20, "news_tags": 10, "leaderboard": 10, "games_upcoming": 10,
+        "player": 10, "news_create": 25, "game_score": 15,
+    },
+}
+
+
+def percentile(samples: list, p: float) -> float:
+    # Метод ближайшего ранга по отсортированной выборке
+    return samples[max(0, math.ceil(p / 100 * len(samples)) - 1)]
+
+
+def summarize(latencies: list, errors: int, statuses: Counter, seconds: float) -> dict:
+    samples = sorted(latencies)
+    if not samples:
+        return {"requests": 0, "errors": errors, "rps": 0.0, "statuses": dict(statuses)}
+    return {
+        "requests": len(samples),
+        "errors": errors,
+        "rps": round(len(samples) / seconds, 1),
+        "p50_ms": round(percentile(samples, 50) * 1000, 2),
+        "p95_ms": round(percentile(samples, 95) * 1000, 2),
+        "p99_ms": round(percentile(samples, 99) * 1000, 2),
+        "mean_ms": round(statistics.fmean(samples) * 1000, 2),
+        "max_ms": round(samples[-1] * 1000, 2),
+        "statuses": dict(sorted(statuses.items())),
+    }
+
+
+async def load_data(client) -> dict:
+    """
+    Идентификаторы и имена для параметров сценариев, через тот же API
+    """
+    async def get(target):
+        status, _, body = await client.request("GET", target)
+        if status != 200:
+            raise RuntimeError(f"GET {target} -> {status}")
+        return json.loads(body)
+
+    data = {
+        "tags": [tag["name"] for tag in await get("/api/v1/news/tags/")],
+        "players": [row["id"] for row in await get("/api/v1/players/?limit=1000")],
+        "finished_games": [row["id"] for row in await get("/api/v1/games/results?limit=1000")],
+    }
+    empty = [name for name, values in data.items() if not values]
+    if empty:
+        raise RuntimeError(f"Нет данных для сценариев ({', '.join(empty)}): запустите benchmarks.seed")
+    return data
+
+
+async def drive(client, weights: dict, concurrency: int, duration: float, warmup: float, seed: int) -> dict:
+    data = await load_data(client)
+    names = [name for name, weight in weights.items() if weight > 0]
+    cum_weights = []
+    for name in names:
+        cum_weights.append((cum_weights[-1] if cum_weights else 0) + weights[name])
+
+    latencies = defaultdict(list)
+    errors = Counter()
+    statuses = defaultdict(Counter)
+    started = time.perf_counter()
+    measure_from = started + warmup
+    deadline = measure_from + duration
+
+    async def worker(index: int):
+        rng = random.Random(seed * 1000 + index)
+        state = {}
+        while True:
+            now = time.perf_counter()
+            if now >= deadline:
+                return
+            name = rng.choices(names, cum_weights=cum_weights)[0]
+            method, target, body = SCENARIOS[name](rng, data, state)
+            try:
+                status, headers, _ = await client.request(method, target, json_body=body)
+            except Exception as exc:
+                status, headers = type(exc).__name__, {}
+            elapsed = time.perf_counter() - now
+            if "x-next-cursor" in headers:
+                state[name] = headers["x-next-cursor"]
+            if now < measure_from:
+                continue
+            latencies[name].append(elapsed)
+            statuses[name][str(status)] += 1
+            if not isinstance(status, int) or status >= 400:
+                errors[name] += 1
+
+    await asyncio.gather(*(worker(index) for index in range(concurrency)))
+    seconds = time.perf_counter() - measure_from
+    scenarios = {
+        name: summarize(latencies[name], errors[name], statuses[name], seconds)
+        for name in names
+    }
+    everything = [value for name in names for value in latencies[name]]
+    total_statuses = sum(statuses.values(), Counter())
+    return {"total": summarize(everything, sum(errors.values()), total_statuses, seconds), "scenarios": scenarios}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def start_server(command: list, env: dict = None, name: str = "uvicorn", port: int = None) -> tuple:
+    """
+    Запускает сервер командой command (порт подставляется вместо {port})
+    и ждёт первого ответа на GET /
+    """
+    port = port or free_port()
+    # stdout (access-лог uvicorn) не смешивается с JSON-отчётом
+    process = subprocess.Popen(
+        [part.format(port=port) for part in command], env={**os.environ, **(env or {})},
+        stdout=subprocess.DEVNULL,
+    )
+    client = HttpClient(f"http://127.0.0.1:{port}")
+    for _ in range(300):
+        if process.poll() is not None:
+            raise RuntimeError(f"{name} завершился с кодом {process.returncode}")
+        try:
+            await client.request("GET", "/")
+            return process, client
+        except OSError:
+            await asyncio.sleep(0.1)
+    process.terminate()
+    raise RuntimeError(f"{name} не ответил за 30 секунд")
+
+
+def uvicorn_command(workers: int) -> list:
+    return [
+        sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", "{port}",
+        "--workers", str(workers), "--log-level", "warning",
+    ]
+
+
+def server_command() -> list:
+    return [sys.executable, "-m", "app.server"]
+
+
+def server_env(workers: int, port: int) -> dict:
+    # Порт и число воркеров app.server берёт из Settings, то есть из окружения
+    return {"WEB_HOST": "127.0.0.1", "WEB_PORT": str(port), "WEB_WORKERS": str(workers), "WEB_MIGRATE": "false"}
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(args) -> dict:
+    weights = dict(MIXES[args.mix])
+    for item in args.weight:
+        name, _, weight = item.partition("=")
+        if name not in SCENARIOS:
+            raise SystemExit(f"Неизвестный сценарий {name}; есть: {', '.join(SCENARIOS)}")
+        weights[name] = float(weight)
+
+    meta = {
+        "target": args.target, "mix": args.mix, "weights": weights, "concurrency": args.concurrency,
+        "duration": args.duration, "warmup": args.warmup, "seed": args.seed, "revision": git_revision(),
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    process = None
+    if args.target == "asgi":
+        from app.core.config import settings
+        from app.main import app
+        client = AsgiClient(app)
+        meta["settings"] = {
+            name: getattr(settings, name)
+            for name in ("DB_ASYNC", "DB_POOL_SIZE", "CACHE_BACKEND", "JSON_RENDERER", "METRICS_ENABLED")
+        }
+    elif args.target == "uvicorn":
+        process, client = await start_server(uvicorn_command(args.workers))
+        meta["workers"] = args.workers
+    elif args.target == "server":
+        port = free_port()
+        process, client = await start_server(
+            server_command(), server_env(args.workers, port), name="app.server", port=port,
+        )
+        meta["workers"] = args.workers
+    else:
+        client = HttpClient(args.target)
+    try:
+        results = await drive(client, weights, args.concurrency, args.duration, args.warmup, args.seed)
+    finally:
+        await client.close()
+        if process is not None:
+            process.terminate()
+            process.wait()
+    return {"meta": meta, **results}
+
+
+def change(old, new) -> float:
+    if not old or new is None:
+        return None
+    return round((new - old) / old * 100, 1)
+
+
+def compare(base: dict, new: dict, threshold: float) -> dict:
+    rows = {}
+    regressions = []
+    for name in ["total", *base["scenarios"]]:
+        old = base["total"] if name == "total" else base["scenarios"].get(name)
+        current = new["total"] if name == "total" else new["scenarios"].get(name)
+        if not old or not current or not old.get("requests") or not current.get("requests"):
+            continue
+        row = {f"{metric}_change_pct": change(old.get(metric), current.get(metric))
+               for metric in ("p50_ms", "p95_ms", "p99_ms", "rps")}
+        row.update({"p95_ms": [old["p95_ms"], current["p95_ms"]], "rps": [old["rps"], current["rps"]]})
+        rows[name] = row
+        if (row["p95_ms_change_pct"] or 0) > threshold or (row["rps_change_pct"] or 0) < -threshold:
+            regressions.append(name)
+    return {
+        "base": base["meta"], "new": new["meta"], "threshold_pct": threshold,
+        "scenarios": rows, "regressions": regressions,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run")
+    run_parser.add_argument("--target", default="asgi")
+    run_parser.add_argument("--workers", type=int, default=1, help="для --target uvicorn и server")
+    run_parser.add_argument("--mix", choices=sorted(MIXES), default="default")
+    run_parser.add_argument("--weight", action="append", default=[], metavar="NAME=WEIGHT")
+    run_parser.add_argument("--concurrency", type=int, default=16)
+    run_parser.add_argument("--duration", type=float, default=30.0)
+    run_parser.add_argument("--warmup", type=float, default=5.0)
+    run_parser.add_argument("--seed", type=int, default=1)
+    run_parser.add_argument("--output")
+
+    compare_parser = commands.add_parser("compare")
+    compare_parser.add_argument("base")
+    compare_parser.add_argument("new")
+    compare_parser.add_argument("--threshold", type=float, default=10.0)
+    compare_parser.add_argument("--fail-on-regression", action="store_true")
+
+    args = parser.parse_args()
+    if args.command == "run":
+        report = asyncio.run(run(args))
+        output = json.dumps(report, indent=2, ensure_ascii=False)
+        if args.output:
+            os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+            with open(args.output, "w") as file:
+                file.write(output + "\n")
+        print(output)
+        return
+
+    with open(args.base) as base_file, open(args.new) as new_file:
+        report = compare(json.load(base_file), json.load(new_file), args.threshold)
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    if args.fail_on_regression and report["regressions"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
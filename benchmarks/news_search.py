@@ -0,0 +1,137 @@
+"""
+Задержка полнотекстового поиска GET /api/v1/news/search при росте корпуса.
+
+Запуск (нужна БД из настроек приложения после alembic upgrade head):
+    python -m benchmarks.news_search --sizes 62500 125000 250000 500000
+
+Корпус наращивается сгенерированными статьями (слова выбираются из словаря
+со смещённым к началу распределением, как в живом тексте) до каждого размера
+из --sizes, после чего замеряется медиана по --repeat вызовам обработчика
+search_news (тот же SQL, что и в API, вместе с ts_headline) для запросов:
+
+- rare: слово, встречающееся ровно в RARE_MATCHES статьях при любом размере;
+- selective: слово примерно в одной статье из SELECTIVE_EVERY;
+- phrase: фраза из двух слов словаря;
+- common: частое слово словаря (первая и вторая страница).
+
+Для rare и selective время должно оставаться почти постоянным: совпадения
+находятся по GIN-индексу, ранжируются только они. Для common число
+совпадений растёт вместе с корпусом, и вместе с ним растёт сортировка по
+рангу — это ожидаемо и показано для сравнения.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from fastapi import Response
+from sqlalchemy import text
+from app.core.database import SessionLocal, ThreadedSession, engine
+from app.api.v1.endpoints.news import search_news
+
+TITLE_PREFIX = "Бенчмарк поиска"
+RARE_WORD = "суперкубок"
+RARE_MATCHES = 20
+SELECTIVE_WORD = "овертайм"
+SELECTIVE_EVERY = 5000
+
+VOCABULARY = (
+    "команда игра матч сезон тренер игрок очко бросок подбор передача защита нападение зал победа "
+    "поражение счёт турнир лига чемпионат финал полуфинал четвертьфинал болельщик трибуна площадка "
+    "кольцо щит мяч фол штрафной трёхочковый пас перехват блок-шот капитан разыгрывающий центровой "
+    "форвард защитник запасной состав ротация тайм-аут четверть половина сирена судья протокол "
+    "статистика рекорд карьера дебют травма восстановление тренировка сбор подготовка стратегия "
+    "тактика комбинация прорыв контратака зона прессинг заслон отбор выход скорость рост прыжок "
+    "точность серия результат таблица место очередной домашний выездной гостевой соперник лидер "
+    "аутсайдер молодёжь ветеран академия школа университет студент спорт баскетбол медведь "
+    "чёрный город стадион арена вечер суббота воскресенье неделя месяц январь февраль март апрель "
+    "май сентябрь октябрь ноябрь декабрь интервью пресс-конференция заявление новость анонс билет"
+).split()
+
+SEED_SQL = text("""
+    INSERT INTO news (title, content, image_url, created_at, updated_at)
+    SELECT :prefix || ' ' || n,
+           array_to_string(ARRAY(
+               SELECT (:vocab)[1 + floor(power(random(), 2) * cardinality(:vocab))::int]
+               FROM generate_series(1, 40 + n % 20) AS w
+               WHERE n > 0
+           ), ' ')
+           || CASE WHEN n % :selective_every = 0 THEN ' ' || :selective ELSE '' END
+           || CASE WHEN n <= :rare_matches THEN ' ' || :rare ELSE '' END,
+           NULL, now(), now()
+    FROM generate_series(:start, :stop) AS n
+""")
+
+QUERIES = {
+    "rare": RARE_WORD,
+    "selective": SELECTIVE_WORD,
+    "phrase": '"домашний матч"',
+    "common": "команда",
+}
+
+
+def seed(size: int):
+    with engine.connect() as conn:
+        existing = conn.scalar(
+            text("SELECT count(*) FROM news WHERE title LIKE :prefix || ' %'"), {"prefix": TITLE_PREFIX}
+        )
+        if existing < size:
+            conn.execute(SEED_SQL, {
+                "prefix": TITLE_PREFIX, "vocab": list(VOCABULARY), "start": existing + 1, "stop": size,
+                "selective": SELECTIVE_WORD, "selective_every": SELECTIVE_EVERY,
+                "rare": RARE_WORD, "rare_matches": RARE_MATCHES,
+            })
+            conn.execute(text("ANALYZE news"))
+        conn.commit()
+
+
+async def search(q: str, limit: int, cursor=None) -> tuple:
+    db = ThreadedSession(SessionLocal())
+    response = Response()
+    try:
+        started = time.perf_counter()
+        hits = await search_news(response=response, q=q, limit=limit, cursor=cursor, db=db)
+        return time.perf_counter() - started, len(hits), response.headers.get("x-next-cursor")
+    finally:
+        await db.close()
+
+
+async def measure(q: str, limit: int, repeat: int) -> dict:
+    first, second = [], []
+    hits = 0
+    for _ in range(repeat):
+        elapsed, hits, cursor = await search(q, limit)
+        first.append(elapsed)
+        if cursor:
+            second.append((await search(q, limit, cursor))[0])
+    return {
+        "hits_on_page": hits,
+        "page1_ms": round(statistics.median(first) * 1000, 2),
+        "page2_ms": round(statistics.median(second) * 1000, 2) if second else None,
+    }
+
+
+async def run(sizes: list, limit: int, repeat: int) -> list:
+    report = []
+    for size in sorted(sizes):
+        seed(size)
+        # Прогрев кэша страниц, чтобы первый размер не проигрывал холодному старту
+        for q in QUERIES.values():
+            await search(q, limit)
+        results = {name: await measure(q, limit, repeat) for name, q in QUERIES.items()}
+        report.append({"articles": size, **results})
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[62_500, 125_000, 250_000, 500_000])
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    report = asyncio.run(run(args.sizes, args.limit, args.repeat))
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Сравнение offset- и keyset-пагинации ленты новостей на глубоких страницах.
+
+Запуск (нужна БД из настроек приложения; таблица news дополняется до --rows
+в транзакции, которая после замеров откатывается):
+    python -m benchmarks.pagination --rows 1000000 --limit 100
+
+Печатает JSON со временем выполнения (медиана по --repeat прогонам) для
+каждой глубины: offset(depth).limit(limit) против id < :last_id.
+"""
+import argparse
+import json
+import statistics
+import time
+from sqlalchemy import func, select, text
+from app.core.database import engine
+from app.models.news import News
+
+SEED_SQL = text("""
+    INSERT INTO news (title, content, image_url, created_at, updated_at)
+    SELECT 'Новость ' || n, repeat('Текст новости ', 20), NULL, now(), now()
+    FROM generate_series(1, :count) AS n
+""")
+
+
+def seed(conn, rows: int):
+    """
+    Дополняет news до rows строк в текущей транзакции соединения; фиксирует
+    или откатывает её вызывающий
+    """
+    existing = conn.scalar(select(func.count()).select_from(News))
+    if existing < rows:
+        conn.execute(SEED_SQL, {"count": rows - existing})
+        conn.execute(text("ANALYZE news"))
+
+
+def timed(conn, statement, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        conn.execute(statement).all()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples) * 1000
+
+
+def run(rows: int, limit: int, repeat: int) -> dict:
+    page = select(News.id, News.title, News.content).order_by(News.id.desc()).limit(limit)
+    results = []
+    with engine.connect() as conn:
+        try:
+            seed(conn, rows)
+            depths = [0, 1_000, 10_000, 100_000, rows // 2, rows - limit]
+            for depth in depths:
+                # Ключ последней строки предыдущей страницы, как его вернул бы X-Next-Cursor
+                last_id = conn.scalar(select(News.id).order_by(News.id.desc()).offset(max(depth - 1, 0)).limit(1))
+                offset_ms = timed(conn, page.offset(depth), repeat)
+                keyset_ms = timed(conn, page.where(News.id < last_id) if depth else page, repeat)
+                results.append({"depth": depth, "offset_ms": round(offset_ms, 3), "keyset_ms": round(keyset_ms, 3)})
+        finally:
+            conn.rollback()
+            # ANALYZE обновляет число строк в pg_class вне транзакции
+            conn.execute(text("ANALYZE news"))
+            conn.commit()
+    return {"rows": rows, "limit": limit, "repeat": repeat, "results": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    print(json.dumps(run(args.rows, args.limit, args.repeat), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+"""
+Заполнение БД правдоподобными данными для нагрузочных прогонов.
+
+Запуск (нужна БД из настроек приложения после alembic upgrade head):
+    python -m benchmarks.seed --players 10000 --teams 12 --games 20000 --news 100000
+
+Таблицы дополняются до указанных размеров (повторный запуск ничего не
+добавляет), каждая — одним INSERT ... SELECT FROM generate_series на
+стороне БД:
+
+- teams: --teams команд-соперников каждого пола;
+- players: игроки обоих полов с именами, амплуа, ростом, весом и возрастом;
+- games: игры с командами своего пола, примерно 2 года в прошлом (со счётом)
+  и 2 месяца вперёд (без счёта);
+- tags и news: --tags тегов «тег N» и новости из словаря спортивных слов,
+  у каждой --tags-per-news тегов с перекосом к первым (часть тегов
+  популярна, большинство — редкие).
+
+После вставки пересчитывается турнирная таблица и выполняется ANALYZE.
+Печатает JSON с размерами таблиц до и после и временем каждого шага.
+"""
+import argparse
+import asyncio
+import json
+import time
+from sqlalchemy import text
+from app.core.database import SessionLocal, ThreadedSession, engine
+from app.schemas.player import GenderType
+from app.services.standings import refresh_standings
+from benchmarks.news_search import VOCABULARY
+
+TABLES = ("teams", "players", "games", "tags", "news", "news_tags")
+
+MALE_NAMES = ["Александр", "Дмитрий", "Максим", "Иван", "Артём", "Никита", "Михаил", "Егор", "Кирилл", "Андрей"]
+FEMALE_NAMES = ["Анна", "Мария", "Елена", "Дарья", "Алина", "Ксения", "Полина", "Виктория", "Софья", "Ольга"]
+LAST_NAMES = ["Смирнов", "Иванов", "Кузнецов", "Попов", "Соколов", "Лебедев", "Козлов", "Новиков", "Морозов", "Волков",
+              "Соловьёв", "Васильев", "Зайцев", "Павлов", "Семёнов", "Голубев", "Виноградов", "Богданов"]
+POSITIONS = ["Разыгрывающий", "Атакующий защитник", "Лёгкий форвард", "Тяжёлый форвард", "Центровой"]
+CITIES = ["Москва", "Казань", "Самара", "Пермь", "Томск", "Омск", "Тула", "Курск", "Сочи", "Уфа", "Орёл", "Чита"]
+
+TEAMS_SQL = text("""
+    INSERT INTO teams (name, gender, games_played, wins, losses, points_scored, points_conceded,
+                       win_percentage, points_difference, updated_at)
+    SELECT (:cities)[1 + (n - 1) % cardinality(:cities)] || ' ' || n || ' (' || :suffix || ')',
+           CAST(:gender AS gendertype), 0, 0, 0, 0, 0, 0.0, 0, now()
+    FROM generate_series(:start, :stop) AS n
+    ON CONFLICT (name) DO NOTHING
+""")
+
+PLAYERS_SQL = text("""
+    INSERT INTO players (first_name, last_name, gender, number, position, height, weight, birth_date,
+                         games_played, total_points, total_rebounds, total_assists, total_steals,
+                         total_blocks, total_turnovers, updated_at)
+    SELECT CASE WHEN n % 2 = 0 THEN (:male_names)[1 + n % cardinality(:male_names)]
+                ELSE (:female_names)[1 + n % cardinality(:female_names)] END,
+           (:last_names)[1 + (n / 7) % cardinality(:last_names)]
+               || CASE WHEN n % 2 = 0 THEN '' ELSE 'а' END,
+           CAST(CASE WHEN n % 2 = 0 THEN 'MALE' ELSE 'FEMALE' END AS gendertype),
+           n % 100,
+           (:positions)[1 + n % cardinality(:positions)],
+           round((CASE WHEN n % 2 = 0 THEN 185 ELSE 172 END + 10 * (random() + random() - 1))::numeric, 1),
+           round((CASE WHEN n % 2 = 0 THEN 85 ELSE 65 END + 12 * (random() + random() - 1))::numeric, 1),
+           date '1988-01-01' + (n * 37) % 6500,
+           0, 0, 0, 0, 0, 0, 0, now()
+    FROM generate_series(:start, :stop) AS n
+""")
+
+GAMES_SQL = text("""
+    INSERT INTO games (gender, team_name, date_time, location, is_home_game,
+                       score_black_bears, score_opponent, updated_at)
+    SELECT g.gender, g.team_name, g.date_time, g.location, g.is_home_game,
+           CASE WHEN g.date_time < now() THEN 55 + floor(random() * 45)::int END,
+           CASE WHEN g.date_time < now() THEN 55 + floor(random() * 45)::int END,
+           now()
+    FROM (
+        SELECT CAST(CASE WHEN n % 2 = 0 THEN 'MALE' ELSE 'FEMALE' END AS gendertype) AS gender,
+               CASE WHEN n % 2 = 0 THEN (:male_teams)[1 + (n / 2) % cardinality(:male_teams)]
+                    ELSE (:female_teams)[1 + (n / 2) % cardinality(:female_teams)] END AS team_name,
+               date_trunc('hour', now() + interval '60 days' - make_interval(mins => (n * 7919) % (60 * 24 * 790)))
+                   AS date_time,
+               (:cities)[1 + n % cardinality(:cities)] || ', спорткомплекс' AS location,
+               n % 2 = (n / 2) % 2 AS is_home_game
+        FROM generate_series(:start, :stop) AS n
+    ) AS g
+""")
+
+TAGS_SQL = text("""
+    INSERT INTO tags (name)
+    SELECT 'тег ' || n FROM generate_series(1, :count) AS n
+    ON CONFLICT (name) DO NOTHING
+""")
+
+NEWS_SQL = text("""
+    INSERT INTO news (title, content, image_url, created_at, updated_at)
+    SELECT initcap((:vocab)[1 + n % cardinality(:vocab)]) || ': '
+               || (:vocab)[1 + (n / 3) % cardinality(:vocab)] || ' ' || (:vocab)[1 + (n / 11) % cardinality(:vocab)],
+           array_to_string(ARRAY(
+               SELECT (:vocab)[1 + floor(power(random(), 2) * cardinality(:vocab))::int]
+               FROM generate_series(1, 40 + n % 40) AS w
+               WHERE n > 0
+           ), ' '),
+           CASE WHEN n % 3 = 0 THEN 'https://example.com/news/' || n || '.jpg' END,
+           now() - make_interval(mins => :stop - n),
+           now() - make_interval(mins => :stop - n)
+    FROM generate_series(:start, :stop) AS n
+""")
+
+NEWS_TAGS_SQL = text("""
+    INSERT INTO news_tags (news_id, tag_id)
+    SELECT DISTINCT picked.news_id, tags.id
+    FROM (
+        SELECT news.id AS news_id, 'тег ' || (1 + floor(power(random(), 3) * :tags)::int) AS name
+        FROM news CROSS JOIN generate_series(1, :per_news) AS k
+        WHERE news.id > :after
+    ) AS picked
+    JOIN tags ON tags.name = picked.name
+""")
+
+
+def counts(conn) -> dict:
+    return {table: conn.scalar(text(f"SELECT count(*) FROM {table}")) for table in TABLES}
+
+
+def team_names(conn, gender: str) -> list:
+    return list(conn.scalars(text("SELECT name FROM teams WHERE gender = CAST(:gender AS gendertype) ORDER BY id"), {
+        "gender": gender,
+    }))
+
+
+def seed(conn, sizes: dict, steps: dict):
+    def step(name, statement, params):
+        started = time.perf_counter()
+        conn.execute(statement, params)
+        conn.commit()
+        steps[name] = round(time.perf_counter() - started, 2)
+
+    for gender, suffix in (("MALE", "м"), ("FEMALE", "ж")):
+        existing = len(team_names(conn, gender))
+        if existing < sizes["teams"]:
+            step(f"teams_{gender.lower()}", TEAMS_SQL, {
+                "cities": CITIES, "suffix": suffix, "gender": gender, "start": existing + 1, "stop": sizes["teams"],
+            })
+
+    existing = counts(conn)
+    if existing["players"] < sizes["players"]:
+        step("players", PLAYERS_SQL, {
+            "male_names": MALE_NAMES, "female_names": FEMALE_NAMES, "last_names": LAST_NAMES,
+            "positions": POSITIONS, "start": existing["players"] + 1, "stop": sizes["players"],
+        })
+    if existing["games"] < sizes["games"]:
+        step("games", GAMES_SQL, {
+            "male_teams": team_names(conn, "MALE"), "female_teams": team_names(conn, "FEMALE"),
+            "cities": CITIES, "start": existing["games"] + 1, "stop": sizes["games"],
+        })
+    step("tags", TAGS_SQL, {"count": sizes["tags"]})
+    if existing["news"] < sizes["news"]:
+        after = conn.scalar(text("SELECT coalesce(max(id), 0) FROM news"))
+        step("news", NEWS_SQL, {"vocab": list(VOCABULARY), "start": existing["news"] + 1, "stop": sizes["news"]})
+        step("news_tags", NEWS_TAGS_SQL, {"tags": sizes["tags"], "per_news": sizes["tags_per_news"], "after": after})
+
+
+async def refresh():
+    db = ThreadedSession(SessionLocal())
+    try:
+        await refresh_standings(db, list(GenderType))
+        await db.commit()
+    finally:
+        await db.close()
+
+
+def run(sizes: dict) -> dict:
+    steps = {}
+    with engine.connect() as conn:
+        before = counts(conn)
+        seed(conn, sizes, steps)
+    if steps:
+        started = time.perf_counter()
+        asyncio.run(refresh())
+        steps["standings"] = round(time.perf_counter() - started, 2)
+        with engine.connect() as conn:
+            conn.execute(text("ANALYZE"))
+            conn.commit()
+    with engine.connect() as conn:
+        after = counts(conn)
+    return {"before": before, "after": after, "seconds": steps}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--players", type=int, default=10_000)
+    parser.add_argument("--teams", type=int, default=12, help="команд каждого пола")
+    parser.add_argument("--games", type=int, default=20_000)
+    parser.add_argument("--news", type=int, default=100_000)
+    parser.add_argument("--tags", type=int, default=200)
+    parser.add_argument("--tags-per-news", type=int, default=3)
+    args = parser.parse_args()
+    report = run({
+        "players": args.players, "teams": args.teams, "games": args.games,
+        "news": args.news, "tags": args.tags, "tags_per_news": args.tags_per_news,
+    })
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Сравнение способов сериализации страницы ответа (Settings.JSON_RENDERER).
+
+Запуск (нужна БД из настроек приложения после alembic upgrade head и данные
+в news и players, например после benchmarks.pagination и benchmarks.tag_filter):
+    python -m benchmarks.serialization --limit 100 --repeat 200
+
+Страницы загружаются из БД один раз (новости вместе с тегами), затем для
+каждой замеряется медиана по --repeat прогонам:
+
+- fastapi: обработчик возвращает ORM-объекты, FastAPI проверяет их по
+  response_model (serialize_response) и кодирует JSONResponse;
+- validate: TypeAdapter.validate_python + dump_json;
+- trusted: поля схемы без повторной проверки + to_json из pydantic-core.
+
+Код возврата 1, если JSON какого-либо способа отличается от fastapi.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+from typing import List
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
+from app.core.database import SessionLocal
+from app.core.responses import JSON_TRUSTED, JSON_VALIDATE, serializer
+from app.models.news import News as NewsModel
+from app.models.player import Player
+from app.schemas.news import News
+from app.schemas.player import PlayerInDB
+
+
+def load_pages(limit: int) -> dict:
+    session = SessionLocal()
+    try:
+        news = session.scalars(
+            select(NewsModel).options(selectinload(NewsModel.tags)).order_by(NewsModel.id.desc()).limit(limit)
+        ).all()
+        players = session.scalars(select(Player).order_by(Player.id).limit(limit)).all()
+    finally:
+        session.close()
+    return {"news": (List[News], news), "players": (List[PlayerInDB], players)}
+
+
+def renderers(schema) -> dict:
+    field = create_response_field(name="response", type_=schema)
+
+    async def fastapi_default(rows):
+        content = await serialize_response(field=field, response_content=rows, is_coroutine=True)
+        return JSONResponse(content).body
+
+    return {
+        "fastapi": fastapi_default,
+        JSON_VALIDATE: serializer(schema, JSON_VALIDATE),
+        JSON_TRUSTED: serializer(schema, JSON_TRUSTED),
+    }
+
+
+async def timed(render, rows, repeat: int) -> tuple:
+    samples = []
+    body = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        body = render(rows)
+        if asyncio.iscoroutine(body):
+            body = await body
+        samples.append(time.perf_counter() - started)
+    return body, statistics.median(samples)
+
+
+async def run(limit: int, repeat: int) -> list:
+    report = []
+    for name, (schema, rows) in load_pages(limit).items():
+        results = {}
+        for renderer, render in renderers(schema).items():
+            results[renderer] = await timed(render, rows, repeat)
+        expected = json.loads(results["fastapi"][0])
+        baseline = results["fastapi"][1]
+        report.append({
+            "page": name,
+            "rows": len(rows),
+            "bytes": len(results[JSON_TRUSTED][0]),
+            **{
+                renderer: {
+                    "ms": round(seconds * 1000, 3),
+                    "speedup": round(baseline / seconds, 1),
+                    "ok": json.loads(body) == expected,
+                }
+                for renderer, (body, seconds) in results.items()
+            },
+        })
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+    report = asyncio.run(run(args.limit, args.repeat))
+    print(json.dumps(report, indent=2))
+    sys.exit(0 if all(row[renderer]["ok"] for row in report for renderer in ("validate", "trusted")) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+"""
+Бенчмарки production-запуска (python -m app.server) против одного процесса
+uvicorn, которым приложение запускалось раньше.
+
+Запуск (нужна БД из настроек приложения, заполненная benchmarks.seed):
+    python -m benchmarks.server startup --workers 1 2 4 --repeat 3
+    python -m benchmarks.server shutdown --workers 2
+    python -m benchmarks.server throughput --workers 4 --concurrency 32 --duration 30
+
+startup — время до первого ответа на GET / и до готовности всех воркеров
+(«Application startup complete» от каждого, то есть с прогретыми пулами),
+а также суммарная PSS-память дерева процессов (только Linux).
+
+shutdown — SIGTERM главному процессу во время потоковой выгрузки
+/api/v1/news/export: выгрузка должна дойти до конца, процессы — завершиться.
+
+throughput — одна и та же смесь benchmarks.load против одного процесса
+uvicorn (asyncio + h11 и access-лог, как в прежнем образе) и app.server с --workers
+воркерами; печатает оба прогона и их сравнение (benchmarks.load compare).
+"""
+import argparse
+import asyncio
+import json
+import os
+import signal
+import statistics
+import sys
+import time
+from benchmarks.client import HttpClient
+from benchmarks.load import MIXES, compare, drive, free_port, server_command, server_env, start_server
+
+READY_LINE = b"Application startup complete"
+
+
+def baseline_command() -> list:
+    return [
+        sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", "{port}",
+        "--loop", "asyncio", "--http", "h11",
+    ]
+
+
+def process_tree(pid: int) -> list:
+    pids = [pid]
+    for child in open(f"/proc/{pid}/task/{pid}/children").read().split():
+        pids.extend(process_tree(int(child)))
+    return pids
+
+
+def pss_mb(pid: int) -> float:
+    """
+    Суммарная PSS дерева процессов: общие после fork страницы делятся между
+    процессами, а не считаются в каждом, как в RSS
+    """
+    try:
+        total = 0
+        for member in process_tree(pid):
+            with open(f"/proc/{member}/smaps_rollup") as file:
+                for line in file:
+                    if line.startswith("Pss:"):
+                        total += int(line.split()[1])
+        return round(total / 1024, 1)
+    except OSError:
+        return None
+
+
+async def measure_startup(command: list, env: dict, port: int, workers: int) -> dict:
+    started = time.perf_counter()
+    process = await asyncio.create_subprocess_exec(
+        *[part.format(port=port) for part in command], env={**os.environ, **env},
+        stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE,
+    )
+    ready = 0
+    all_ready = None
+
+    async def read_log():
+        nonlocal ready, all_ready
+        async for line in process.stderr:
+            if READY_LINE in line:
+                ready += 1
+                if ready == workers:
+                    all_ready = time.perf_counter() - started
+
+    reader = asyncio.create_task(read_log())
+    client = HttpClient(f"http://127.0.0.1:{port}")
+    first_response = None
+    try:
+        deadline = started + 60
+        while time.perf_counter() < deadline and (first_response is None or all_ready is None):
+            if process.returncode is not None:
+                raise RuntimeError(f"Сервер завершился с кодом {process.returncode}")
+            if first_response is None:
+                try:
+                    await client.request("GET", "/")
+                    first_response = time.perf_counter() - started
+                    continue
+                except OSError:
+                    pass
+            await asyncio.sleep(0.02)
+        memory = pss_mb(process.pid)
+    finally:
+        await client.close()
+        process.send_signal(signal.SIGTERM)
+        await process.wait()
+        reader.cancel()
+    return {"first_response_s": first_response, "all_workers_ready_s": all_ready, "pss_mb": memory}
+
+
+async def startup(args) -> dict:
+    report = {}
+    variants = [("uvicorn_single", 1)] + [(f"server_{workers}", workers) for workers in args.workers]
+    for name, workers in variants:
+        runs = []
+        for _ in range(args.repeat):
+            port = free_port()
+            if name == "uvicorn_single":
+                runs.append(await measure_startup(baseline_command(), {}, port, 1))
+            else:
+                runs.append(await measure_startup(server_command(), server_env(workers, port), port, workers))
+        report[name] = {
+            key: round(statistics.median(run[key] for run in runs), 3)
+            if all(run[key] is not None for run in runs) else None
+            for key in runs[0]
+        }
+    return report
+
+
+async def shutdown(args) -> dict:
+    port = free_port()
+    process, client = await start_server(server_command(), server_env(args.workers, port), "app.server", port)
+    received = 0
+    last = b""
+
+    def sink(chunk: bytes):
+        nonlocal received, last
+        received += len(chunk)
+        if chunk:
+            last = chunk
+
+    async def stop_soon():
+        await asyncio.sleep(args.stop_after)
+        process.send_signal(signal.SIGTERM)
+        return time.perf_counter()
+
+    stopper = asyncio.create_task(stop_soon())
+    try:
+        status, headers, _ = await client.request("GET", "/api/v1/news/export?format=ndjson", sink=sink)
+        completed = True
+    except (ConnectionError, asyncio.IncompleteReadError):
+        status, completed = None, False
+    signalled_at = await stopper
+    code = await asyncio.get_running_loop().run_in_executor(None, process.wait)
+    await client.close()
+    return {
+        "status": status,
+        "completed": completed and last.endswith(b"\n"),
+        "bytes": received,
+        "exit_code": code,
+        "stopped_after_signal_s": round(time.perf_counter() - signalled_at, 2),
+    }
+
+
+async def load_run(command: list, env: dict, port: int, args) -> dict:
+    process, client = await start_server(command, env, port=port)
+    try:
+        return await drive(client, dict(MIXES[args.mix]), args.concurrency, args.duration, args.warmup, args.seed)
+    finally:
+        await client.close()
+        process.terminate()
+        process.wait()
+
+
+async def throughput(args) -> dict:
+    meta = {"mix": args.mix, "concurrency": args.concurrency, "duration": args.duration, "warmup": args.warmup}
+    port = free_port()
+    baseline = {"meta": {**meta, "target": "uvicorn_single"}, **await load_run(baseline_command(), {}, port, args)}
+    port = free_port()
+    server = {
+        "meta": {**meta, "target": "server", "workers": args.workers},
+        **await load_run(server_command(), server_env(args.workers, port), port, args),
+    }
+    return {
+        "uvicorn_single": baseline["total"],
+        "server": server["total"],
+        "compare": compare(baseline, server, args.threshold),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    startup_parser = commands.add_parser("startup")
+    startup_parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    startup_parser.add_argument("--repeat", type=int, default=3)
+
+    shutdown_parser = commands.add_parser("shutdown")
+    shutdown_parser.add_argument("--workers", type=int, default=2)
+    shutdown_parser.add_argument("--stop-after", type=float, default=0.5, help="секунд от начала выгрузки")
+
+    throughput_parser = commands.add_parser("throughput")
+    throughput_parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    throughput_parser.add_argument("--mix", choices=sorted(MIXES), default="read")
+    throughput_parser.add_argument("--concurrency", type=int, default=32)
+    throughput_parser.add_argument("--duration", type=float, default=30.0)
+    throughput_parser.add_argument("--warmup", type=float, default=5.0)
+    throughput_parser.add_argument("--seed", type=int, default=1)
+    throughput_parser.add_argument("--threshold", type=float, default=10.0)
+
+    args = parser.parse_args()
+    report = asyncio.run({"startup": startup, "shutdown": shutdown, "throughput": throughput}[args.command](args))
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Память и рассылка потока событий /api/v1/stream.
+
+Запуск (нужна БД из настроек приложения с применёнными миграциями):
+    python -m benchmarks.stream --subscribers 5000 --budget-kb 32
+
+app.server с одним воркером; --subscribers клиентов открывают SSE-поток
+и простаивают. Печатает прирост PSS сервера на подписчика, значение
+stream_subscribers из /metrics, время, за которое событие (POST
+/leaderboard/refresh) доходит до всех подписчиков, и время остановки
+воркера по SIGTERM при открытых потоках. Завершается с кодом 1, если
+подписчик обходится дороже --budget-kb, дошло не всё или остановка дольше
+--shutdown-limit секунд.
+"""
+import argparse
+import asyncio
+import json
+import signal
+import sys
+import time
+from benchmarks.load import free_port, percentile, server_command, server_env, start_server
+from benchmarks.server import pss_mb
+
+STREAM_REQUEST = b"GET /api/v1/stream HTTP/1.1\r\nHost: bench\r\nAccept: text/event-stream\r\n\r\n"
+
+
+async def open_stream(port: int):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(STREAM_REQUEST)
+    head = await reader.readuntil(b"\r\n\r\n")
+    if not head.startswith(b"HTTP/1.1 200"):
+        writer.close()
+        raise RuntimeError(head.split(b"\r\n", 1)[0].decode())
+    await reader.readuntil(b"retry: ")
+    return reader, writer
+
+
+async def wait_event(reader, name: bytes) -> float:
+    await reader.readuntil(b"event: " + name)
+    return time.perf_counter()
+
+
+async def metric(http, name: str) -> float:
+    _, _, body = await http.request("GET", "/metrics")
+    for line in body.decode().splitlines():
+        if line.startswith(name + " ") or line.startswith(name + "{"):
+            return float(line.rsplit(" ", 1)[1])
+    return None
+
+
+async def run(args) -> dict:
+    port = free_port()
+    env = {**server_env(1, port), "STREAM_MAX_SUBSCRIBERS": str(args.subscribers + 100)}
+    process, http = await start_server(server_command(), env, "app.server", port)
+    streams = []
+    try:
+        # Прогрев: импорт и первые аллокации не должны попасть в прирост
+        warm = await open_stream(port)
+        warm[1].close()
+        await http.request("GET", "/metrics")
+        await asyncio.sleep(0.5)
+        before = pss_mb(process.pid)
+
+        started = time.perf_counter()
+        for offset in range(0, args.subscribers, args.batch):
+            count = min(args.batch, args.subscribers - offset)
+            streams.extend(await asyncio.gather(*(open_stream(port) for _ in range(count))))
+        connect_seconds = time.perf_counter() - started
+        await asyncio.sleep(1)
+        subscribers = await metric(http, "stream_subscribers")
+        after = pss_mb(process.pid)
+        per_subscriber_kb = (after - before) * 1024 / len(streams)
+
+        waiters = [asyncio.ensure_future(wait_event(reader, b"leaderboard.changed")) for reader, _ in streams]
+        published = time.perf_counter()
+        await http.request("POST", "/api/v1/leaderboard/refresh")
+        done, pending = await asyncio.wait(waiters, timeout=args.fanout_timeout)
+        for waiter in pending:
+            waiter.cancel()
+        delays = sorted(waiter.result() - published for waiter in done if not waiter.exception())
+
+        process.send_signal(signal.SIGTERM)
+        signalled = time.perf_counter()
+        code = await asyncio.get_running_loop().run_in_executor(None, process.wait)
+        shutdown_seconds = time.perf_counter() - signalled
+    finally:
+        for _, writer in streams:
+            writer.close()
+        await http.close()
+        if process.poll() is None:
+            process.terminate()
+            process.wait()
+
+    return {
+        "subscribers": len(streams),
+        "stream_subscribers_metric": subscribers,
+        "connect_s": round(connect_seconds, 2),
+        "pss_before_mb": before,
+        "pss_after_mb": after,
+        "per_subscriber_kb": round(per_subscriber_kb, 2),
+        "budget_kb": args.budget_kb,
+        "fanout_delivered": round(len(delays) / len(streams), 4),
+        "fanout_p50_ms": round(percentile(delays, 50) * 1000, 1) if delays else None,
+        "fanout_last_ms": round(delays[-1] * 1000, 1) if delays else None,
+        "shutdown_s": round(shutdown_seconds, 2),
+        "exit_code": code,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--subscribers", type=int, default=5000)
+    parser.add_argument("--batch", type=int, default=250, help="соединений, открываемых одновременно")
+    parser.add_argument("--budget-kb", type=float, default=32.0, help="допустимый прирост PSS на подписчика")
+    parser.add_argument("--fanout-timeout", type=float, default=30.0)
+    parser.add_argument("--shutdown-limit", type=float, default=10.0)
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    if (
+        report["per_subscriber_kb"] > args.budget_kb
+        or report["fanout_delivered"] < 1
+        or report["shutdown_s"] > args.shutdown_limit
+    ):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
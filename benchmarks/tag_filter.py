@@ -0,0 +1,167 @@
+"""
+Проверка и замер фильтра новостей по тегам (GET /api/v1/news/?tags=...).
+
+Запуск (нужна БД из настроек приложения после alembic upgrade head):
+    python -m benchmarks.tag_filter --news 500000 --links 1000000
+
+Дополняет news до --news строк, создаёт теги разной частоты (tf-common — у
+каждой второй новости, tf-medium — у каждой двадцатой, часть связей
+продублирована, tf-rare — у каждой десятитысячной) и дополняет news_tags до
+--links связей тегами tf-filler-N. Всё это делается в транзакции, которая в
+конце откатывается, — в БД ничего не остаётся. Для каждого случая сравнивает
+с эталоном (INTERSECT/UNION множеств news_id):
+
+- новый фильтр services.tags.tag_filter (EXISTS по индексу);
+- прежний JOIN + GROUP BY news.id HAVING count(*) = len(tags) (только all).
+
+Печатает время (медиана по --repeat) первой страницы и страницы из середины
+ленты. Код возврата 1, если новый фильтр разошёлся с эталоном или связей
+получилось меньше --links.
+"""
+import argparse
+import asyncio
+import json
+import math
+import statistics
+import sys
+import time
+from sqlalchemy import func, intersect, select, text, union
+from app.core.database import SessionLocal, ThreadedSession, engine
+from app.models.news import News, Tag, news_tags
+from app.services.tags import TAGS_ALL, TAGS_ANY, tag_filter
+from benchmarks.pagination import SEED_SQL as NEWS_SQL
+
+# имя тега -> (каждая n-я новость, каждая m-я связь дублируется или 0)
+TAGS = {
+    "tf-common": (2, 0),
+    "tf-medium": (20, 5),
+    "tf-rare": (10_000, 0),
+}
+
+LINK_SQL = text("""
+    INSERT INTO news_tags (news_id, tag_id)
+    SELECT id, :tag_id FROM news WHERE id % :every = 0
+    UNION ALL
+    SELECT id, :tag_id FROM news WHERE :duplicate > 0 AND id % (:every * :duplicate) = 0
+""")
+
+# По связи с каждым из тегов tf-filler-N у каждой новости
+FILLER_SQL = text("""
+    INSERT INTO news_tags (news_id, tag_id)
+    SELECT news.id, tags.id
+    FROM news CROSS JOIN (SELECT id FROM tags WHERE name LIKE 'tf-filler-%') AS tags
+    ORDER BY tags.id, news.id
+    LIMIT :count
+""")
+
+CASES = [
+    (TAGS_ALL, ["tf-common", "tf-medium"]),
+    (TAGS_ALL, ["tf-common", "tf-rare"]),
+    (TAGS_ALL, ["tf-medium", "tf-rare"]),
+    (TAGS_ALL, ["tf-common", "tf-medium", "tf-rare"]),
+    (TAGS_ANY, ["tf-medium", "tf-rare"]),
+    (TAGS_ANY, ["tf-rare", "tf-missing"]),
+    (TAGS_ALL, ["tf-common", "tf-missing"]),
+]
+
+
+def seed(conn, news: int, links: int) -> int:
+    """
+    Дополняет news и news_tags в текущей транзакции соединения; не фиксирует
+    её. Возвращает число связей
+    """
+    existing = conn.scalar(select(func.count()).select_from(News))
+    if existing < news:
+        conn.execute(NEWS_SQL, {"count": news - existing})
+        existing = news
+    for name, (every, duplicate) in TAGS.items():
+        tag_id = conn.scalar(text(
+            "INSERT INTO tags (name) VALUES (:name) ON CONFLICT (name) DO NOTHING RETURNING id"
+        ), {"name": name})
+        if tag_id is not None:
+            conn.execute(LINK_SQL, {"tag_id": tag_id, "every": every, "duplicate": duplicate})
+    missing = links - conn.scalar(text("SELECT count(*) FROM news_tags"))
+    if missing > 0:
+        conn.execute(text(
+            "INSERT INTO tags (name) SELECT 'tf-filler-' || n FROM generate_series(1, :fillers) AS n"
+            " ON CONFLICT (name) DO NOTHING"
+        ), {"fillers": math.ceil(missing / max(existing, 1))})
+        conn.execute(FILLER_SQL, {"count": missing})
+    for table in ("news", "tags", "news_tags"):
+        conn.execute(text(f"ANALYZE {table}"))
+    return conn.scalar(text("SELECT count(*) FROM news_tags"))
+
+
+def reference(conn, mode: str, names: list, below: int, limit: int) -> list:
+    ids = dict(conn.execute(select(Tag.name, Tag.id).where(Tag.name.in_(names))).all())
+    if mode == TAGS_ALL and len(ids) < len(names) or not ids:
+        return []
+    sets = [select(news_tags.c.news_id).where(news_tags.c.tag_id == tag_id) for tag_id in ids.values()]
+    combined = (intersect if mode == TAGS_ALL else union)(*sets).subquery()
+    query = select(combined.c.news_id).where(combined.c.news_id < below)
+    return list(conn.scalars(query.order_by(combined.c.news_id.desc()).limit(limit)))
+
+
+def legacy(names: list, below: int, limit: int):
+    query = select(News.id).join(News.tags).where(Tag.name.in_(names), News.id < below)
+    query = query.group_by(News.id).having(func.count(News.id) == len(names))
+    return query.order_by(News.id.desc()).limit(limit)
+
+
+def timed(fn, repeat: int) -> tuple:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        samples.append(time.perf_counter() - started)
+    return result, round(statistics.median(samples) * 1000, 2)
+
+
+async def run(news: int, links: int, limit: int, repeat: int) -> list:
+    report = []
+    with engine.connect() as conn:
+        # Сессия фильтра работает в той же транзакции и видит созданные теги
+        db = ThreadedSession(SessionLocal(bind=conn))
+        try:
+            seeded = seed(conn, news, links)
+            if seeded < links:
+                sys.exit(f"news_tags: {seeded} связей, нужно не меньше {links}")
+            top = (conn.scalar(select(func.max(News.id))) or 0) + 1
+            for mode, names in CASES:
+                conditions = await tag_filter(db, names, mode)
+                for page, below in (("first", top), ("middle", top // 2)):
+                    query = select(News.id).where(*conditions, News.id < below).order_by(News.id.desc()).limit(limit)
+                    expected = reference(conn, mode, names, below, limit)
+                    got, new_ms = timed(lambda: list(conn.scalars(query)), repeat)
+                    row = {
+                        "mode": mode, "tags": names, "page": page, "rows": len(got),
+                        "ok": got == expected, "new_ms": new_ms,
+                    }
+                    if mode == TAGS_ALL:
+                        old, old_ms = timed(lambda: list(conn.scalars(legacy(names, below, limit))), repeat)
+                        row.update({"legacy_ms": old_ms, "legacy_ok": old == expected})
+                    report.append(row)
+        finally:
+            await db.close()
+            conn.rollback()
+            # ANALYZE обновляет число строк в pg_class вне транзакции
+            for table in ("news", "tags", "news_tags"):
+                conn.execute(text(f"ANALYZE {table}"))
+            conn.commit()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--news", type=int, default=500_000)
+    parser.add_argument("--links", type=int, default=1_000_000)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    report = asyncio.run(run(args.news, args.links, args.limit, args.repeat))
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    sys.exit(0 if all(row["ok"] for row in report) else 1)
+
+
+if __name__ == "__main__":
+    main()
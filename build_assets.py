@@ -0,0 +1,243 @@
+"""
+Сборка статики Flet-клиента (main.py) из каталога assets/:
+    python build_assets.py [--out build/assets]
+
+- Montserrat.ttf урезается до латиницы, кириллицы, типографских знаков и
+  символов строк main.py (ось начертания сохраняется целиком);
+- PNG пересжимаются без потерь (палитра, если цветов не больше 256), из
+  JPEG удаляются комментарии и метаданные, не влияющие на изображение;
+  результат проверяется попиксельно и берётся, только если он меньше;
+- имя каждого файла получает хэш содержимого (vk.3f2a1c9e0b.png), поэтому
+  файлы отдаются с Cache-Control immutable;
+- для сжимаемых файлов рядом кладутся .br и .gz, если они меньше хотя бы
+  на 10%; так же предварительно сжимаются файлы веб-оболочки Flet
+  (main.dart.js и другие), которые Flet отдаёт без сжатия.
+
+Результат — каталог --out и manifest.json в нём; их читает static_assets.py
+при запуске main.py. Нужны fonttools, brotli и Pillow (reqs.txt).
+"""
+import argparse
+import ast
+import gzip
+import hashlib
+import io
+import json
+import os
+import shutil
+import struct
+import brotli
+from fontTools import subset
+from PIL import Image
+import flet
+import flet_web
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+ASSETS_DIR = os.path.join(PROJECT_ROOT, "assets")
+OUT_DIR = os.path.join(PROJECT_ROOT, "build", "assets")
+
+FONT_FILES = ("Montserrat.ttf",)
+# Текст новостей, составов и чата приходит из API: кроме символов строк
+# main.py в шрифте остаются латиница, кириллица и типографские знаки
+FONT_RANGES = (
+    (0x0020, 0x007E),  # Basic Latin
+    (0x00A0, 0x00BF),  # неразрывный пробел, «», ©, °, ·
+    (0x00D7, 0x00D7),  # ×
+    (0x0400, 0x045F),  # кириллица, включая Ё и ё
+    (0x2010, 0x2027),  # тире, кавычки, многоточие, •
+    (0x2116, 0x2116),  # №
+    (0x20BD, 0x20BD),  # ₽
+)
+
+COMPRESSIBLE = (".ttf", ".otf", ".js", ".json", ".html", ".css", ".svg", ".txt")
+# Вариант сжатия сохраняется, только если он меньше исходника хотя бы на 10%
+MIN_SAVING = 0.1
+# Файлы оболочки, которые Flet переписывает при запуске (отдаются им самим)
+FLET_PATCHED = ("index.html", "manifest.json")
+
+# Сегменты JPEG, не влияющие на изображение: APP1 (EXIF без поворота, XMP),
+# APP12, APP13 (Photoshop) и комментарии. APP0, ICC-профиль (APP2) и APP14
+# (Adobe, цветовая модель) остаются
+JPEG_DROPPED_MARKERS = (0xE1, 0xEC, 0xED, 0xFE)
+
+
+def source_strings(path: str) -> str:
+    with open(path, encoding="utf-8") as file:
+        tree = ast.parse(file.read())
+    return "".join(
+        node.value for node in ast.walk(tree) if isinstance(node, ast.Constant) and isinstance(node.value, str)
+    )
+
+
+def subset_font(data: bytes, text: str) -> bytes:
+    unicodes = {code for start, end in FONT_RANGES for code in range(start, end + 1)}
+    unicodes.update(ord(char) for char in text)
+    options = subset.Options()
+    options.name_IDs = ["*"]
+    options.notdef_outline = True
+    options.glyph_names = False
+    font = subset.load_font(io.BytesIO(data), options)
+    subsetter = subset.Subsetter(options)
+    subsetter.populate(unicodes=unicodes)
+    subsetter.subset(font)
+    output = io.BytesIO()
+    subset.save_font(font, output, options)
+    return output.getvalue()
+
+
+def same_pixels(first: bytes, second: bytes) -> bool:
+    with Image.open(io.BytesIO(first)) as a, Image.open(io.BytesIO(second)) as b:
+        return a.size == b.size and a.convert("RGBA").tobytes() == b.convert("RGBA").tobytes()
+
+
+def optimize_png(data: bytes) -> bytes:
+    with Image.open(io.BytesIO(data)) as image:
+        image.load()
+        rgba = image.convert("RGBA")
+    candidates = []
+    colors = rgba.getcolors(256)
+    if colors is not None:
+        # Точная палитра: каждый цвет (с прозрачностью) — свой индекс
+        palette = [color for _, color in colors]
+        index = {color: position for position, color in enumerate(palette)}
+        indexed = Image.new("P", rgba.size)
+        indexed.putdata([index[pixel] for pixel in rgba.getdata()])
+        indexed.putpalette([channel for color in palette for channel in color[:3]])
+        output = io.BytesIO()
+        indexed.save(output, "PNG", optimize=True, transparency=bytes(color[3] for color in palette))
+        candidates.append(output.getvalue())
+    mode = "RGBA" if rgba.getextrema()[3][0] < 255 else "RGB"
+    output = io.BytesIO()
+    rgba.convert(mode).save(output, "PNG", optimize=True)
+    candidates.append(output.getvalue())
+    best = min(candidates, key=len)
+    return best if len(best) < len(data) and same_pixels(data, best) else data
+
+
+def optimize_jpeg(data: bytes) -> bytes:
+    with Image.open(io.BytesIO(data)) as image:
+        # Поворот из EXIF нужен для показа: такой EXIF не удаляется
+        keep_exif = image.getexif().get(0x0112, 1) != 1
+    if data[:2] != b"\xff\xd8":
+        return data
+    output = bytearray(data[:2])
+    position = 2
+    while position + 4 <= len(data) and data[position] == 0xFF:
+        marker = data[position + 1]
+        if marker == 0xDA:  # начало данных изображения: дальше копируется как есть
+            break
+        length = struct.unpack(">H", data[position + 2:position + 4])[0]
+        segment = data[position:position + 2 + length]
+        if marker not in JPEG_DROPPED_MARKERS or (marker == 0xE1 and keep_exif and segment[4:8] == b"Exif"):
+            output += segment
+        position += 2 + length
+    output += data[position:]
+    result = bytes(output)
+    return result if len(result) < len(data) and same_pixels(data, result) else data
+
+
+def hashed_name(name: str, data: bytes) -> str:
+    stem, extension = os.path.splitext(name)
+    return f"{stem}.{hashlib.sha256(data).hexdigest()[:10]}{extension}"
+
+
+def write(path: str, data: bytes):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as file:
+        file.write(data)
+
+
+def precompress(path: str, data: bytes) -> dict:
+    """
+    Пишет path.br и path.gz, если они заметно меньше; возвращает их размеры
+    """
+    encodings = {}
+    if not path.endswith(COMPRESSIBLE):
+        return encodings
+    for encoding, suffix, compressed in (
+        ("br", ".br", brotli.compress(data, quality=11)),
+        ("gzip", ".gz", gzip.compress(data, compresslevel=9, mtime=0)),
+    ):
+        if len(compressed) <= len(data) * (1 - MIN_SAVING):
+            write(path + suffix, compressed)
+            encodings[encoding] = len(compressed)
+    return encodings
+
+
+def build_assets(out_dir: str) -> dict:
+    text = source_strings(os.path.join(PROJECT_ROOT, "main.py"))
+    files = {}
+    for name in sorted(os.listdir(ASSETS_DIR)):
+        path = os.path.join(ASSETS_DIR, name)
+        if not os.path.isfile(path):
+            continue
+        with open(path, "rb") as file:
+            data = file.read()
+        source_bytes = len(data)
+        extension = os.path.splitext(name)[1].lower()
+        if name in FONT_FILES:
+            data = subset_font(data, text)
+        elif extension == ".png":
+            data = optimize_png(data)
+        elif extension in (".jpg", ".jpeg"):
+            data = optimize_jpeg(data)
+        target = hashed_name(name, data)
+        write(os.path.join(out_dir, target), data)
+        files[name] = {
+            "path": target,
+            "source_bytes": source_bytes,
+            "bytes": len(data),
+            "encodings": precompress(os.path.join(out_dir, target), data),
+        }
+    return files
+
+
+def build_flet_web(out_dir: str) -> dict:
+    """
+    Сжатые варианты файлов веб-оболочки Flet (каталог web пакета flet_web)
+    """
+    web_dir = os.path.join(os.path.dirname(flet_web.__file__), "web")
+    files = {}
+    for root, _, names in os.walk(web_dir):
+        for name in sorted(names):
+            path = os.path.join(root, name)
+            relative = os.path.relpath(path, web_dir).replace(os.sep, "/")
+            # Одноимённые файлы из assets/ Flet отдаёт вместо своих
+            shadowed = os.path.exists(os.path.join(ASSETS_DIR, relative))
+            if relative in FLET_PATCHED or shadowed or not name.endswith(COMPRESSIBLE):
+                continue
+            with open(path, "rb") as file:
+                data = file.read()
+            encodings = precompress(os.path.join(out_dir, "flet-web", relative), data)
+            if encodings:
+                files[relative] = {
+                    "bytes": len(data), "etag": hashlib.sha256(data).hexdigest()[:16], "encodings": encodings,
+                }
+    return files
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out", default=OUT_DIR)
+    args = parser.parse_args()
+
+    shutil.rmtree(args.out, ignore_errors=True)
+    manifest = {
+        "files": build_assets(args.out),
+        # Сжатые файлы оболочки годятся только для той версии Flet, из которой собраны
+        "flet_web": {"version": flet.version.version, "files": build_flet_web(args.out)},
+    }
+    with open(os.path.join(args.out, "manifest.json"), "w", encoding="utf-8") as file:
+        json.dump(manifest, file, indent=2, ensure_ascii=False)
+
+    for name, entry in manifest["files"].items():
+        print(f"{name:16} {entry['source_bytes']:>9} -> {entry['bytes']:>9}  {entry['path']}  {entry['encodings']}")
+    shell = manifest["flet_web"]["files"]
+    print(
+        f"Оболочка Flet {manifest['flet_web']['version']}: {len(shell)} файлов, "
+        f"{sum(entry['bytes'] for entry in shell.values())} -> "
+        f"{sum(entry['encodings'].get('br', entry['bytes']) for entry in shell.values())} байт (br)"
+    )
+
+
+if __name__ == "__main__":
+    main()
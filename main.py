@@ -1,32 +1,46 @@
 import flet as ft
+import threading
+import time
 from datetime import datetime
 import requests
+from api_client import LatestOnly, api, chat_feed
+from static_assets import StaticAssets, asset_url, manifest
 
 
-# Настройки шрифтов
+# Настройки шрифтов (пути из build_assets.py: с хэшем в имени, если сборка есть)
 ft.Page.fonts = {
-    "Montserrat": '/Montserrat.ttf'
+    "Montserrat": asset_url('/Montserrat.ttf')
 }
 
 
-def fetch_news(selected_tags=None):
+# Новостей на одной странице ленты и максимум карточек в ленте одновременно
+NEWS_PAGE_SIZE = 20
+MAX_NEWS_CARDS = 60
+# Следующая страница подгружается, когда до конца ленты осталось столько пикселей
+LOAD_MORE_THRESHOLD = 600
+# Ширина изображения в карточке новости: копия берётся не уже её
+NEWS_IMAGE_WIDTH = 800
+
+# Сообщений чата на странице истории, максимум сообщений в окне чата и
+# интервал (в секундах), за который входящие сообщения выводятся одной пачкой
+CHAT_HISTORY_PAGE = 50
+MAX_CHAT_MESSAGES = 200
+CHAT_FLUSH_INTERVAL = 0.1
+
+
+def fetch_news(selected_tags=None, cursor=None, revalidate=False):
+    """
+    Страница новостей и курсор следующей (None — дальше новостей нет)
+    """
     try:
-        # Базовые параметры запроса
-        params = [("skip", 0), ("limit", 100)]
-
-        # Добавляем теги, если они выбраны
-        if selected_tags:
-            for tag in selected_tags:
-                params.append(("tags", tag))
-
-        # Отправляем запрос с параметрами
-        response = requests.get("https://black-bears-service.onrender.com/api/v1/news", params=params)
-        response.raise_for_status()
-        news_data = response.json()
-        return prepare_news(news_data)
+        # Ответ кэшируется по набору тегов; revalidate — проверка по ETag
+        news_data, next_cursor = api.news_page(
+            selected_tags or (), limit=NEWS_PAGE_SIZE, cursor=cursor, revalidate=revalidate
+        )
+        return prepare_news(news_data), next_cursor
     except requests.exceptions.RequestException as e:
         print(f"Ошибка при запросе новостей: {e}")
-        return []
+        return [], None
 
 def prepare_news(news_data):
     prepared_news = []
@@ -34,15 +48,18 @@ def prepare_news(news_data):
         # Укорачиваем текст для краткого содержания
         short_content = news["content"][:100] + "..." if len(news["content"]) > 100 else news["content"]
         prepared_news.append({
+            "id": news["id"],
+            "updated_at": news["updated_at"],
             "title": news["title"],
             "date": datetime.fromisoformat(news["created_at"]),  # Преобразуем строку в datetime
             "content": short_content,  # Краткий текст
             "full_content": news["content"],  # Полный текст
-            "image": news["image_url"],  # URL изображения
+            # Уменьшенная копия под ширину карточки (исходник, если сервер её не отдаёт)
+            "image": api.image_url(news.get("image"), NEWS_IMAGE_WIDTH) or news["image_url"],
         })
     return prepared_news
 
-def news_card(page, news):
+def news_card(news):
     show_full_content = False
 
     # Текстовый элемент для отображения контента
@@ -73,8 +90,8 @@ def news_card(page, news):
         # Обновляем текст кнопки
         button.text = "Свернуть" if show_full_content else "Читать полностью"
 
-        # Обновляем страницу
-        page.update()
+        # Отправляем только изменённые текст и кнопку, а не всю страницу
+        e.page.update(content_text, button)
 
     # Привязываем обработчик к кнопке
     button.on_click = toggle_content
@@ -88,7 +105,7 @@ def news_card(page, news):
                 padding=20,
                 content=ft.Column(
                     [
-                        ft.Image(src=news['image'], width=800, height=200, fit=ft.ImageFit.COVER, border_radius=10),
+                        ft.Image(src=news['image'], width=NEWS_IMAGE_WIDTH, height=200, fit=ft.ImageFit.COVER, border_radius=10),
                         ft.Text(news['title'], color="#FFFFFF", size=20, weight=ft.FontWeight.W_600),
                         ft.Text(news['date'].strftime("%d.%m.%Y"), color="#707070", size=12),
                         content_text,  # Отображаем текст
@@ -103,6 +120,98 @@ def news_card(page, news):
     )
 
 
+class NewsFeed(ft.ListView):
+    """
+    Лента новостей: ListView строит на клиенте только видимые карточки,
+    следующая страница подгружается при прокрутке к концу ленты (X-Next-Cursor).
+
+    Карточки хранятся по (id, updated_at): при смене тегов или обновлении
+    оставшиеся в выдаче карточки переиспользуются, и Flet отправляет по
+    websocket только добавленные и удалённые. В ленте не больше
+    MAX_NEWS_CARDS карточек: при подгрузке верхние удаляются, а первой
+    становится кнопка возврата к началу ленты.
+    """
+
+    def __init__(self, loader: LatestOnly, fetch=fetch_news):
+        super().__init__(spacing=20, expand=True, on_scroll=self._on_scroll, on_scroll_interval=100)
+        self._loader = loader
+        self._fetch = fetch
+        self._tags = []
+        self._shown = []
+        self._cards = {}
+        self._next_cursor = None
+        self._busy = False
+        # Индикатор загрузки размещается в макете отдельно от ленты
+        self.progress = ft.ProgressBar(visible=False, color="#095644", bgcolor="#2E363E")
+        self._to_start = ft.TextButton(
+            "К началу ленты", icon=ft.icons.ARROW_UPWARD, on_click=lambda e: self.load(self._tags),
+        )
+
+    def load(self, tags, revalidate=False):
+        """
+        Первая страница ленты для набора тегов
+        """
+        # Набор тегов фиксируется сейчас: пока идёт загрузка, выбор может измениться
+        requested_tags = list(tags)
+        self._tags = requested_tags
+        self._set_busy(True)
+        self._loader.submit(
+            lambda: self._fetch(requested_tags, revalidate=revalidate), self._show_first_page, self._show_error,
+        )
+
+    def load_more(self):
+        if self._busy or self._next_cursor is None:
+            return
+        requested_tags, cursor = self._tags, self._next_cursor
+        self._set_busy(True)
+        self._loader.submit(
+            lambda: self._fetch(requested_tags, cursor=cursor), self._show_next_page, self._show_error, delay=0,
+        )
+
+    def _on_scroll(self, e: ft.OnScrollEvent):
+        if e.max_scroll_extent is not None and e.max_scroll_extent - e.pixels < LOAD_MORE_THRESHOLD:
+            self.load_more()
+
+    def _set_busy(self, busy):
+        self._busy = busy
+        self.progress.visible = busy
+        if self.progress.page:
+            self.progress.update()
+
+    def _show_error(self, exc):
+        # Курсор не сбрасывается: следующая прокрутка повторит загрузку
+        print(f"Ошибка при загрузке новостей: {exc}")
+        self._set_busy(False)
+
+    def _show_first_page(self, result):
+        news_list, self._next_cursor = result
+        self._render(news_list)
+        if self.page:
+            self.scroll_to(offset=0)
+
+    def _show_next_page(self, result):
+        news_list, self._next_cursor = result
+        self._render(self._shown + news_list)
+
+    def _render(self, news_list):
+        trimmed = len(news_list) > MAX_NEWS_CARDS
+        news_list = news_list[-MAX_NEWS_CARDS:]
+        cards = {}
+        for news in news_list:
+            key = (news["id"], news["updated_at"])
+            if key not in cards:
+                cards[key] = self._cards.get(key) or news_card(news)
+        self._cards = cards
+        self._shown = news_list
+        self.controls = ([self._to_start] if trimmed else []) + list(cards.values())
+        self._busy = False
+        self.progress.visible = False
+        if self.page:
+            # Одна пачка: Flet сравнивает список карточек с прежним и
+            # отправляет только добавленные и удалённые
+            self.page.update(self, self.progress)
+
+
 # Класс для сообщений
 class Message:
     def __init__(self, user_name: str, text: str, message_type: str):
@@ -155,12 +264,88 @@ class ChatMessage(ft.Row):
         ]
         return colors_lookup[hash(user_name) % len(colors_lookup)]
 
-def fetch_tags():
+def chat_entry(item):
+    """
+    Элемент окна чата для сообщения из API
+    """
+    if item["kind"] == "join":
+        return ft.Text(item["text"], italic=True, color=ft.colors.WHITE54, size=12)
+    return ChatMessage(Message(item["user_name"], item["text"], message_type="chat_message"))
+
+
+class ChatView(ft.ListView):
+    """
+    Окно чата: не больше MAX_CHAT_MESSAGES последних сообщений по порядку id.
+
+    push() вызывается из потока ChatFeed: сообщения копятся и выводятся
+    пачкой через CHAT_FLUSH_INTERVAL секунд, то есть всплеск сообщений
+    даёт одно обновление окна, а не одно на каждое сообщение. Сообщения
+    сверх предела удаляются с начала; пока предел не достигнут, более
+    раннюю историю можно подгрузить кнопкой.
+    """
+
+    def __init__(self, run):
+        super().__init__(expand=True, spacing=10, auto_scroll=True)
+        # Запуск в фоне, например page.run_thread
+        self._run = run
+        self._entries = {}
+        self._pending = []
+        self._scheduled = False
+        self._pending_lock = threading.Lock()
+        self._render_lock = threading.Lock()
+        self._older_cursor = None
+        self._trimmed = False
+        self._earlier = ft.TextButton(
+            "Показать предыдущие", icon=ft.icons.HISTORY, on_click=lambda e: self._run(self.load_earlier),
+        )
+
+    def load_history(self, cursor=None):
+        try:
+            messages, self._older_cursor = api.chat_history(limit=CHAT_HISTORY_PAGE, cursor=cursor)
+        except requests.exceptions.RequestException as e:
+            print(f"Ошибка при запросе истории чата: {e}")
+            return
+        self._show(messages)
+
+    def load_earlier(self):
+        if self._older_cursor:
+            self.load_history(self._older_cursor)
+
+    def push(self, messages):
+        with self._pending_lock:
+            self._pending.extend(messages)
+            if self._scheduled:
+                return
+            self._scheduled = True
+        self._run(self._flush_later)
+
+    def _flush_later(self):
+        time.sleep(CHAT_FLUSH_INTERVAL)
+        with self._pending_lock:
+            batch, self._pending = self._pending, []
+            self._scheduled = False
+        self._show(batch)
+
+    def _show(self, messages):
+        with self._render_lock:
+            for item in messages:
+                if item["id"] not in self._entries:
+                    self._entries[item["id"]] = chat_entry(item)
+            ids = sorted(self._entries)
+            if len(ids) > MAX_CHAT_MESSAGES:
+                for message_id in ids[:-MAX_CHAT_MESSAGES]:
+                    del self._entries[message_id]
+                ids = ids[-MAX_CHAT_MESSAGES:]
+                self._trimmed = True
+            show_earlier = self._older_cursor is not None and not self._trimmed
+            self.controls = ([self._earlier] if show_earlier else []) + [self._entries[message_id] for message_id in ids]
+            if self.page:
+                # Flet отправляет только добавленные и удалённые сообщения
+                self.update()
+
+def fetch_tags(revalidate=False):
     try:
-        response = requests.get("https://black-bears-service.onrender.com/api/v1/news/tags/")
-        response.raise_for_status()
-        res = response.json()
-        return res
+        return api.tags(revalidate=revalidate)
     except requests.exceptions.RequestException as e:
         print(f"Ошибка при запросе тегов: {e}")
         return []
@@ -173,14 +358,14 @@ def main(page: ft.Page):
     page.bgcolor = "#1C1B19"
     page.font_family = "Montserrat"
 
+    # Загрузка идёт в фоне; из нескольких быстрых запросов выполняется последний
+    news_loader = LatestOnly(page.run_thread)
+    tags_loader = LatestOnly(page.run_thread, delay=0)
+
     # Новостная лента
-    news_feed = ft.Column(
-        spacing=20,
-        scroll=ft.ScrollMode.AUTO,
-        expand=True
-    )
+    news_feed = NewsFeed(news_loader)
 
-    tags = fetch_tags()
+    tags = []
     selected_tags = []
 
     # Чекбоксы для выбора тегов
@@ -189,9 +374,15 @@ def main(page: ft.Page):
     )
 
     # Функция для обновления тегов
-    def update_tags():
+    def update_tags(revalidate=False):
+        tags_loader.submit(lambda: fetch_tags(revalidate), show_tags)
+
+    def show_tags(new_tags):
         nonlocal tags
-        tags = fetch_tags()  # Загружаем теги с сервера
+        # Ответ 304 возвращает тот же список: чекбоксы не пересоздаём
+        if [tag['name'] for tag in new_tags] == [tag['name'] for tag in tags]:
+            return
+        tags = new_tags
         tag_checkboxes.controls = [
             ft.Checkbox(
                 label=tag['name'],
@@ -210,16 +401,13 @@ def main(page: ft.Page):
         update_news()
 
     # Обновление новостей с учетом выбранных тегов
-    def update_news(e=None):
-        news_feed.controls.clear()
-        news_feed.controls.extend([news_card(page, news) for news in fetch_news(selected_tags)])
-        
-        page.update()
+    def update_news(e=None, revalidate=False):
+        news_feed.load(selected_tags, revalidate)
 
-    # Функция для обновления новостей и тегов
+    # Функция для обновления новостей и тегов (с проверкой по ETag)
     def refresh_data(e=None):
-        update_tags()  # Обновляем теги
-        update_news()  # Обновляем новости
+        update_tags(revalidate=e is not None)  # Обновляем теги
+        update_news(revalidate=e is not None)  # Обновляем новости
 
     # Кнопка для обновления новостей
     refresh_button = ft.IconButton(
@@ -258,10 +446,11 @@ def main(page: ft.Page):
             ft.Container(
                 content=tag_checkboxes,
                 padding=ft.padding.only(bottom=20),  # Отступ снизу
+                height=150,  # Список тегов прокручивается отдельно от ленты
             ),
-            news_feed,  # Новостная лента
+            news_feed.progress,
+            news_feed,  # Новостная лента (прокручивается сама)
         ],
-        scroll=ft.ScrollMode.AUTO,  # Добавляем скроллинг для всей ленты
         expand=True,
     ),
     padding=ft.padding.symmetric(horizontal=30, vertical=20),
@@ -273,11 +462,8 @@ def main(page: ft.Page):
     refresh_data()
 
     # Чат
-    chat = ft.ListView(
-        expand=True,
-        spacing=10,
-        auto_scroll=True,
-    )
+    chat = ChatView(page.run_thread)
+    unsubscribe_chat = None
 
     # Поле для ввода нового сообщения
     new_message = ft.TextField(
@@ -294,30 +480,34 @@ def main(page: ft.Page):
         border_color=ft.colors.WHITE,
     )
 
+    # Отправка сообщения в API (в фоне); своё сообщение показываем сразу,
+    # повтор из ChatFeed отбрасывается по id
+    def send_chat(user_name, text, kind="message"):
+        try:
+            chat.push([api.send_chat(user_name, text, kind)])
+        except requests.exceptions.RequestException as e:
+            print(f"Ошибка при отправке сообщения: {e}")
+
     # Функция для отправки сообщения
     def send_message_click(e):
         if new_message.value != "":
-            page.pubsub.send_all(
-                Message(
-                    page.session.get("user_name"),
-                    new_message.value,
-                    message_type="chat_message",
-                )
-            )
+            page.run_thread(send_chat, page.session.get("user_name"), new_message.value)
             new_message.value = ""
             new_message.focus()
-            page.update()
+            new_message.update()
 
-    # Функция для обработки входящих сообщений
-    def on_message(message: Message):
-        if message.message_type == "chat_message":
-            m = ChatMessage(message)
-        elif message.message_type == "login_message":
-            m = ft.Text(message.text, italic=True, color=ft.colors.WHITE54, size=12)
-        chat.controls.append(m)
-        page.update()
+    # Подписка на новые сообщения и загрузка истории при первом открытии чата
+    def open_chat():
+        nonlocal unsubscribe_chat
+        if unsubscribe_chat is None:
+            unsubscribe_chat = chat_feed.subscribe(chat.push)
+            page.run_thread(chat.load_history)
+
+    def on_close(e):
+        if unsubscribe_chat is not None:
+            unsubscribe_chat()
 
-    page.pubsub.subscribe(on_message)
+    page.on_close = on_close
 
     # Диалоговое окно запроса имени
     join_user_name = ft.TextField(
@@ -350,18 +540,15 @@ def main(page: ft.Page):
             page.session.set("user_name", join_user_name.value)
             welcome_dlg.open = False
             new_message.prefix = ft.Text(f"{join_user_name.value}: ", color=ft.colors.WHITE)
-            page.pubsub.send_all(
-                Message(
-                    user_name=join_user_name.value,
-                    text=f"{join_user_name.value} присоединился к чату.",
-                    message_type="login_message",
-                )
+            page.run_thread(
+                send_chat, join_user_name.value, f"{join_user_name.value} присоединился к чату.", "join",
             )
             page.update()
 
     # Функция для обработки изменения вкладки
     def on_tab_change(e):
         if e.control.selected_index == 1:  # Если выбрана вкладка "Обсуждение"
+            open_chat()
             if not page.session.get("user_name"):  # Если имя пользователя не задано
                 welcome_dlg.open = True
                 page.update()
@@ -457,14 +644,14 @@ footer = ft.BottomAppBar(
     height=60,
     content=ft.Row(
         controls=[
-            ft.Image(src='/polytech.png'),
-            ft.Image(src='/asb.png'),
+            ft.Image(src=asset_url('/polytech.png')),
+            ft.Image(src=asset_url('/asb.png')),
             ft.Row([
                 ft.Text("Мы в соцсетях: ", font_family="Montserrat", weight=ft.FontWeight.W_300,
                         size=14, color='#776E67'),
-                ft.CupertinoButton(content=ft.Image(src='/vk.png'), padding=5, url='https://vk.com/blackbears_mbasket'),
-                ft.CupertinoButton(content=ft.Image(src='/youtube.png'), padding=5, url='https://www.youtube.com/@blackbears-polytech3931'),
-                ft.CupertinoButton(content=ft.Image(src='/tg.png'), padding=5, url='https://t.me/bearsbasketball'), ],
+                ft.CupertinoButton(content=ft.Image(src=asset_url('/vk.png')), padding=5, url='https://vk.com/blackbears_mbasket'),
+                ft.CupertinoButton(content=ft.Image(src=asset_url('/youtube.png')), padding=5, url='https://www.youtube.com/@blackbears-polytech3931'),
+                ft.CupertinoButton(content=ft.Image(src=asset_url('/tg.png')), padding=5, url='https://t.me/bearsbasketball'), ],
                 alignment=ft.MainAxisAlignment.END)
         ],
         alignment=ft.MainAxisAlignment.SPACE_EVENLY),
@@ -488,5 +675,13 @@ header = ft.AppBar(
         elevation_on_scroll=0
     )
 
-# ft.app(target=main, view=ft.WEB_BROWSER, host='192.168.51.208', port=80)
-ft.app(target=main, view=ft.WEB_BROWSER, port=80)
\ No newline at end of file
+if __name__ == "__main__":
+    # ft.app(target=main, view=ft.WEB_BROWSER, host='192.168.51.208', port=80)
+    if manifest is None:
+        ft.app(target=main, view=ft.WEB_BROWSER, port=80)
+    else:
+        # Собранная статика (python build_assets.py) отдаётся со сжатием
+        # и долгим кэшированием, остальное — как обычно в Flet
+        import uvicorn
+
+        uvicorn.run(StaticAssets(ft.app(target=main, export_asgi_app=True)), host="0.0.0.0", port=80)
\ No newline at end of file
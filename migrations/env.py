@@ -11,6 +11,8 @@ from app.models.news import News, Tag
 from app.models.player import Player
 from app.models.team import Team
 from app.models.leaderboard import Leaderboard
+from app.models.standing import Standing
+from app.models.box_score import BoxScore
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
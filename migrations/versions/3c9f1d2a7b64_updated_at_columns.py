@@ -0,0 +1,32 @@
+"""updated_at columns
+
+Revision ID: 3c9f1d2a7b64
+Revises: e8b7a917c29e
+Create Date: 2026-10-18 21:12:40.318502
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c9f1d2a7b64'
+down_revision: Union[str, None] = 'e8b7a917c29e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Время изменения строки входит в отпечаток ETag/Last-Modified
+TABLES = ('games', 'teams', 'players', 'leaderboard')
+
+
+def upgrade() -> None:
+    for table in TABLES:
+        op.add_column(table, sa.Column('updated_at', sa.DateTime(), nullable=True))
+        op.execute(f"UPDATE {table} SET updated_at = now() AT TIME ZONE 'utc'")
+
+
+def downgrade() -> None:
+    for table in reversed(TABLES):
+        op.drop_column(table, 'updated_at')
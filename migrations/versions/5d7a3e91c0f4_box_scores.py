@@ -0,0 +1,43 @@
+"""box scores
+
+Revision ID: 5d7a3e91c0f4
+Revises: 9b4e6f0c2d81
+Create Date: 2026-10-18 22:31:18.904417
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d7a3e91c0f4'
+down_revision: Union[str, None] = '9b4e6f0c2d81'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'box_scores',
+        sa.Column('game_id', sa.Integer(), nullable=False),
+        sa.Column('player_id', sa.Integer(), nullable=False),
+        sa.Column('points', sa.Integer(), nullable=False),
+        sa.Column('rebounds', sa.Integer(), nullable=False),
+        sa.Column('assists', sa.Integer(), nullable=False),
+        sa.Column('steals', sa.Integer(), nullable=False),
+        sa.Column('blocks', sa.Integer(), nullable=False),
+        sa.Column('turnovers', sa.Integer(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['game_id'], ['games.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['player_id'], ['players.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('game_id', 'player_id'),
+    )
+    # Пересчёт итогов игрока и удаление игрока ищут строки по player_id
+    op.create_index('ix_box_scores_player_id', 'box_scores', ['player_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_box_scores_player_id', table_name='box_scores')
+    op.drop_table('box_scores')
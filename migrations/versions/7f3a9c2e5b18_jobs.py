@@ -0,0 +1,49 @@
+"""jobs
+
+Revision ID: 7f3a9c2e5b18
+Revises: c52e8d1f4a07
+Create Date: 2026-10-19 16:05:27.904113
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7f3a9c2e5b18'
+down_revision: Union[str, None] = 'c52e8d1f4a07'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Очередь фоновых задач: воркеры разбирают её через FOR UPDATE SKIP LOCKED
+    op.create_table(
+        'jobs',
+        sa.Column('id', sa.BigInteger(), nullable=False),
+        sa.Column('kind', sa.String(length=64), nullable=False),
+        sa.Column('payload', sa.JSON(), nullable=False),
+        sa.Column('key', sa.String(length=200), nullable=True),
+        sa.Column('state', sa.String(length=16), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('run_at', sa.DateTime(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(
+        'ix_jobs_ready', 'jobs', ['run_at'],
+        postgresql_where=sa.text("state IN ('queued', 'running')"),
+    )
+    op.create_index(
+        'uq_jobs_queued_key', 'jobs', ['key'], unique=True,
+        postgresql_where=sa.text("state = 'queued'"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('uq_jobs_queued_key', table_name='jobs')
+    op.drop_index('ix_jobs_ready', table_name='jobs')
+    op.drop_table('jobs')
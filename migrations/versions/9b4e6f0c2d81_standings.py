@@ -0,0 +1,77 @@
+"""standings
+
+Revision ID: 9b4e6f0c2d81
+Revises: 3c9f1d2a7b64
+Create Date: 2026-10-18 21:47:03.551920
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from app.core.config import settings
+
+
+# Таблица по уже сыгранным играм — как services/standings._snapshot на момент
+# этой ревизии: две строки на игру (соперник и наша команда), места по проценту
+# побед, победам, разнице очков, набранным очкам и названию
+BACKFILL_SQL = """
+INSERT INTO standings (gender, position, name, games, wins, losses, scored, conceded,
+                       points_difference, win_percentage, updated_at)
+SELECT gender,
+       row_number() OVER (
+           PARTITION BY gender
+           ORDER BY wins::float / games DESC, wins DESC, scored - conceded DESC, scored DESC, name ASC
+       ),
+       name, games, wins, losses, scored, conceded, scored - conceded, wins::float / games,
+       now() AT TIME ZONE 'utc'
+FROM (
+    SELECT gender, name, count(*) AS games,
+           count(*) FILTER (WHERE scored > conceded) AS wins,
+           count(*) FILTER (WHERE scored < conceded) AS losses,
+           sum(scored) AS scored, sum(conceded) AS conceded
+    FROM (
+        SELECT gender, team_name AS name, score_opponent AS scored, score_black_bears AS conceded
+        FROM games
+        WHERE score_black_bears IS NOT NULL AND score_opponent IS NOT NULL
+        UNION ALL
+        SELECT gender, :home_team AS name, score_black_bears, score_opponent
+        FROM games
+        WHERE score_black_bears IS NOT NULL AND score_opponent IS NOT NULL
+    ) AS sides
+    GROUP BY gender, name
+) AS totals
+"""
+
+# revision identifiers, used by Alembic.
+revision: str = '9b4e6f0c2d81'
+down_revision: Union[str, None] = '3c9f1d2a7b64'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Дальше таблица пересчитывается при записи счёта и по POST /api/v1/leaderboard/refresh
+    op.create_table(
+        'standings',
+        sa.Column('gender', postgresql.ENUM('MALE', 'FEMALE', name='gendertype', create_type=False), nullable=False),
+        sa.Column('position', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(), nullable=False),
+        sa.Column('games', sa.Integer(), nullable=False),
+        sa.Column('wins', sa.Integer(), nullable=False),
+        sa.Column('losses', sa.Integer(), nullable=False),
+        sa.Column('scored', sa.Integer(), nullable=False),
+        sa.Column('conceded', sa.Integer(), nullable=False),
+        sa.Column('points_difference', sa.Integer(), nullable=False),
+        sa.Column('win_percentage', sa.Float(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('gender', 'position'),
+        sa.UniqueConstraint('gender', 'name', name='uq_standings_gender_name'),
+    )
+    op.execute(sa.text(BACKFILL_SQL).bindparams(home_team=settings.HOME_TEAM_NAME))
+
+
+def downgrade() -> None:
+    op.drop_table('standings')
@@ -0,0 +1,38 @@
+"""news search vector
+
+Revision ID: a41c7e5b9d26
+Revises: 5d7a3e91c0f4
+Create Date: 2026-10-18 23:05:52.117630
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a41c7e5b9d26'
+down_revision: Union[str, None] = '5d7a3e91c0f4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SEARCH_VECTOR_SQL = (
+    "setweight(to_tsvector('russian', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('russian', coalesce(content, '')), 'B')"
+)
+
+
+def upgrade() -> None:
+    # Генерируемый столбец пересчитывается самой БД при INSERT/UPDATE title и content
+    op.add_column(
+        'news',
+        sa.Column('search_vector', postgresql.TSVECTOR(), sa.Computed(SEARCH_VECTOR_SQL, persisted=True), nullable=True),
+    )
+    op.create_index('ix_news_search_vector', 'news', ['search_vector'], unique=False, postgresql_using='gin')
+
+
+def downgrade() -> None:
+    op.drop_index('ix_news_search_vector', table_name='news', postgresql_using='gin')
+    op.drop_column('news', 'search_vector')
@@ -0,0 +1,40 @@
+"""player totals not null
+
+Revision ID: b6d2f8a41e93
+Revises: 7f3a9c2e5b18
+Create Date: 2026-10-21 11:42:09.518337
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b6d2f8a41e93'
+down_revision: Union[str, None] = '7f3a9c2e5b18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Счётчики — ключи сортировки и курсора списка игроков: строки с NULL
+# выпадали бы из сравнения (total, id) < курсор
+COLUMNS = (
+    'games_played', 'total_points', 'total_rebounds', 'total_assists',
+    'total_steals', 'total_blocks', 'total_turnovers',
+)
+
+
+def upgrade() -> None:
+    op.execute(
+        "UPDATE players SET "
+        + ", ".join(f"{column} = coalesce({column}, 0)" for column in COLUMNS)
+        + " WHERE " + " OR ".join(f"{column} IS NULL" for column in COLUMNS)
+    )
+    for column in COLUMNS:
+        op.alter_column('players', column, existing_type=sa.Integer(), nullable=False, server_default='0')
+
+
+def downgrade() -> None:
+    for column in reversed(COLUMNS):
+        op.alter_column('players', column, existing_type=sa.Integer(), nullable=True, server_default=None)
@@ -0,0 +1,35 @@
+"""chat messages
+
+Revision ID: c52e8d1f4a07
+Revises: a41c7e5b9d26
+Create Date: 2026-10-19 10:12:44.318205
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c52e8d1f4a07'
+down_revision: Union[str, None] = 'a41c7e5b9d26'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # История чата; страницы и догрузка новых сообщений идут по первичному ключу
+    op.create_table(
+        'chat_messages',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_name', sa.String(length=50), nullable=False),
+        sa.Column('text', sa.String(length=2000), nullable=False),
+        sa.Column('kind', sa.String(length=16), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('chat_messages')
@@ -0,0 +1,66 @@
+"""query indexes
+
+Revision ID: e8b7a917c29e
+Revises: 1ae5bd90e22b
+Create Date: 2026-10-18 19:04:16.840121
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e8b7a917c29e'
+down_revision: Union[str, None] = '1ae5bd90e22b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Триграммы нужны для поиска игроков через ilike '%...%'
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+
+    # games: фильтр по полу + диапазон дат, сортировка по (date_time, id)
+    op.create_index('ix_games_gender_date_time', 'games', ['gender', 'date_time', 'id'], unique=False)
+    op.create_index('ix_games_date_time', 'games', ['date_time'], unique=False)
+    # Результаты: только сыгранные игры со счётом
+    op.create_index(
+        'ix_games_finished', 'games', ['gender', 'date_time', 'id'], unique=False,
+        postgresql_where=sa.text('score_black_bears IS NOT NULL AND score_opponent IS NOT NULL'),
+    )
+
+    # leaderboard: фильтр по полу, сортировка по месту
+    op.create_index('ix_leaderboard_gender_position', 'leaderboard', ['gender', 'position'], unique=False)
+
+    # players: фильтры gender/games_played, сортировка по фамилии и по очкам
+    op.create_index('ix_players_gender_games_played', 'players', ['gender', 'games_played'], unique=False)
+    op.create_index('ix_players_name_sort', 'players', ['last_name', 'first_name', 'id'], unique=False)
+    op.create_index('ix_players_total_points', 'players', ['total_points', 'id'], unique=False)
+    op.create_index(
+        'ix_players_first_name_trgm', 'players', ['first_name'], unique=False,
+        postgresql_using='gin', postgresql_ops={'first_name': 'gin_trgm_ops'},
+    )
+    op.create_index(
+        'ix_players_last_name_trgm', 'players', ['last_name'], unique=False,
+        postgresql_using='gin', postgresql_ops={'last_name': 'gin_trgm_ops'},
+    )
+
+    # news_tags: фильтр по тегу и подгрузка тегов новости (selectinload)
+    op.create_index('ix_news_tags_tag_id_news_id', 'news_tags', ['tag_id', 'news_id'], unique=False)
+    op.create_index('ix_news_tags_news_id', 'news_tags', ['news_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_news_tags_news_id', table_name='news_tags')
+    op.drop_index('ix_news_tags_tag_id_news_id', table_name='news_tags')
+    op.drop_index('ix_players_last_name_trgm', table_name='players')
+    op.drop_index('ix_players_first_name_trgm', table_name='players')
+    op.drop_index('ix_players_total_points', table_name='players')
+    op.drop_index('ix_players_name_sort', table_name='players')
+    op.drop_index('ix_players_gender_games_played', table_name='players')
+    op.drop_index('ix_leaderboard_gender_position', table_name='leaderboard')
+    op.drop_index('ix_games_finished', table_name='games')
+    op.drop_index('ix_games_date_time', table_name='games')
+    op.drop_index('ix_games_gender_date_time', table_name='games')
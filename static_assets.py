@@ -0,0 +1,97 @@
+"""
+Статика Flet-клиента, собранная build_assets.py.
+
+- asset_url("/vk.png") — путь к файлу с хэшем в имени из manifest.json;
+  без сборки — исходный путь (main.py работает и без неё, как раньше).
+- StaticAssets — ASGI-обёртка приложения Flet: файлы из манифеста отдаются
+  из каталога сборки с Cache-Control immutable, файлы веб-оболочки Flet —
+  с проверкой по ETag (их имена не меняются). Готовые варианты .br и .gz
+  выбираются по Accept-Encoding. Остальные запросы идут в Flet.
+"""
+import json
+import mimetypes
+import os
+from typing import Optional
+from starlette.responses import FileResponse, Response
+import flet
+import flet_web
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+BUILD_DIR = os.getenv("BLACK_BEARS_ASSETS_BUILD", os.path.join(PROJECT_ROOT, "build", "assets"))
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+SUFFIXES = {"br": ".br", "gzip": ".gz"}
+
+
+def load_manifest(build_dir: str = BUILD_DIR) -> Optional[dict]:
+    try:
+        with open(os.path.join(build_dir, "manifest.json"), encoding="utf-8") as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return None
+
+
+manifest = load_manifest()
+
+
+def asset_url(path: str) -> str:
+    if manifest is None:
+        return path
+    entry = manifest["files"].get(path.lstrip("/"))
+    return "/" + entry["path"] if entry is not None else path
+
+
+def _accepted(header: str) -> set:
+    encodings = set()
+    for item in header.split(","):
+        name, _, params = item.partition(";")
+        if params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            encodings.add(name.strip().lower())
+    return encodings
+
+
+class StaticAssets:
+    def __init__(self, app, build_dir: str = BUILD_DIR, manifest: Optional[dict] = manifest):
+        self.app = app
+        # путь запроса -> (файл без сжатия, {кодирование: файл}, ETag, Cache-Control)
+        self.routes = {}
+        if manifest is None:
+            return
+        for entry in manifest["files"].values():
+            path = os.path.join(build_dir, entry["path"])
+            variants = {encoding: path + SUFFIXES[encoding] for encoding in entry["encodings"]}
+            etag = entry["path"].rsplit(".", 2)[-2]
+            self.routes["/" + entry["path"]] = (path, variants, etag, IMMUTABLE)
+        shell = manifest["flet_web"]
+        # Сжатые файлы другой версии Flet не совпадают с тем, что он отдаёт сам
+        if shell["version"] == flet.version.version:
+            web_dir = os.path.join(os.path.dirname(flet_web.__file__), "web")
+            for relative, entry in shell["files"].items():
+                compressed = os.path.join(build_dir, "flet-web", relative)
+                variants = {encoding: compressed + SUFFIXES[encoding] for encoding in entry["encodings"]}
+                self.routes["/" + relative] = (os.path.join(web_dir, relative), variants, entry["etag"], REVALIDATE)
+
+    async def __call__(self, scope, receive, send):
+        route = self.routes.get(scope["path"]) if scope["type"] == "http" else None
+        if route is None or scope["method"] not in ("GET", "HEAD"):
+            await self.app(scope, receive, send)
+            return
+        path, variants, etag, cache_control = route
+        headers = {name.decode().lower(): value.decode() for name, value in scope["headers"]}
+        accepted = _accepted(headers.get("accept-encoding", ""))
+        encoding = next((encoding for encoding in ("br", "gzip") if encoding in variants and encoding in accepted), None)
+        response_headers = {
+            "Cache-Control": cache_control,
+            "Vary": "Accept-Encoding",
+            # Разные кодирования — разные представления, ETag у каждого свой
+            "ETag": f'"{etag}-{encoding}"' if encoding else f'"{etag}"',
+        }
+        if headers.get("if-none-match") == response_headers["ETag"]:
+            response = Response(status_code=304, headers=response_headers)
+        else:
+            if encoding:
+                response_headers["Content-Encoding"] = encoding
+            media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+            response = FileResponse(variants.get(encoding, path), headers=response_headers, media_type=media_type)
+        await response(scope, receive, send)